@@ -1,13 +1,27 @@
 from flask import Flask
 from flask_cors import CORS
+import os
 
-def create_app():
-    """Create and configure the Flask application"""
+# Largest request body accepted (bytes); bigger requests get a 413
+MAX_CONTENT_LENGTH = int(os.getenv("SPAM_MAX_CONTENT_LENGTH", 4 * 1024 * 1024))
+
+# How the model is brought up: 'background', 'sync' or 'lazy' (see routes.warm_up)
+WARMUP_MODE = os.getenv("SPAM_WARMUP", "background")
+
+def create_app(warmup=None):
+    """Create and configure the Flask application
+    
+    Creating the app is fast; the model comes up according to warmup
+    (default SPAM_WARMUP) and /api/ready reports when it is live.
+    """
     app = Flask(__name__)
+    app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
     CORS(app)  # Enable CORS for Flutter integration
     
     # Register blueprints
-    from app.api.routes import api
+    from app.api.routes import api, warm_up
     app.register_blueprint(api, url_prefix='/api')
     
-    return app 
\ No newline at end of file
+    warm_up(warmup or WARMUP_MODE)
+    
+    return app
@@ -1,35 +1,355 @@
-from flask import Blueprint, request, jsonify
-from app.models import SpamDetector
+from flask import Blueprint, Response, g, request, jsonify
+from app.api.metrics import MetricsRegistry
+from app.models import (SpamDetector, ModelStore, TrainingJobs, FeedbackLearner, PredictionCache,
+                        ModelRegistry, ShadowScorer, ShadowState)
+from app.models.registry import file_sha256
 import os
+import threading
+import time
+from collections import Counter
 
 # Create blueprint
 api = Blueprint('api', __name__)
 
-# Initialize and load model
-detector = SpamDetector()
+# Versioned model artifacts; ./app/models/saved is the pre-registry location,
+# imported as the first version when the registry is empty
+registry_dir = "./app/models/registry"
 model_dir = "./app/models/saved"
+data_path = "./data/spam.csv"
 
-# Check if model exists, if not train and save it
-if not os.path.exists(os.path.join(model_dir, "spam_model.pkl")):
-    print("Training model...")
-    detector.train()
-    detector.save_model()
-    print(f"Model trained with accuracy: {detector.accuracy}")
-else:
-    print("Loading pre-trained model...")
-    detector.load_model()
+# Feature pipeline used when the service has to train a model itself:
+# 'count' (fitted vocabulary) or 'hashing' (stateless, fixed feature space)
+VECTORIZER_TYPE = os.getenv("SPAM_VECTORIZER", "count")
+
+# Inference backend: 'sklearn' (pickled estimators) or 'numpy' (exported
+# scorer, no sklearn import; falls back to sklearn for hashing models)
+INFERENCE_BACKEND = os.getenv("SPAM_INFERENCE", "sklearn")
+
+# Memory-map model arrays so all workers share one page-cache copy;
+# set SPAM_MODEL_MMAP to an empty string to load private copies instead
+MODEL_MMAP_MODE = os.getenv("SPAM_MODEL_MMAP", "r") or None
+
+# Upper bound on messages accepted by /predict/batch
+MAX_BATCH_SIZE = 5000
+
+# Prediction cache size (0 disables it) and entry lifetime in seconds
+CACHE_SIZE = int(os.getenv("SPAM_CACHE_SIZE", 10000))
+CACHE_TTL = int(os.getenv("SPAM_CACHE_TTL", 3600))
+
+# Labelled messages logged by /feedback before they are applied
+FEEDBACK_BATCH_SIZE = int(os.getenv("SPAM_FEEDBACK_BATCH_SIZE", 32))
+
+# Seconds between checks for a version promoted by another worker process
+REGISTRY_POLL_INTERVAL = float(os.getenv("SPAM_REGISTRY_POLL_INTERVAL", 2.0))
+
+# Whether warm_up starts the registry watcher; gunicorn.conf.py turns this off
+# for the preloading master, which serves nothing, and starts it in each worker
+WATCH_ON_WARMUP = os.getenv("SPAM_WATCH_ON_WARMUP", "1") != "0"
+
+# Delay before retrying a failed background warm-up (seconds), doubled after
+# every failure up to the maximum
+WARMUP_RETRY_DELAY = float(os.getenv("SPAM_WARMUP_RETRY_DELAY", 1.0))
+WARMUP_RETRY_MAX_DELAY = float(os.getenv("SPAM_WARMUP_RETRY_MAX_DELAY", 60.0))
+
+# Request counters and per-stage latency histograms served at /api/metrics;
+# SPAM_METRICS=0 turns recording off
+METRICS_ENABLED = os.getenv("SPAM_METRICS", "1") != "0"
+
+def load_detector(version):
+    """Build a new detector from a registry version"""
+    return registry.load(version, use_scorer=INFERENCE_BACKEND == "numpy", mmap_mode=MODEL_MMAP_MODE)
+
+def publish_version(version):
+    """Load a registry version, bring it up to date with the feedback log and make it live"""
+    return model_store.publish(feedback_learner.replay(load_detector(version)))
+
+def promote_version(version):
+    """Promote a registry version and make it live
+
+    The version is loaded first, so one that fails to load leaves the
+    registry (and every worker following it) on the current version.
+    """
+    detector = feedback_learner.replay(load_detector(version))
+    registry.promote(version)
+    return model_store.publish(detector)
+
+def rollback_version():
+    """Roll the registry back to the previous version and make it live; returns both versions"""
+    version = registry.previous()
+    if version is None:
+        raise ValueError("No previous version to roll back to")
+    detector = feedback_learner.replay(load_detector(version))
+    registry.rollback(expected=version)
+    return version, model_store.publish(detector)
+
+def on_trained(version, promote):
+    """Called when a background training job has added a registry version"""
+    if not promote:
+        return None
+    return promote_version(version)
+
+# The live model; handlers read model_store.current once per request
+model_store = ModelStore()
+registry = ModelRegistry(registry_dir)
+# Job status lives in the registry directory, shared by every worker process
+training_jobs = TrainingJobs(on_trained=on_trained, jobs_dir=os.path.join(registry_dir, "jobs"))
+prediction_cache = PredictionCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+# Entries are keyed by model version; also free them as soon as a model is swapped
+model_store.subscribe(prediction_cache.clear)
+# Feedback goes through a log in the registry directory that every worker replays
+feedback_learner = FeedbackLearner(model_store, registry, os.path.join(registry_dir, "feedback.jsonl"),
+                                   batch_size=FEEDBACK_BATCH_SIZE)
+
+# Which candidate to shadow, and each worker's counters, live in the registry
+# directory; every worker syncs its own scorer to it (sync_shadow)
+shadow_state = ShadowState(os.path.join(registry_dir, "shadow"))
+# This worker's scorer of the running shadow, if any
+shadow_scorer = None
+_shadow_lock = threading.Lock()
+
+metrics = MetricsRegistry(enabled=METRICS_ENABLED)
+http_requests = metrics.counter(
+    "spam_http_requests_total", "HTTP requests by endpoint and status code", ("endpoint", "status"))
+http_request_seconds = metrics.histogram(
+    "spam_http_request_duration_seconds", "Time spent handling HTTP requests", ("endpoint",))
+predict_stage_seconds = metrics.histogram(
+    "spam_predict_stage_seconds",
+    "Time spent per prediction stage: parse, cache, vectorize, score and serialize",
+    ("endpoint", "stage"))
+predicted_messages = metrics.counter(
+    "spam_predicted_messages_total", "Messages classified, by endpoint and label", ("endpoint", "prediction"))
+metrics.gauge(
+    "spam_model_info", "The live model (value is always 1)", ("model_version", "registry_version"),
+    lambda: [((model_store.version, model_store.current.registry_version), 1)] if model_store.current else [])
+metrics.gauge(
+    "spam_model_ready", "1 once a model is live, 0 while warming up", (),
+    lambda: [((), int(model_store.current is not None))])
+metrics.gauge(
+    "spam_cache_hits_total", "Prediction cache hits", (),
+    lambda: [((), prediction_cache.hits)], type="counter")
+metrics.gauge(
+    "spam_cache_misses_total", "Prediction cache misses", (),
+    lambda: [((), prediction_cache.misses)], type="counter")
+metrics.gauge(
+    "spam_cache_entries", "Entries in the prediction cache", (),
+    lambda: [((), prediction_cache.stats()["size"])])
+metrics.gauge(
+    "spam_feedback_pending", "Feedback messages logged but not yet applied", (),
+    lambda: [((), feedback_learner.pending)])
+
+# Startup progress of the first model, reported by /ready
+model_status = {"state": "not_loaded", "error": None, "started_at": None, "ready_at": None,
+                "attempts": 0, "retry_at": None}
+_init_lock = threading.Lock()
+_lazy_loading = False
+_watcher_pid = None
+
+def init_model():
+    """Load the saved model (training one first if none exists) unless one is live"""
+    with _init_lock:
+        if model_store.current is not None:
+            return
+        
+        model_status.update(state="loading", error=None, started_at=time.time(), retry_at=None,
+                            attempts=model_status["attempts"] + 1)
+        try:
+            version = registry.current()
+            if version is None and os.path.exists(os.path.join(model_dir, "spam_model.pkl")):
+                print("Importing saved model into the registry...")
+                detector = SpamDetector()
+                detector.load_model(model_dir)
+                version = registry.add_detector(detector, {"source": "import"})
+            elif version is None:
+                # No model anywhere yet: train and register one
+                print("Training model...")
+                model_status["state"] = "training"
+                detector = SpamDetector()
+                start = time.perf_counter()
+                detector.train(data_path, vectorizer_type=VECTORIZER_TYPE)
+                print(f"Model trained with accuracy: {detector.accuracy}")
+                version = registry.add_detector(detector, {
+                    "source": "train",
+                    "train_seconds": time.perf_counter() - start,
+                    "corpus_path": data_path,
+                    "corpus_sha256": file_sha256(data_path)
+                })
+            print(f"Loading model {version}...")
+            # Promoting the current version again leaves the registry as it is
+            promote_version(version)
+        except Exception as e:
+            model_status.update(state="failed", error=str(e))
+            raise
+        model_status.update(state="ready", ready_at=time.time())
+
+def sync_shadow():
+    """Start or stop this worker's scorer to match the shared shadow config, save its counters"""
+    global shadow_scorer
+    with _shadow_lock:
+        config = shadow_state.config()
+        shadow = shadow_scorer
+        if config is None:
+            shadow_scorer = None
+        elif shadow is None or shadow.shadow_id != config["id"]:
+            shadow_scorer = ShadowScorer(load_detector(config["version"]), config["version"],
+                                         sample_rate=config["sample_rate"], shadow_id=config["id"])
+        if shadow is not None and shadow is not shadow_scorer:
+            shadow.stop()
+        if shadow_scorer is not None:
+            shadow_state.save(shadow_scorer)
+    return config
+
+def stop_shared_shadow():
+    """End the running shadow in every worker; returns its final stats, or None"""
+    global shadow_scorer
+    with _shadow_lock:
+        config = shadow_state.config()
+        shadow, shadow_scorer = shadow_scorer, None
+        if shadow is not None:
+            shadow.stop()
+            if config is not None and shadow.shadow_id == config["id"]:
+                shadow_state.save(shadow)
+        if config is None:
+            return None
+        # Other workers stop at their next registry poll
+        shadow_state.stop()
+        return shadow_state.stats(config)
+
+def watch_registry():
+    """Follow promotions, rollbacks and feedback from other worker processes"""
+    while True:
+        time.sleep(REGISTRY_POLL_INTERVAL)
+        try:
+            version = registry.current()
+            live = model_store.current
+            # Detectors published from outside the registry (registry_version
+            # None) are left alone
+            if version is not None and live is not None and live.registry_version not in (None, version):
+                print(f"Registry moved to {version}, loading it...")
+                publish_version(version)
+            feedback_learner.catch_up()
+            sync_shadow()
+        except Exception as e:
+            print(f"Registry check failed: {e}")
+
+def start_registry_watcher():
+    """Start watch_registry once per process (threads don't survive a fork)"""
+    global _watcher_pid
+    if _watcher_pid == os.getpid():
+        return
+    with _init_lock:
+        if _watcher_pid != os.getpid():
+            _watcher_pid = os.getpid()
+            threading.Thread(target=watch_registry, name="registry-watcher", daemon=True).start()
+
+def _init_model_in_background():
+    """init_model, retried with exponential backoff until it succeeds
+    
+    /ready keeps answering 503 (with the last error) in the meantime.
+    """
+    delay = WARMUP_RETRY_DELAY
+    while True:
+        try:
+            init_model()
+            return
+        except Exception as e:
+            print(f"Model warm-up failed: {e}; retrying in {delay:g}s")
+            model_status["retry_at"] = time.time() + delay
+        time.sleep(delay)
+        delay = min(delay * 2, WARMUP_RETRY_MAX_DELAY)
+
+def warm_up(mode="background"):
+    """Get the first model live without necessarily blocking startup
+    
+    'sync' loads it before returning, 'background' loads it in a warm-up
+    thread (retrying on failure) while the app already serves /health and
+    /ready, and 'lazy' defers loading to the first request that needs the
+    model.
+    """
+    global _lazy_loading
+    if WATCH_ON_WARMUP:
+        start_registry_watcher()
+    if mode == "sync":
+        init_model()
+    elif mode == "background":
+        threading.Thread(target=_init_model_in_background, name="model-warmup", daemon=True).start()
+    elif mode == "lazy":
+        _lazy_loading = True
+    else:
+        raise ValueError(f"Unknown warm-up mode '{mode}', expected 'sync', 'background' or 'lazy'")
+
+def get_detector():
+    """The live detector, loading it first in lazy mode; None while warming up"""
+    start_registry_watcher()
+    detector = model_store.current
+    if detector is None and _lazy_loading:
+        init_model()
+        detector = model_store.current
+    return detector
+
+def model_not_ready():
+    """503 response for requests that arrive before the model is live"""
+    return jsonify({
+        "error": "Model is not loaded yet",
+        "state": model_status["state"]
+    }), 503
+
+def _endpoint():
+    rule = request.url_rule
+    return rule.rule if rule is not None else "unmatched"
+
+@api.before_request
+def start_request_timer():
+    if metrics.enabled:
+        g.request_start = time.perf_counter()
+
+@api.after_request
+def record_request(response):
+    start = g.get("request_start")
+    if start is not None:
+        endpoint = _endpoint()
+        http_request_seconds.observe(time.perf_counter() - start, endpoint)
+        http_requests.inc(endpoint, str(response.status_code))
+    return response
+
+def record_stages(endpoint, timings):
+    """Add the seconds spent per prediction stage to the stage histogram"""
+    for stage, seconds in timings.items():
+        predict_stage_seconds.observe(seconds, endpoint, stage)
+
+@api.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Metrics in the Prometheus text exposition format
+    
+    Values are per process; under gunicorn each worker reports its own.
+    """
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @api.route('/health', methods=['GET'])
 def health_check():
-    """Health check endpoint"""
+    """Liveness: the process is up; use /ready to know if it can classify"""
     return jsonify({
         "status": "ok",
-        "message": "Spam detection service is running"
+        "message": "Spam detection service is running",
+        "ready": model_store.current is not None,
+        "model_version": model_store.version,
+        "cache": prediction_cache.stats()
     })
 
+@api.route('/ready', methods=['GET'])
+def readiness_check():
+    """Readiness endpoint: 200 once a model is live, 503 until then"""
+    ready = model_store.current is not None
+    return jsonify({
+        "ready": ready,
+        "model_version": model_store.version,
+        **model_status
+    }), 200 if ready else 503
+
 @api.route('/predict', methods=['POST'])
 def predict_spam():
     """Predict if a message is spam or not"""
+    timings = {} if metrics.enabled else None
+    start = time.perf_counter()
     if not request.json or 'message' not in request.json:
         return jsonify({
             "error": "Invalid request, 'message' field is required"
@@ -38,30 +358,349 @@ def predict_spam():
     message = request.json['message']
     
     try:
-        result = detector.predict(message)
-        return jsonify({
+        detector = get_detector()
+        if detector is None:
+            return model_not_ready()
+        parsed = time.perf_counter()
+        result = prediction_cache.get(message, detector.version)
+        elapsed = None
+        if result is None:
+            start_predict = time.perf_counter()
+            result = detector.predict(message, timings)
+            elapsed = time.perf_counter() - start_predict
+            prediction_cache.put(message, detector.version, result)
+        
+        shadow = shadow_scorer
+        if shadow is not None:
+            shadow.offer(message, result["prediction"], elapsed)
+        serialize_start = time.perf_counter()
+        response = jsonify({
             "message": message,
             "prediction": result["prediction"],
             "confidence": result["confidence"],
             "is_spam": result["prediction"] == "Spam"
         })
+        if timings is not None:
+            end = time.perf_counter()
+            timings["parse"] = parsed - start
+            # Cache lookup/insert and shadow hand-off: whatever predict didn't account for
+            timings["cache"] = serialize_start - parsed - (timings.get("vectorize", 0.0) + timings.get("score", 0.0))
+            timings["serialize"] = end - serialize_start
+            record_stages(_endpoint(), timings)
+            predicted_messages.inc(_endpoint(), result["prediction"])
+        return response
     except Exception as e:
         return jsonify({
             "error": str(e)
         }), 500
 
+@api.route('/predict/batch', methods=['POST'])
+def predict_spam_batch():
+    """Predict spam labels for a list of messages in one request"""
+    timings = {} if metrics.enabled else None
+    start = time.perf_counter()
+    if not request.json or 'messages' not in request.json:
+        return jsonify({
+            "error": "Invalid request, 'messages' field is required"
+        }), 400
+    
+    messages = request.json['messages']
+    if not isinstance(messages, list) or not all(isinstance(m, str) for m in messages):
+        return jsonify({
+            "error": "Invalid request, 'messages' must be a list of strings"
+        }), 400
+    if len(messages) > MAX_BATCH_SIZE:
+        return jsonify({
+            "error": f"Too many messages, the limit is {MAX_BATCH_SIZE} per request"
+        }), 413
+    
+    try:
+        detector = get_detector()
+        if detector is None:
+            return model_not_ready()
+        parsed = time.perf_counter()
+        results = [prediction_cache.get(message, detector.version) for message in messages]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            predicted = detector.predict_batch([messages[i] for i in misses], timings)
+            for i, result in zip(misses, predicted):
+                results[i] = result
+                prediction_cache.put(messages[i], detector.version, result)
+        serialize_start = time.perf_counter()
+        response = jsonify({
+            "results": [
+                {
+                    "prediction": result["prediction"],
+                    "confidence": result["confidence"],
+                    "is_spam": result["prediction"] == "Spam"
+                }
+                for result in results
+            ]
+        })
+        if timings is not None:
+            end = time.perf_counter()
+            timings["parse"] = parsed - start
+            timings["cache"] = serialize_start - parsed - (timings.get("vectorize", 0.0) + timings.get("score", 0.0))
+            timings["serialize"] = end - serialize_start
+            record_stages(_endpoint(), timings)
+            for label, count in Counter(result["prediction"] for result in results).items():
+                predicted_messages.inc(_endpoint(), label, amount=count)
+        return response
+    except Exception as e:
+        return jsonify({
+            "error": str(e)
+        }), 500
+
+def positive_int(value):
+    """A JSON number or numeric string as a positive int, else None"""
+    # bool is an int subclass: true/false are rejected too
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
 @api.route('/train', methods=['POST'])
 def train_model():
-    """Endpoint to retrain the model"""
+    """Start retraining the model in the background
+    
+    Accepts an optional JSON body with 'vectorizer' ('count' or 'hashing')
+    and 'n_features' for the hashing pipeline, or 'streaming': true (with an
+    optional 'chunksize') to train a hashing model chunk by chunk in bounded
+    memory. Returns a job id to poll at /train/<job_id>. The result becomes a
+    new registry version that is promoted and goes live once the job
+    succeeds, unless 'promote': false keeps it as a candidate.
+    """
+    options = request.get_json(silent=True) or {}
+    if not isinstance(options, dict):
+        return jsonify({
+            "error": "Invalid request, the JSON body must be an object"
+        }), 400
+    streaming = bool(options.get("streaming"))
+    vectorizer_type = options.get("vectorizer", "hashing" if streaming else VECTORIZER_TYPE)
+    if vectorizer_type not in ("count", "hashing"):
+        return jsonify({
+            "error": "Invalid request, 'vectorizer' must be 'count' or 'hashing'"
+        }), 400
+    if streaming and vectorizer_type != "hashing":
+        return jsonify({
+            "error": "Invalid request, streaming training only supports the hashing vectorizer"
+        }), 400
+    
+    if streaming:
+        train_kwargs = {"streaming": True}
+    else:
+        train_kwargs = {"vectorizer_type": vectorizer_type}
+    for name in ("chunksize", "n_features") if streaming else ("n_features",):
+        if name not in options:
+            continue
+        train_kwargs[name] = positive_int(options[name])
+        if train_kwargs[name] is None:
+            return jsonify({
+                "error": f"Invalid request, '{name}' must be a positive integer"
+            }), 400
+    
+    try:
+        job_id = training_jobs.submit(data_path, registry_dir, train_kwargs,
+                                      promote=bool(options.get("promote", True)))
+        return jsonify({
+            "success": True,
+            "message": "Training started",
+            "job_id": job_id
+        }), 202
+    except Exception as e:
+        return jsonify({
+            "error": str(e)
+        }), 500
+
+@api.route('/train/<job_id>', methods=['GET'])
+def training_status(job_id):
+    """Status of a background training job"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            "error": f"Unknown training job '{job_id}'"
+        }), 404
+    return jsonify(job) 
+
+@api.route('/feedback', methods=['POST'])
+def submit_feedback():
+    """Feed admin-corrected labels back into the model incrementally
+    
+    Accepts {"message": ..., "is_spam": ...} or {"items": [...]} with the
+    same fields per item, plus an optional "flush": true to apply the
+    logged feedback right away. Every worker applies it within
+    SPAM_REGISTRY_POLL_INTERVAL seconds. Requires a hashing-vectorizer model.
+    """
+    payload = request.get_json(silent=True)
+    if not payload:
+        return jsonify({
+            "error": "Invalid request, JSON body is required"
+        }), 400
+    if not isinstance(payload, dict):
+        return jsonify({
+            "error": "Invalid request, the JSON body must be an object"
+        }), 400
+    
+    items = payload.get('items', [payload] if 'message' in payload else [])
+    if not isinstance(items, list) or not all(
+            isinstance(item, dict) and isinstance(item.get('message'), str)
+            and isinstance(item.get('is_spam'), bool) for item in items):
+        return jsonify({
+            "error": "Invalid request, each item needs a 'message' string and an 'is_spam' boolean"
+        }), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({
+            "error": f"Too many messages, the limit is {MAX_BATCH_SIZE} per request"
+        }), 413
+    
+    detector = get_detector()
+    if detector is None:
+        return model_not_ready()
+    if not detector.is_incremental:
+        return jsonify({
+            "error": "Incremental updates need a model trained with the hashing vectorizer"
+        }), 409
+    
     try:
-        accuracy = detector.train()
-        detector.save_model()
+        version = feedback_learner.add(
+            [item['message'] for item in items],
+            ["Spam" if item['is_spam'] else "Not Spam" for item in items],
+            flush=bool(payload.get('flush'))
+        )
         return jsonify({
             "success": True,
-            "message": "Model trained successfully",
-            "accuracy": accuracy
+            "accepted": len(items),
+            "pending": feedback_learner.pending,
+            "applied": feedback_learner.applied,
+            "model_version": version
         })
     except Exception as e:
         return jsonify({
             "error": str(e)
-        }), 500 
\ No newline at end of file
+        }), 500
+
+@api.route('/models', methods=['GET'])
+def list_models():
+    """Registry versions with their metadata, the current one and shadow stats"""
+    config = sync_shadow()
+    return jsonify({
+        "current": registry.current(),
+        "live": model_store.current.registry_version if model_store.current else None,
+        "versions": registry.list_versions(),
+        "shadow": shadow_state.stats(config) if config else None
+    })
+
+@api.route('/models/<version>/promote', methods=['POST'])
+def promote_model(version):
+    """Make a registry version the live model"""
+    if registry.metadata(version) is None:
+        return jsonify({
+            "error": f"Unknown model version '{version}'"
+        }), 404
+    try:
+        model_version = promote_version(version)
+    except Exception as e:
+        return jsonify({
+            "error": str(e)
+        }), 500
+    
+    # The candidate is live now; nothing left to shadow
+    config = shadow_state.config()
+    if config is not None and config["version"] == version:
+        stop_shared_shadow()
+    
+    return jsonify({
+        "success": True,
+        "current": version,
+        "model_version": model_version
+    })
+
+@api.route('/models/rollback', methods=['POST'])
+def rollback_model():
+    """Go back to the previously promoted registry version"""
+    try:
+        version, model_version = rollback_version()
+    except ValueError as e:
+        return jsonify({
+            "error": str(e)
+        }), 409
+    except Exception as e:
+        return jsonify({
+            "error": str(e)
+        }), 500
+    return jsonify({
+        "success": True,
+        "current": version,
+        "model_version": model_version
+    })
+
+@api.route('/models/<version>/shadow', methods=['POST'])
+def start_shadow(version):
+    """Score a sample of /predict traffic with a candidate version
+    
+    Accepts an optional JSON body with 'sample_rate' (0-1, default 0.1).
+    Every worker process scores its share of the traffic.
+    """
+    options = request.get_json(silent=True) or {}
+    if not isinstance(options, dict):
+        return jsonify({
+            "error": "Invalid request, body must be a JSON object"
+        }), 400
+    try:
+        sample_rate = float(options.get("sample_rate", 0.1))
+    except (TypeError, ValueError):
+        sample_rate = -1
+    if not 0 < sample_rate <= 1:
+        return jsonify({
+            "error": "Invalid request, 'sample_rate' must be in (0, 1]"
+        }), 400
+    
+    global shadow_scorer
+    try:
+        candidate = load_detector(version)
+        with _shadow_lock:
+            config = shadow_state.start(version, sample_rate)
+            previous, shadow_scorer = shadow_scorer, ShadowScorer(candidate, version, sample_rate=sample_rate,
+                                                                  shadow_id=config["id"])
+            if previous is not None:
+                previous.stop()
+            shadow_state.save(shadow_scorer)
+    except KeyError as e:
+        return jsonify({
+            "error": str(e.args[0])
+        }), 404
+    except Exception as e:
+        return jsonify({
+            "error": str(e)
+        }), 500
+    
+    return jsonify({
+        "success": True,
+        "shadow": shadow_state.stats(config)
+    })
+
+@api.route('/models/shadow', methods=['GET'])
+def shadow_status():
+    """Latency and agreement of the shadowed candidate so far, over all workers
+    
+    Other workers' counters are at most REGISTRY_POLL_INTERVAL old.
+    """
+    config = sync_shadow()
+    if config is None:
+        return jsonify({
+            "error": "No shadow model is running"
+        }), 404
+    return jsonify(shadow_state.stats(config))
+
+@api.route('/models/shadow', methods=['DELETE'])
+def stop_shadow():
+    """Stop shadow scoring in every worker and return its final stats"""
+    stats = stop_shared_shadow()
+    if stats is None:
+        return jsonify({
+            "error": "No shadow model is running"
+        }), 404
+    return jsonify(stats)
@@ -1,2 +1,9 @@
 # Import models as needed
-from .spam_detector import SpamDetector 
\ No newline at end of file
+from .spam_detector import SpamDetector
+from .scorer import NumpyScorer
+from .model_store import ModelStore
+from .training import TrainingJobs
+from .feedback import FeedbackLearner
+from .prediction_cache import PredictionCache
+from .registry import ModelRegistry
+from .shadow import ShadowScorer, ShadowState
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process servers only (waitress, --dev)
+    fcntl = None
+
+class FeedbackLog:
+    """Append-only JSON-lines file of labelled messages, shared by worker processes
+
+    It is the single record of admin feedback: every worker appends to it
+    and models are derived from it, so a label is never held only in one
+    process's memory. Positions are byte offsets into the file; appends
+    hold an exclusive lock, so lines written by concurrent workers never
+    interleave. The file grows by one line per label.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def append(self, messages, labels):
+        data = "".join(json.dumps({"message": message, "label": label}) + "\n"
+                       for message, label in zip(messages, labels)).encode("utf-8")
+        with open(self.path, "ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def read(self, offset=0):
+        """(messages, labels, end offset) of the complete lines after offset"""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], [], offset
+        # A line still being written has no newline yet
+        data = data[:data.rfind(b"\n") + 1]
+        messages, labels = [], []
+        for line in data.splitlines():
+            entry = json.loads(line)
+            messages.append(entry["message"])
+            labels.append(entry["label"])
+        return messages, labels, offset + len(data)
+
+class FeedbackLearner:
+    """Folds admin-labelled messages into the live model with partial_fit
+
+    Feedback is appended to a FeedbackLog shared by all worker processes and
+    applied in batches: each batch updates a copy of the live detector and
+    publishes it as a new version, so published models stay immutable. A
+    detector records how far into the log it is (feedback_offset), and
+    replay() brings any detector up to date, so a worker that loads a
+    version checkpointed by another one still applies every label logged
+    since. The updated model is checkpointed as a new, promoted registry
+    version every `checkpoint_every` applied messages or
+    `checkpoint_interval` seconds.
+    """
+
+    def __init__(self, model_store, registry, log_path, batch_size=32, checkpoint_every=256,
+                 checkpoint_interval=300):
+        self.model_store = model_store
+        self.registry = registry
+        self.log = FeedbackLog(log_path)
+        self.batch_size = batch_size
+        self.checkpoint_every = checkpoint_every
+        self.checkpoint_interval = checkpoint_interval
+
+        self._apply_lock = threading.Lock()
+        # Logged messages the live model doesn't include, as of the last look
+        self.pending = 0
+
+    @property
+    def applied(self):
+        """Number of logged messages the live model includes"""
+        detector = self.model_store.current
+        return detector.feedback_applied if detector is not None else 0
+
+    def add(self, messages, labels, flush=False):
+        """Log labelled messages, applying them once a batch is full
+
+        Returns the live model version after any update that was applied.
+        """
+        self.log.append(messages, labels)
+        detector = self.model_store.current
+        if detector is not None:
+            self.pending = len(self.log.read(detector.feedback_offset)[0])
+        if flush or self.pending >= self.batch_size:
+            self.catch_up()
+        return self.model_store.version
+
+    def replay(self, detector):
+        """Bring a loaded detector up to date with the log
+
+        Returns the detector itself, or a writable copy of it when there is
+        feedback to apply: loaded arrays may be read-only memory maps.
+        """
+        messages, labels, end = self.log.read(detector.feedback_offset)
+        if messages and detector.is_incremental:
+            detector = detector.copy()
+            detector.partial_fit(messages, labels)
+            detector.feedback_applied += len(messages)
+        detector.feedback_offset = end
+        return detector
+
+    def catch_up(self):
+        """Apply whatever was logged (by any worker) that the live model lacks"""
+        with self._apply_lock:
+            while True:
+                live = self.model_store.current
+                if live is None or not live.is_incremental:
+                    return
+                messages, labels, end = self.log.read(live.feedback_offset)
+                if not messages:
+                    self.pending = 0
+                    break
+                detector = live.copy()
+                detector.partial_fit(messages, labels)
+                detector.feedback_applied += len(messages)
+                detector.feedback_offset = end
+                # Retry on top of a model that was published meanwhile (e.g. a
+                # finished retrain) instead of overwriting it
+                if self.model_store.publish(detector, expected_version=live.version) is not None:
+                    self.pending = 0
+                    break
+            self._maybe_checkpoint()
+
+    def _maybe_checkpoint(self):
+        detector = self.model_store.current
+        # Only on top of the current version: a worker still on an older one
+        # will reload the newer one (and replay the log) instead
+        if detector.registry_version is None or detector.registry_version != self.registry.current():
+            return
+        base = self.registry.metadata(detector.registry_version) or {}
+        since = detector.feedback_applied - base.get("feedback_applied", 0)
+        if since > 0 and (since >= self.checkpoint_every
+                          or time.time() - base.get("created_at", 0) >= self.checkpoint_interval):
+            self.checkpoint(detector)
+
+    def checkpoint(self, detector=None):
+        """Save the live (or given) detector as a new registry version and promote it"""
+        detector = detector or self.model_store.current
+        version = self.registry.add_detector(detector, {
+            "source": "feedback",
+            # Not evaluated on a holdout set
+            "accuracy": None,
+            "base_version": detector.registry_version,
+            "feedback_applied": detector.feedback_applied,
+            "feedback_offset": detector.feedback_offset
+        })
+        # Set before promoting so the registry watcher sees the live model is current
+        detector.registry_version = version
+        self.registry.promote(version)
+        return version
@@ -0,0 +1,50 @@
+import threading
+import time
+
+class ModelStore:
+    """Holds the live SpamDetector and replaces it in one atomic swap
+
+    Published detectors are treated as immutable: a new model is always a new
+    object. Request handlers read `current` once and use that object for the
+    whole request, so they never see a new vectorizer paired with an old model.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._detector = None
+        self._version = 0
+        self._listeners = []
+
+    @property
+    def current(self):
+        """The live detector, or None before the first publish"""
+        return self._detector
+
+    @property
+    def version(self):
+        """Version number of the live detector (0 before the first publish)"""
+        return self._version
+
+    def subscribe(self, listener):
+        """Call listener(version) after every successful publish"""
+        self._listeners.append(listener)
+
+    def publish(self, detector, expected_version=None):
+        """Make a fully built detector the live one and return its version
+
+        With expected_version set, the swap only happens if the live version
+        is still that one (compare-and-swap); otherwise None is returned.
+        """
+        with self._lock:
+            if expected_version is not None and expected_version != self._version:
+                return None
+            self._version += 1
+            detector.version = self._version
+            detector.published_at = time.time()
+            # A single reference assignment: readers see the old or the new detector
+            self._detector = detector
+            version = self._version
+
+        for listener in self._listeners:
+            listener(version)
+        return version
@@ -0,0 +1,73 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+class PredictionCache:
+    """LRU cache with TTL for predictions, keyed by message hash and model version
+
+    Messages are normalized (lowercased, whitespace collapsed) before hashing.
+    Both vectorizers lowercase and split on word boundaries anyway, so this
+    never changes the prediction but lets reposted copies share an entry.
+    """
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(message):
+        return " ".join(message.lower().split())
+
+    def _key(self, message, version):
+        digest = hashlib.blake2b(self.normalize(message).encode("utf-8"), digest_size=16).digest()
+        return (version, digest)
+
+    def get(self, message, version):
+        """Cached prediction for message under a model version, or None"""
+        if self.maxsize <= 0:
+            return None
+
+        key = self._key(message, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, message, version, result):
+        """Store a prediction, evicting the least recently used entries"""
+        if self.maxsize <= 0:
+            return
+
+        key = self._key(message, version)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self, *args):
+        """Drop every entry; used as a ModelStore listener on model swaps"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from .spam_detector import SpamDetector, replace_file
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process servers only (waitress, --dev)
+    fcntl = None
+
+METADATA_FILENAME = "metadata.json"
+STATE_FILENAME = "registry.json"
+LOCK_FILENAME = "registry.lock"
+
+def file_sha256(path):
+    """Hash of a corpus file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ModelRegistry:
+    """Versioned model artifacts on disk with promote and rollback
+
+    Layout:
+        <root>/versions/v0001/   saved model files + metadata.json
+        <root>/registry.json     {"current": "v0003", "history": ["v0001", "v0002"]}
+
+    Version directories are written once and never modified. Promoting only
+    rewrites registry.json (atomically), so every process serving from the
+    registry can pick up the change by re-reading it. Changes to it hold an
+    exclusive lock on registry.lock, so concurrent promotes and rollbacks
+    from several worker processes don't overwrite each other.
+    """
+
+    def __init__(self, root, max_versions=20):
+        self.root = root
+        self.versions_dir = os.path.join(root, "versions")
+        self.max_versions = max_versions
+        self._lock = threading.Lock()
+        os.makedirs(self.versions_dir, exist_ok=True)
+
+    def path(self, version):
+        return os.path.join(self.versions_dir, version)
+
+    def _read_state(self):
+        try:
+            with open(os.path.join(self.root, STATE_FILENAME)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"current": None, "history": []}
+
+    @contextmanager
+    def _state_lock(self):
+        """Held while registry.json is read, changed and replaced"""
+        with self._lock, open(os.path.join(self.root, LOCK_FILENAME), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write_state(self, state):
+        def write(path):
+            with open(path, "w") as f:
+                json.dump(state, f, indent=2)
+        replace_file(os.path.join(self.root, STATE_FILENAME), write)
+
+    def current(self):
+        """Id of the promoted version, or None"""
+        return self._read_state()["current"]
+
+    def _new_version_dir(self):
+        existing = [int(name[1:]) for name in os.listdir(self.versions_dir) if name.startswith("v")]
+        number = max(existing, default=0) + 1
+        while True:
+            version = f"v{number:04d}"
+            try:
+                # Fails if another process claimed the same number first
+                os.makedirs(self.path(version))
+                return version
+            except FileExistsError:
+                number += 1
+
+    def add_version(self, save, metadata=None):
+        """Create a version by calling save(directory); returns the version id"""
+        version = self._new_version_dir()
+        save(self.path(version))
+        metadata = dict(metadata or {}, version=version, created_at=time.time())
+        with open(os.path.join(self.path(version), METADATA_FILENAME), "w") as f:
+            json.dump(metadata, f, indent=2)
+        self.prune()
+        return version
+
+    def add_detector(self, detector, metadata=None):
+        """Save a trained detector as a new version"""
+        metadata = dict(metadata or {})
+        metadata.setdefault("accuracy", detector.accuracy)
+        metadata.setdefault("vectorizer", "hashing" if detector.is_incremental else "count")
+        return self.add_version(detector.save_model, metadata)
+
+    def metadata(self, version):
+        """Metadata of a version, or None if it doesn't exist"""
+        try:
+            with open(os.path.join(self.path(version), METADATA_FILENAME)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list_versions(self):
+        """Metadata of every complete version, oldest first"""
+        versions = []
+        for name in sorted(os.listdir(self.versions_dir)):
+            metadata = self.metadata(name)
+            if metadata is not None:
+                versions.append(metadata)
+        return versions
+
+    def load(self, version, **load_kwargs):
+        """Load a version into a new SpamDetector"""
+        if self.metadata(version) is None:
+            raise KeyError(f"Unknown model version '{version}'")
+        metadata = self.metadata(version)
+        detector = SpamDetector()
+        detector.load_model(self.path(version), **load_kwargs)
+        detector.registry_version = version
+        detector.accuracy = metadata.get("accuracy")
+        # Versions not derived from feedback (trained, imported) include none of it
+        detector.feedback_offset = metadata.get("feedback_offset", 0)
+        detector.feedback_applied = metadata.get("feedback_applied", 0)
+        return detector
+
+    def promote(self, version):
+        """Make version the current one, remembering the previous for rollback"""
+        with self._state_lock():
+            # Checked under the lock: prune() may be deleting it
+            if self.metadata(version) is None:
+                raise KeyError(f"Unknown model version '{version}'")
+            state = self._read_state()
+            if state["current"] != version:
+                if state["current"] is not None:
+                    state["history"] = (state["history"] + [state["current"]])[-self.max_versions:]
+                state["current"] = version
+                self._write_state(state)
+        return version
+
+    def previous(self):
+        """Id of the version rollback() would return to, or None"""
+        history = self._read_state()["history"]
+        return history[-1] if history else None
+
+    def rollback(self, expected=None):
+        """Return to the previously promoted version
+
+        With expected, only if that is still the previous version (the
+        caller has loaded it meanwhile); raises ValueError otherwise.
+        """
+        with self._state_lock():
+            state = self._read_state()
+            if not state["history"]:
+                raise ValueError("No previous version to roll back to")
+            if expected is not None and state["history"][-1] != expected:
+                raise ValueError("The registry changed meanwhile, roll back again")
+            state["current"] = state["history"].pop()
+            self._write_state(state)
+            return state["current"]
+
+    def prune(self):
+        """Delete the oldest versions beyond max_versions, except current and history"""
+        # Not while another process promotes one of them
+        with self._state_lock():
+            state = self._read_state()
+            keep = set(state["history"]) | {state["current"]}
+            versions = sorted(name for name in os.listdir(self.versions_dir) if name.startswith("v"))
+            for version in versions[:max(0, len(versions) - self.max_versions)]:
+                if version not in keep:
+                    # Processes still mapping these files keep the old inodes
+                    shutil.rmtree(self.path(version), ignore_errors=True)
@@ -0,0 +1,137 @@
+import re
+import time
+import zipfile
+import numpy as np
+
+# Same tokenization as CountVectorizer's defaults (lowercase + token_pattern).
+# Stop words need no special handling: they never made it into the vocabulary.
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+SCORER_FILENAME = "scorer.npz"
+
+def export_scorer(vectorizer, model, path):
+    """Export a fitted CountVectorizer + MultinomialNB as a flat numpy scorer"""
+    vocabulary = getattr(vectorizer, "vocabulary_", None)
+    if vocabulary is None:
+        raise ValueError("Scorer export needs a vectorizer with a fitted vocabulary")
+
+    # Sorted tokens double as the token -> index table (looked up with
+    # searchsorted), so no Python dict has to be rebuilt at load time
+    tokens = sorted(vocabulary)
+    columns = [vocabulary[token] for token in tokens]
+
+    # np.savez stores members uncompressed, which is what lets load_arrays
+    # memory-map them straight out of the archive
+    with open(path, "wb") as f:
+        np.savez(
+            f,
+            tokens=np.array(tokens, dtype=str),
+            feature_log_prob=np.ascontiguousarray(model.feature_log_prob_[:, columns], dtype=np.float32),
+            class_log_prior=model.class_log_prior_.astype(np.float32),
+            classes=np.array(model.classes_, dtype=str)
+        )
+
+def load_arrays(path, mmap_mode=None):
+    """Load every array of an uncompressed .npz, optionally memory-mapped
+
+    np.load ignores mmap_mode for .npz archives, so with mmap_mode set each
+    member is mapped directly at its offset inside the zip file.
+    """
+    if mmap_mode is None:
+        with np.load(path) as archive:
+            return {name: archive[name] for name in archive.files}
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"Cannot memory-map compressed member '{info.filename}'")
+
+            # Skip the local file header (30 fixed bytes + name + extra field)
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(f)
+            else:
+                header = np.lib.format.read_array_header_2_0(f)
+            shape, fortran_order, dtype = header
+            arrays[info.filename[:-len(".npy")]] = np.memmap(
+                path,
+                dtype=dtype,
+                mode=mmap_mode,
+                offset=f.tell(),
+                shape=shape,
+                order="F" if fortran_order else "C"
+            )
+    return arrays
+
+class NumpyScorer:
+    """Multinomial Naive Bayes inference using only numpy
+
+    Scores a message as class_log_prior + sum of feature_log_prob over its
+    tokens, which is exactly what MultinomialNB does with CountVectorizer
+    counts, without importing sklearn or unpickling estimators.
+    """
+
+    def __init__(self, tokens, feature_log_prob, class_log_prior, classes):
+        self.tokens = tokens
+        self.feature_log_prob = feature_log_prob
+        self.class_log_prior = class_log_prior
+        self.classes = classes
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        """Load a scorer exported by export_scorer"""
+        arrays = load_arrays(path, mmap_mode=mmap_mode)
+        return cls(
+            arrays["tokens"],
+            arrays["feature_log_prob"],
+            arrays["class_log_prior"],
+            # Labels are tiny; keep them as plain strings
+            [str(label) for label in arrays["classes"]]
+        )
+
+    def token_indices(self, message):
+        """Feature columns of the in-vocabulary tokens of a message"""
+        tokens = TOKEN_PATTERN.findall(message.lower())
+        if not tokens or len(self.tokens) == 0:
+            return np.empty(0, dtype=np.intp)
+
+        tokens = np.array(tokens, dtype=str)
+        positions = np.searchsorted(self.tokens, tokens)
+        positions[positions == len(self.tokens)] = 0
+        return positions[self.tokens[positions] == tokens]
+
+    def _predict_proba(self, indices):
+        jll = self.class_log_prior.astype(np.float64)
+        if len(indices):
+            jll = jll + self.feature_log_prob[:, indices].sum(axis=1, dtype=np.float64)
+        probabilities = np.exp(jll - jll.max())
+        return probabilities / probabilities.sum()
+
+    def predict(self, message, timings=None):
+        """Predict if a message is spam or not
+
+        If a timings dict is given, the seconds spent in the 'vectorize'
+        (tokenize + lookup) and 'score' stages are added to it.
+        """
+        start = time.perf_counter()
+        indices = self.token_indices(message)
+        vectorized = time.perf_counter()
+        probabilities = self._predict_proba(indices)
+        best = int(probabilities.argmax())
+        if timings is not None:
+            timings["vectorize"] = timings.get("vectorize", 0.0) + vectorized - start
+            timings["score"] = timings.get("score", 0.0) + time.perf_counter() - vectorized
+
+        return {
+            "prediction": self.classes[best],
+            "confidence": float(probabilities[best])
+        }
+
+    def predict_batch(self, messages, timings=None):
+        """Predict spam labels for a list of messages"""
+        return [self.predict(message, timings) for message in messages]
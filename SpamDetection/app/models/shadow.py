@@ -0,0 +1,199 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import deque
+import numpy as np
+from .spam_detector import replace_file
+
+class ShadowScorer:
+    """Scores a sample of live traffic with a candidate model, off the request path
+
+    Request handlers only call offer(), which samples and enqueues without
+    blocking; a single background thread runs the candidate and records
+    latency and agreement with the live prediction. When the queue is full,
+    samples are dropped rather than slowing requests down.
+    """
+
+    # Latency samples kept for percentiles
+    WINDOW = 1000
+
+    def __init__(self, detector, version, sample_rate=0.1, max_queue=1000, shadow_id=None):
+        self.detector = detector
+        self.version = version
+        self.sample_rate = sample_rate
+        # The ShadowState run this scorer belongs to
+        self.shadow_id = shadow_id
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._live_latencies = deque(maxlen=self.WINDOW)
+        self._shadow_latencies = deque(maxlen=self.WINDOW)
+        self.scored = 0
+        self.agreed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.started_at = time.time()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=f"shadow-{version}", daemon=True)
+        self._thread.start()
+
+    def offer(self, message, live_prediction, live_seconds=None):
+        """Maybe queue a live request for shadow scoring; never blocks"""
+        if self._stopped or random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((message, live_prediction, live_seconds))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            message, live_prediction, live_seconds = item
+            try:
+                start = time.perf_counter()
+                result = self.detector.predict(message)
+                elapsed = time.perf_counter() - start
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                continue
+            with self._lock:
+                self.scored += 1
+                self.agreed += result["prediction"] == live_prediction
+                self._shadow_latencies.append(elapsed)
+                if live_seconds is not None:
+                    self._live_latencies.append(live_seconds)
+
+    def stop(self):
+        self._stopped = True
+        self._queue.put(None)
+
+    @staticmethod
+    def _percentiles(samples):
+        if not samples:
+            return None
+        values = np.asarray(samples) * 1000
+        return {
+            "p50_ms": float(np.percentile(values, 50)),
+            "p99_ms": float(np.percentile(values, 99))
+        }
+
+    def snapshot(self):
+        """Counters and raw latency samples, for merging across processes"""
+        with self._lock:
+            return {
+                "shadow_id": self.shadow_id,
+                "scored": self.scored,
+                "agreed": self.agreed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "queued": self._queue.qsize(),
+                "live_latencies": list(self._live_latencies),
+                "shadow_latencies": list(self._shadow_latencies)
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "sample_rate": self.sample_rate,
+                "scored": self.scored,
+                "agreement": self.agreed / self.scored if self.scored else None,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "queued": self._queue.qsize(),
+                "live_latency": self._percentiles(list(self._live_latencies)),
+                "shadow_latency": self._percentiles(list(self._shadow_latencies)),
+                "started_at": self.started_at
+            }
+
+class ShadowState:
+    """Shadow scoring shared by all worker processes through the registry directory
+
+    Layout:
+        <root>/config.json        {"id", "version", "sample_rate", "started_at"}
+        <root>/stats-<pid>.json   one worker's ShadowScorer.snapshot()
+
+    The config says what every worker should shadow; each worker runs its
+    own ShadowScorer on its share of the traffic and saves its snapshot, and
+    stats() merges the snapshots of the current run.
+    """
+
+    CONFIG_FILENAME = "config.json"
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _write(self, filename, data):
+        def write(path):
+            with open(path, "w") as f:
+                json.dump(data, f)
+        replace_file(os.path.join(self.root, filename), write)
+
+    def _read(self, filename):
+        try:
+            with open(os.path.join(self.root, filename)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _stats_files(self):
+        return [name for name in os.listdir(self.root) if name.startswith("stats-") and name.endswith(".json")]
+
+    def config(self):
+        """The running shadow's config, or None"""
+        return self._read(self.CONFIG_FILENAME)
+
+    def start(self, version, sample_rate):
+        """Shadow version from now on, replacing any previous run and its stats"""
+        config = {"id": uuid.uuid4().hex, "version": version, "sample_rate": sample_rate, "started_at": time.time()}
+        self._write(self.CONFIG_FILENAME, config)
+        for name in self._stats_files():
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+        return config
+
+    def stop(self):
+        """End the running shadow; returns its config, or None if there was none"""
+        config = self.config()
+        try:
+            os.remove(os.path.join(self.root, self.CONFIG_FILENAME))
+        except FileNotFoundError:
+            pass
+        return config
+
+    def save(self, scorer):
+        """Publish this process's counters for a scorer of the current run"""
+        self._write(f"stats-{os.getpid()}.json", scorer.snapshot())
+
+    def stats(self, config):
+        """Stats of a run over every worker that saved a snapshot for it"""
+        snapshots = [snapshot for snapshot in map(self._read, self._stats_files())
+                     if snapshot and snapshot["shadow_id"] == config["id"]]
+        totals = {key: sum(snapshot[key] for snapshot in snapshots)
+                  for key in ("scored", "agreed", "dropped", "errors", "queued")}
+        return {
+            "version": config["version"],
+            "sample_rate": config["sample_rate"],
+            "scored": totals["scored"],
+            "agreement": totals["agreed"] / totals["scored"] if totals["scored"] else None,
+            "dropped": totals["dropped"],
+            "errors": totals["errors"],
+            "queued": totals["queued"],
+            "live_latency": ShadowScorer._percentiles(
+                [value for snapshot in snapshots for value in snapshot["live_latencies"]]),
+            "shadow_latency": ShadowScorer._percentiles(
+                [value for snapshot in snapshots for value in snapshot["shadow_latencies"]]),
+            "started_at": config["started_at"],
+            "workers": len(snapshots)
+        }
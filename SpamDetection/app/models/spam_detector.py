@@ -1,18 +1,78 @@
-import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.naive_bayes import MultinomialNB
-import joblib
+import copy
+import numpy as np
 import os
+import time
+from .scorer import NumpyScorer, SCORER_FILENAME, export_scorer
+from .streaming import BloomFilter, iter_unique_chunks
+
+# pandas, sklearn and joblib are imported where they are used, so serving
+# from the exported numpy scorer never loads them
+
+# Size of the fixed feature space used by the hashing vectorizer
+HASHING_N_FEATURES = 2 ** 16
+
+# Every label the model can produce, needed up front by partial_fit
+CLASSES = ["Not Spam", "Spam"]
+
+def build_vectorizer(vectorizer_type="count", n_features=HASHING_N_FEATURES):
+    """Create an unfitted vectorizer of the given type ('count' or 'hashing')"""
+    from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+    
+    if vectorizer_type == "count":
+        return CountVectorizer(stop_words='english')
+    if vectorizer_type == "hashing":
+        # Raw non-negative token counts, matching what MultinomialNB expects
+        # from CountVectorizer, but stateless: no vocabulary to fit or pickle
+        return HashingVectorizer(
+            stop_words='english',
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None
+        )
+    raise ValueError(f"Unknown vectorizer type '{vectorizer_type}', expected 'count' or 'hashing'")
+
+def replace_file(path, write):
+    """Write a file through a temporary sibling and rename it into place
+    
+    Processes that memory-mapped the old file keep reading the old inode
+    instead of seeing it truncated underneath them.
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 class SpamDetector:
     def __init__(self):
         self.model = None
         self.vectorizer = None
         self.accuracy = None
+        # Row counts and throughput of the last train_streaming() run
+        self.training_stats = None
+        # Registry version this detector was loaded from or derived from
+        self.registry_version = None
+        # Feedback included from the shared FeedbackLog: bytes read and messages applied
+        self.feedback_offset = 0
+        self.feedback_applied = 0
+        # Set by load_model(use_scorer=True) to serve without sklearn
+        self.scorer = None
+        # Score straight from the fitted Naive Bayes parameters instead of
+        # going through sklearn's predict/predict_proba
+        self.fast_inference = True
     
-    def train(self, data_path="./data/spam.csv"):
-        """Train the spam detection model"""
+    def train(self, data_path="./data/spam.csv", vectorizer_type="count", n_features=HASHING_N_FEATURES):
+        """Train the spam detection model
+        
+        vectorizer_type selects the feature pipeline: 'count' fits a vocabulary,
+        'hashing' maps tokens into a fixed space of n_features columns.
+        """
+        import pandas as pd
+        from sklearn.model_selection import train_test_split
+        from sklearn.naive_bayes import MultinomialNB
+        
         # Load and preprocess data
         data = pd.read_csv(data_path)
         data.drop_duplicates(inplace=True)
@@ -25,48 +85,222 @@ class SpamDetector:
         message_train, message_test, cat_train, cat_test = train_test_split(message, cat, test_size=0.2, random_state=42)
         
         # Vectorize text
-        self.vectorizer = CountVectorizer(stop_words='english')
+        self.vectorizer = build_vectorizer(vectorizer_type, n_features)
         message_train_cv = self.vectorizer.fit_transform(message_train)
         message_test_cv = self.vectorizer.transform(message_test)
         
         # Train model
         self.model = MultinomialNB()
         self.model.fit(message_train_cv, cat_train)
+        self.scorer = None
         
         # Calculate accuracy
         self.accuracy = self.model.score(message_test_cv, cat_test)
         return self.accuracy
     
-    def predict(self, message):
-        """Predict if a message is spam or not"""
+    def train_streaming(self, data_path="./data/spam.csv", chunksize=10000, n_features=HASHING_N_FEATURES,
+                        test_fraction=0.2, dedup_capacity=10_000_000):
+        """Train a hashing model from a CSV of any size in bounded memory
+        
+        The file is read in chunks; duplicates are dropped with a fixed-size
+        Bloom filter and each chunk is fed to partial_fit. Rows whose hash
+        falls in the test_fraction bucket are held out and scored in a
+        second pass. Returns the holdout accuracy; row counts and rows/sec
+        end up in training_stats.
+        """
+        from sklearn.naive_bayes import MultinomialNB
+        
+        vectorizer = build_vectorizer("hashing", n_features)
+        model = MultinomialNB()
+        test_buckets = np.uint64(int(test_fraction * 1000))
+        stats = {"rows_trained": 0, "rows_tested": 0, "duplicates": 0}
+        
+        start = time.perf_counter()
+        for messages, labels, h1, duplicates in iter_unique_chunks(data_path, chunksize, BloomFilter(dedup_capacity)):
+            stats["duplicates"] += duplicates
+            train = h1 % np.uint64(1000) >= test_buckets
+            stats["rows_tested"] += int((~train).sum())
+            if train.any():
+                model.partial_fit(vectorizer.transform(messages[train]), labels[train], classes=CLASSES)
+                stats["rows_trained"] += int(train.sum())
+        train_seconds = time.perf_counter() - start
+        
+        if stats["rows_trained"] == 0:
+            raise ValueError(f"No usable training rows in {data_path}")
+        
+        # Second pass over the held-out rows only, deduplicated the same way
+        correct = 0
+        for messages, labels, h1, _ in iter_unique_chunks(data_path, chunksize, BloomFilter(dedup_capacity)):
+            test = h1 % np.uint64(1000) < test_buckets
+            if test.any():
+                correct += int((model.predict(vectorizer.transform(messages[test])) == labels[test]).sum())
+        
+        rows = stats["rows_trained"] + stats["rows_tested"] + stats["duplicates"]
+        stats["train_seconds"] = train_seconds
+        stats["rows_per_sec"] = rows / train_seconds if train_seconds else 0.0
+        
+        self.vectorizer = vectorizer
+        self.model = model
+        self.scorer = None
+        self.accuracy = correct / stats["rows_tested"] if stats["rows_tested"] else None
+        self.training_stats = stats
+        return self.accuracy
+    
+    @property
+    def is_incremental(self):
+        """Whether partial_fit can update this detector"""
+        return (self.scorer is None and self.model is not None
+                and self.vectorizer is not None and not hasattr(self.vectorizer, "vocabulary_"))
+    
+    def partial_fit(self, messages, labels, n_features=HASHING_N_FEATURES):
+        """Update the model in place with newly labelled messages
+        
+        Works on the fixed hashed feature space, so the cost depends only on
+        the new messages. An untrained detector starts a new hashing model.
+        """
+        from sklearn.naive_bayes import MultinomialNB
+        
+        if self.vectorizer is None:
+            self.vectorizer = build_vectorizer("hashing", n_features)
+            self.model = MultinomialNB()
+        elif not self.is_incremental:
+            raise ValueError("Incremental updates need a model trained with vectorizer_type='hashing'")
+        
+        self.model.partial_fit(self.vectorizer.transform(messages), labels, classes=CLASSES)
+        self.scorer = None
+    
+    def copy(self):
+        """Independent, writable copy of this detector for building a new version"""
+        if self.scorer is not None:
+            raise ValueError("A detector loaded as a numpy scorer cannot be copied for updates")
+        
+        # deepcopy also turns read-only memory-mapped arrays into private ones
+        detector = SpamDetector()
+        detector.model = copy.deepcopy(self.model)
+        detector.vectorizer = self.vectorizer
+        detector.accuracy = self.accuracy
+        detector.fast_inference = self.fast_inference
+        detector.registry_version = self.registry_version
+        detector.feedback_offset = self.feedback_offset
+        detector.feedback_applied = self.feedback_applied
+        return detector
+    
+    def predict(self, message, timings=None):
+        """Predict if a message is spam or not
+        
+        If a timings dict is given, the seconds spent in the 'vectorize' and
+        'score' stages are added to it.
+        """
+        if self.scorer is not None:
+            return self.scorer.predict(message, timings)
         if not self.model or not self.vectorizer:
             raise ValueError("Model not trained. Call train() first.")
         
+        start = time.perf_counter()
         vectorized_message = self.vectorizer.transform([message])
-        prediction = self.model.predict(vectorized_message)[0]
-        confidence = max(self.model.predict_proba(vectorized_message)[0])
+        vectorized = time.perf_counter()
+        probabilities = self._predict_proba(vectorized_message)[0]
+        best = probabilities.argmax()
+        if timings is not None:
+            timings["vectorize"] = timings.get("vectorize", 0.0) + vectorized - start
+            timings["score"] = timings.get("score", 0.0) + time.perf_counter() - vectorized
         
         return {
-            "prediction": prediction,
-            "confidence": float(confidence)
+            "prediction": self.model.classes_[best],
+            "confidence": float(probabilities[best])
         }
     
+    def predict_batch(self, messages, timings=None):
+        """Predict spam labels for a list of messages in a single pass"""
+        if self.scorer is not None:
+            return self.scorer.predict_batch(messages, timings)
+        if not self.model or not self.vectorizer:
+            raise ValueError("Model not trained. Call train() first.")
+        
+        if not messages:
+            return []
+        
+        # One sparse matrix and one probability evaluation for the whole batch
+        start = time.perf_counter()
+        vectorized_messages = self.vectorizer.transform(messages)
+        vectorized = time.perf_counter()
+        probabilities = self._predict_proba(vectorized_messages)
+        best = probabilities.argmax(axis=1)
+        labels = self.model.classes_[best]
+        confidences = probabilities[np.arange(len(best)), best]
+        if timings is not None:
+            timings["vectorize"] = timings.get("vectorize", 0.0) + vectorized - start
+            timings["score"] = timings.get("score", 0.0) + time.perf_counter() - vectorized
+        
+        return [
+            {
+                "prediction": label,
+                "confidence": float(confidence)
+            }
+            for label, confidence in zip(labels, confidences)
+        ]
+    
+    def _predict_proba(self, vectorized_messages):
+        """Class probabilities from a single evaluation of the joint log-likelihood"""
+        if not self.fast_inference:
+            return self.model.predict_proba(vectorized_messages)
+        
+        # The vectorizer output is already a valid non-negative CSR matrix with
+        # the model's feature count, so sklearn's per-call validation is skipped
+        jll = vectorized_messages @ self.model.feature_log_prob_.T
+        jll += self.model.class_log_prior_
+        jll -= jll.max(axis=1, keepdims=True)
+        probabilities = np.exp(jll)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return probabilities
+    
     def save_model(self, model_dir="./app/models/saved"):
-        """Save the trained model and vectorizer"""
+        """Save the trained model and vectorizer
+        
+        Vocabulary-based models are also exported as a numpy scorer
+        (scorer.npz) that load_model(use_scorer=True) can serve from.
+        """
+        import joblib
+        
         if not self.model or not self.vectorizer:
             raise ValueError("Model not trained. Call train() first.")
             
         os.makedirs(model_dir, exist_ok=True)
-        joblib.dump(self.model, os.path.join(model_dir, "spam_model.pkl"))
-        joblib.dump(self.vectorizer, os.path.join(model_dir, "vectorizer.pkl"))
+        # Uncompressed joblib files keep the numpy arrays loadable with mmap_mode
+        replace_file(os.path.join(model_dir, "spam_model.pkl"), lambda path: joblib.dump(self.model, path))
+        replace_file(os.path.join(model_dir, "vectorizer.pkl"), lambda path: joblib.dump(self.vectorizer, path))
+        
+        scorer_path = os.path.join(model_dir, SCORER_FILENAME)
+        if hasattr(self.vectorizer, "vocabulary_"):
+            replace_file(scorer_path, lambda path: export_scorer(self.vectorizer, self.model, path))
+        elif os.path.exists(scorer_path):
+            # Hashing models have no token table; don't leave a stale scorer behind
+            os.remove(scorer_path)
     
-    def load_model(self, model_dir="./app/models/saved"):
-        """Load a trained model and vectorizer"""
+    def load_model(self, model_dir="./app/models/saved", use_scorer=False, mmap_mode=None):
+        """Load a trained model and vectorizer
+        
+        With use_scorer=True the exported numpy scorer is loaded instead of
+        the pickles when it exists, so sklearn is never imported.
+        
+        With mmap_mode='r' the model arrays are memory-mapped read-only, so
+        every process serving the same files shares one page-cache copy.
+        """
+        scorer_path = os.path.join(model_dir, SCORER_FILENAME)
+        if use_scorer and os.path.exists(scorer_path):
+            self.scorer = NumpyScorer.load(scorer_path, mmap_mode=mmap_mode)
+            self.model = None
+            self.vectorizer = None
+            return
+        
+        import joblib
+        
         model_path = os.path.join(model_dir, "spam_model.pkl")
         vectorizer_path = os.path.join(model_dir, "vectorizer.pkl")
         
         if not os.path.exists(model_path) or not os.path.exists(vectorizer_path):
             raise FileNotFoundError("Model files not found. Train and save the model first.")
             
-        self.model = joblib.load(model_path)
-        self.vectorizer = joblib.load(vectorizer_path) 
\ No newline at end of file
+        self.model = joblib.load(model_path, mmap_mode=mmap_mode)
+        self.vectorizer = joblib.load(vectorizer_path, mmap_mode=mmap_mode)
+        self.scorer = None 
\ No newline at end of file
@@ -0,0 +1,162 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from .registry import ModelRegistry, file_sha256
+from .spam_detector import SpamDetector, replace_file
+
+def train_and_save(data_path, registry_root, train_kwargs):
+    """Train a fresh detector and add it to the registry; runs in a training process
+    
+    train_kwargs go to SpamDetector.train, or to train_streaming when they
+    include streaming=True.
+    """
+    detector = SpamDetector()
+    train_kwargs = dict(train_kwargs)
+    start = time.perf_counter()
+    if train_kwargs.pop("streaming", False):
+        accuracy = detector.train_streaming(data_path, **train_kwargs)
+    else:
+        accuracy = detector.train(data_path, **train_kwargs)
+    train_seconds = time.perf_counter() - start
+    
+    version = ModelRegistry(registry_root).add_detector(detector, {
+        "source": "train",
+        "train_seconds": train_seconds,
+        "training_stats": detector.training_stats,
+        "corpus_path": data_path,
+        "corpus_sha256": file_sha256(data_path)
+    })
+    return {
+        "registry_version": version,
+        "accuracy": accuracy,
+        "train_seconds": train_seconds,
+        "training_stats": detector.training_stats
+    }
+
+class TrainingJobs:
+    """Runs model training in a separate process and tracks job status
+
+    Training never runs on a request thread (or under this process's GIL), so
+    prediction latency stays flat while a model is being fitted. The result is
+    added to the model registry; when a job finishes,
+    `on_trained(registry_version, promote)` is called to (optionally) promote
+    and publish it, returning the live model version or None.
+
+    Job status is kept as one JSON file per job in `jobs_dir`, replaced
+    atomically on every change, so any worker process can report on a job
+    submitted to another.
+    """
+
+    # Finished jobs kept around for status lookups
+    MAX_FINISHED_JOBS = 50
+
+    def __init__(self, on_trained, jobs_dir, max_workers=1):
+        self._on_trained = on_trained
+        self._jobs_dir = jobs_dir
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn rather than fork: the serving process is multi-threaded
+            self._executor = ProcessPoolExecutor(
+                max_workers=self._max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _path(self, job_id):
+        return os.path.join(self._jobs_dir, f"{job_id}.json")
+
+    def _save(self, job):
+        def write(path):
+            with open(path, "w") as f:
+                json.dump(job, f, indent=2)
+        replace_file(self._path(job["job_id"]), write)
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def submit(self, data_path, registry_root, train_kwargs=None, promote=True):
+        """Queue a training run and return its job id"""
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "pending",
+            "submitted_at": time.time(),
+            "finished_at": None,
+            "accuracy": None,
+            "train_seconds": None,
+            "training_stats": None,
+            "registry_version": None,
+            "promoted": promote,
+            "model_version": None,
+            "error": None,
+            # Worker process that runs the job and publishes its result
+            "pid": os.getpid()
+        }
+        with self._lock:
+            self._prune()
+            future = self._get_executor().submit(train_and_save, data_path, registry_root, train_kwargs or {})
+            job["status"] = "running"
+            self._save(job)
+        future.add_done_callback(lambda f: self._finish(job, f))
+        return job_id
+
+    def _finish(self, job, future):
+        try:
+            result = future.result()
+            job["accuracy"] = result["accuracy"]
+            job["train_seconds"] = result["train_seconds"]
+            job["training_stats"] = result["training_stats"]
+            job["registry_version"] = result["registry_version"]
+            job["model_version"] = self._on_trained(result["registry_version"], job["promoted"])
+            job["status"] = "succeeded"
+        except Exception as e:
+            job["error"] = str(e)
+            job["status"] = "failed"
+        job["finished_at"] = time.time()
+        with self._lock:
+            self._save(job)
+
+    def _prune(self):
+        jobs = [self._read(os.path.join(self._jobs_dir, name))
+                for name in os.listdir(self._jobs_dir) if name.endswith(".json")]
+        finished = [j for j in jobs if j and j["finished_at"] is not None]
+        finished.sort(key=lambda j: j["finished_at"])
+        for job in finished[:max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            try:
+                os.remove(self._path(job["job_id"]))
+            except FileNotFoundError:
+                pass
+
+    def get(self, job_id):
+        """Snapshot of a job's status, or None if unknown"""
+        # Job ids are uuid4 hex: anything else can't name a job file
+        if not (len(job_id) == 32 and all(c in "0123456789abcdef" for c in job_id)):
+            return None
+        job = self._read(self._path(job_id))
+        if job and job["status"] == "running" and not _process_alive(job["pid"]):
+            # The worker running it exited (e.g. restarted by gunicorn) before it finished
+            job.update(status="failed", error="The worker process running the job exited")
+        return job
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists, but belongs to someone else
+        return True
+    return True
@@ -0,0 +1,135 @@
+"""Load test for POST /api/predict.
+
+Drives a running server with concurrent keep-alive clients, or starts the
+server itself in each requested mode and compares them.
+
+Run from the SpamDetection directory:
+    python benchmarks/load_test.py --url http://127.0.0.1:5000
+    python benchmarks/load_test.py --spawn dev waitress gunicorn --duration 10
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+SERVER_COMMANDS = {
+    "dev": [sys.executable, "run.py", "--dev"],
+    "waitress": [sys.executable, "run.py"],
+    "gunicorn": ["gunicorn", "-c", "gunicorn.conf.py", "run:app"],
+}
+
+def client_loop(host, port, messages, duration, offset):
+    """One client: reuse a single connection and post for duration seconds"""
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    headers = {"Content-Type": "application/json"}
+    i = offset
+    while time.perf_counter() < deadline:
+        # Distinct messages so the prediction cache doesn't flatter the result
+        body = json.dumps({"message": f"{messages[i % len(messages)]} #{i}"})
+        i += 1
+        start = time.perf_counter()
+        try:
+            connection.request("POST", "/api/predict", body, headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+    return latencies, errors
+
+def run_load(url, messages, concurrency, duration):
+    parsed = urlparse(url)
+    latencies, errors = [], []
+    # One process per client so the load generator isn't limited by its own GIL
+    with ProcessPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(client_loop, parsed.hostname, parsed.port or 80, messages, duration, n * 100000)
+            for n in range(concurrency)
+        ]
+        for future in futures:
+            client_latencies, client_errors = future.result()
+            latencies.extend(client_latencies)
+            errors.extend(client_errors)
+
+    values = np.asarray(latencies or [0.0]) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+    }
+
+def wait_until_up(url, timeout=60):
+    parsed = urlparse(url)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=1)
+            connection.request("GET", "/api/ready")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up")
+
+def spawn_and_run(mode, port, messages, concurrency, duration):
+    env = dict(os.environ, SPAM_PORT=str(port), SPAM_BIND=f"127.0.0.1:{port}")
+    command = SERVER_COMMANDS[mode]
+    if mode != "gunicorn":
+        command = command + ["--host", "127.0.0.1", "--port", str(port)]
+    # Own session so the dev server's reloader child is stopped with it
+    server = subprocess.Popen(command, env=env, start_new_session=True,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(url)
+        return run_load(url, messages, concurrency, duration)
+    finally:
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="load-test an already running server")
+    parser.add_argument("--spawn", nargs="+", choices=sorted(SERVER_COMMANDS),
+                        help="start the server in each mode and load-test it")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--data", default="./data/spam.csv")
+    args = parser.parse_args()
+
+    messages = pd.read_csv(args.data)["Message"].dropna().tolist()
+
+    results = {}
+    if args.url:
+        results[args.url] = run_load(args.url, messages, args.concurrency, args.duration)
+    for mode in args.spawn or []:
+        results[mode] = spawn_and_run(mode, args.port, messages, args.concurrency, args.duration)
+    if not results:
+        parser.error("pass --url and/or --spawn")
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Microbenchmark for the /api/predict hot path.
+
+Compares the sklearn predict + predict_proba path with the single-pass
+fast path of SpamDetector, both directly and through the Flask test client,
+and measures the overhead of metrics recording on the HTTP path.
+
+Run from the SpamDetection directory:
+    python benchmarks/predict_latency.py --repeat 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import SpamDetector
+
+def percentiles(samples):
+    """p50/p99/mean of a list of durations, in microseconds"""
+    values = np.asarray(samples) * 1e6
+    return {
+        "p50_us": round(float(np.percentile(values, 50)), 1),
+        "p99_us": round(float(np.percentile(values, 99)), 1),
+        "mean_us": round(float(values.mean()), 1),
+    }
+
+def time_calls(func, messages, repeat):
+    """Time func(message) over repeat messages drawn round-robin"""
+    samples = []
+    for i in range(repeat):
+        message = messages[i % len(messages)]
+        start = time.perf_counter()
+        func(message)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def legacy_predict(detector):
+    """The original two-pass predict, kept here as the baseline"""
+    def predict(message):
+        vectorized_message = detector.vectorizer.transform([message])
+        prediction = detector.model.predict(vectorized_message)[0]
+        confidence = max(detector.model.predict_proba(vectorized_message)[0])
+        return {"prediction": prediction, "confidence": float(confidence)}
+    return predict
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="./data/spam.csv")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    messages = pd.read_csv(args.data)["Message"].dropna().tolist()
+
+    detector = SpamDetector()
+    detector.train(args.data)
+
+    baseline = legacy_predict(detector)
+    # Warm up both paths so first-call costs don't land in the samples
+    time_calls(baseline, messages, 100)
+    time_calls(detector.predict, messages, 100)
+
+    results = {
+        "legacy": percentiles(time_calls(baseline, messages, args.repeat)),
+        "fast": percentiles(time_calls(detector.predict, messages, args.repeat)),
+    }
+
+    client = None
+    try:
+        from app import create_app
+        from app.api import routes
+        routes.model_store.publish(detector)
+        client = create_app().test_client()
+    except Exception as e:
+        print(f"Skipping HTTP measurements: {e}")
+
+    if client is not None:
+        def http_predict(message):
+            client.post("/api/predict", json={"message": message})
+
+        # Through HTTP the baseline is sklearn's validated predict_proba
+        detector.fast_inference = False
+        results["http_sklearn"] = percentiles(time_calls(http_predict, messages, args.repeat))
+        detector.fast_inference = True
+
+        # Alternate metrics on/off in small blocks so drift hits both equally
+        with_metrics, without_metrics = [], []
+        for _ in range(0, args.repeat, 100):
+            with_metrics += time_calls(http_predict, messages, 100)
+            routes.metrics.enabled = False
+            without_metrics += time_calls(http_predict, messages, 100)
+            routes.metrics.enabled = True
+        results["http_fast"] = percentiles(with_metrics)
+        results["http_no_metrics"] = percentiles(without_metrics)
+
+    for name, stats in results.items():
+        print(f"{name:15s} p50={stats['p50_us']:8.1f}us  p99={stats['p99_us']:8.1f}us  mean={stats['mean_us']:8.1f}us")
+
+    if "http_no_metrics" in results:
+        overhead = results["http_fast"]["mean_us"] / results["http_no_metrics"]["mean_us"] - 1
+        print(f"metrics overhead: {overhead:+.1%} of mean /api/predict latency")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""Benchmark and accuracy-regression suite for the spam detection service.
+
+Measures startup (import, create_app and time-to-ready), training time,
+peak RSS and accuracy (on data/spam.csv and on synthetic corpora scaled up
+from it), model load time, single and batch inference latency percentiles
+and HTTP throughput through the Flask test client. Results are written as JSON; with --baseline the run fails when a
+metric regresses beyond the allowed tolerance.
+
+Run from the SpamDetection directory:
+    python benchmarks/run_benchmarks.py --output bench.json
+    python benchmarks/run_benchmarks.py --baseline bench.json --max-slowdown 1.25
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from app.models import SpamDetector, NumpyScorer
+from app.models.scorer import SCORER_FILENAME
+from predict_latency import percentiles, time_calls
+
+TRAIN_METHODS = ("count", "hashing", "streaming")
+
+# Metric name suffixes and whether a larger value is better
+HIGHER_IS_BETTER = ("accuracy", "_rps", "rows_per_sec", "messages_per_sec")
+LOWER_IS_BETTER = ("_seconds", "_ms", "_us", "_mb")
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is in KiB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def make_corpus(data_path, scale, out_dir):
+    """Write data_path repeated scale times, each copy made unique by a suffix"""
+    if scale == 1:
+        return data_path
+    path = os.path.join(out_dir, f"spam_x{scale}.csv")
+    data = pd.read_csv(data_path)
+    for i in range(scale):
+        copy = data.copy()
+        copy["Message"] = copy["Message"] + f" ref{i}"
+        copy.to_csv(path, mode="w" if i == 0 else "a", header=i == 0, index=False)
+    return path
+
+def train_worker(data_path, method):
+    """Train once in this (fresh) process and report time, accuracy and peak RSS"""
+    # SpamDetector imports sklearn lazily; keep that out of the timing
+    import sklearn.feature_extraction.text
+    import sklearn.naive_bayes
+
+    detector = SpamDetector()
+    start = time.perf_counter()
+    if method == "streaming":
+        accuracy = detector.train_streaming(data_path)
+    else:
+        accuracy = detector.train(data_path, vectorizer_type=method)
+    seconds = time.perf_counter() - start
+    rows = sum(1 for _ in open(data_path, encoding="utf-8", errors="ignore")) - 1
+    return {
+        "train_seconds": seconds,
+        "accuracy": accuracy,
+        "peak_rss_mb": peak_rss_mb(),
+        "rows_per_sec": rows / seconds,
+    }
+
+# Runs in a fresh interpreter so nothing is imported before the timer starts
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app(warmup=sys.argv[1])
+created = time.perf_counter()
+client = app.test_client()
+if sys.argv[1] == "lazy":
+    # Nothing loads until a request needs the model
+    client.post("/api/predict", json={"message": "warm up"})
+while client.get("/api/ready").status_code != 200:
+    time.sleep(0.002)
+ready = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - start,
+    "create_app_seconds": created - imported,
+    "ready_seconds": ready - start,
+}))
+"""
+
+def bench_startup(modes):
+    """Import, create_app() and time-to-ready per warm-up mode"""
+    metrics = {}
+    for mode in modes:
+        for backend in ("sklearn", "numpy"):
+            output = subprocess.run(
+                [sys.executable, "-c", STARTUP_SCRIPT, mode],
+                cwd=os.path.dirname(BENCH_DIR), env=dict(os.environ, SPAM_INFERENCE=backend),
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            for name, value in result.items():
+                metrics[f"startup.{mode}.{backend}.{name}"] = value
+    return metrics
+
+def bench_training(data_path, scales, methods, work_dir):
+    """Each run in its own process so peak RSS isn't polluted by earlier runs"""
+    metrics = {}
+    for scale in scales:
+        corpus = make_corpus(data_path, scale, work_dir)
+        for method in methods:
+            output = subprocess.run(
+                [sys.executable, __file__, "--worker", "train", "--data", corpus, "--method", method],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            for name, value in result.items():
+                metrics[f"train.{method}.x{scale}.{name}"] = value
+            print(f"  train {method:9s} x{scale:<4d} {result['train_seconds']:7.2f}s "
+                  f"acc={result['accuracy']:.4f} rss={result['peak_rss_mb']:.0f}MB", file=sys.stderr)
+    return metrics
+
+def bench_loading(detectors, work_dir):
+    metrics = {}
+    for method, detector in detectors.items():
+        model_dir = os.path.join(work_dir, f"model_{method}")
+        detector.save_model(model_dir)
+        variants = {"sklearn": {}, "sklearn_mmap": {"mmap_mode": "r"}}
+        if os.path.exists(os.path.join(model_dir, SCORER_FILENAME)):
+            variants["scorer"] = {"use_scorer": True}
+            variants["scorer_mmap"] = {"use_scorer": True, "mmap_mode": "r"}
+        for name, kwargs in variants.items():
+            samples = []
+            for _ in range(5):
+                start = time.perf_counter()
+                SpamDetector().load_model(model_dir, **kwargs)
+                samples.append(time.perf_counter() - start)
+            metrics[f"load.{method}.{name}.p50_ms"] = float(np.median(samples)) * 1000
+        size = sum(os.path.getsize(os.path.join(model_dir, f)) for f in os.listdir(model_dir))
+        metrics[f"load.{method}.artifacts_mb"] = size / 2 ** 20
+    return metrics
+
+def bench_inference(detectors, messages, repeat, work_dir):
+    metrics = {}
+    for method, detector in detectors.items():
+        variants = {"fast": detector}
+        sklearn_path = detector.copy()
+        sklearn_path.fast_inference = False
+        variants["sklearn"] = sklearn_path
+        scorer_path = os.path.join(work_dir, f"model_{method}", SCORER_FILENAME)
+        if os.path.exists(scorer_path):
+            scorer = SpamDetector()
+            scorer.scorer = NumpyScorer.load(scorer_path)
+            variants["scorer"] = scorer
+
+        for name, variant in variants.items():
+            time_calls(variant.predict, messages, 100)
+            stats = percentiles(time_calls(variant.predict, messages, repeat))
+            for stat, value in stats.items():
+                metrics[f"predict.{method}.{name}.{stat}"] = value
+
+            for batch_size in (100, 1000):
+                batch = messages[:batch_size]
+                samples = []
+                for _ in range(10):
+                    start = time.perf_counter()
+                    variant.predict_batch(batch)
+                    samples.append(time.perf_counter() - start)
+                per_message = np.median(samples) / batch_size
+                metrics[f"predict_batch.{method}.{name}.b{batch_size}.per_message_us"] = float(per_message) * 1e6
+                metrics[f"predict_batch.{method}.{name}.b{batch_size}.messages_per_sec"] = float(1 / per_message)
+    return metrics
+
+def bench_http(detector, messages, duration):
+    """Throughput and latency of the Flask app through its test client"""
+    from app import create_app
+    from app.api import routes
+
+    routes.model_store.publish(detector)
+    client = create_app().test_client()
+
+    def run(name, request):
+        samples = []
+        deadline = time.perf_counter() + duration
+        i = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = request(i)
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.get_data(as_text=True)
+            i += 1
+        values = np.asarray(samples) * 1000
+        return {
+            f"http.{name}.requests_rps": len(samples) / duration,
+            f"http.{name}.p50_ms": float(np.percentile(values, 50)),
+            f"http.{name}.p99_ms": float(np.percentile(values, 99)),
+        }
+
+    metrics = {}
+    # Distinct messages so every request is a cache miss...
+    metrics.update(run("predict", lambda i: client.post(
+        "/api/predict", json={"message": f"{messages[i % len(messages)]} #{i}"})))
+    # ...and the same few messages to measure the cache hit path
+    metrics.update(run("predict_cached", lambda i: client.post(
+        "/api/predict", json={"message": messages[i % 10]})))
+    metrics.update(run("predict_batch100", lambda i: client.post(
+        "/api/predict/batch", json={"messages": [f"{m} #{i}" for m in messages[:100]]})))
+    return metrics
+
+def compare(metrics, baseline, max_slowdown, max_accuracy_drop):
+    """List of human-readable regressions against a baseline run"""
+    regressions = []
+    for name, old in baseline.items():
+        new = metrics.get(name)
+        if new is None or not old:
+            continue
+        if name.endswith("accuracy"):
+            if old - new > max_accuracy_drop:
+                regressions.append(f"{name}: {old:.4f} -> {new:.4f}")
+        elif name.endswith(HIGHER_IS_BETTER):
+            if new < old / max_slowdown:
+                regressions.append(f"{name}: {old:.4g} -> {new:.4g}")
+        elif name.endswith(LOWER_IS_BETTER):
+            if new > old * max_slowdown:
+                regressions.append(f"{name}: {old:.4g} -> {new:.4g}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="./data/spam.csv")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="synthetic corpus sizes, as multiples of --data")
+    parser.add_argument("--methods", nargs="+", choices=TRAIN_METHODS, default=list(TRAIN_METHODS))
+    parser.add_argument("--repeat", type=int, default=2000, help="single-message predictions per variant")
+    parser.add_argument("--http-duration", type=float, default=3.0, help="seconds per HTTP scenario")
+    parser.add_argument("--skip", nargs="*", default=[],
+                        choices=["startup", "training", "loading", "inference", "http"])
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON of a previous run to gate against")
+    parser.add_argument("--max-slowdown", type=float, default=1.25,
+                        help="allowed ratio for time/throughput/memory metrics")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.005)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--method", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker == "train":
+        print(json.dumps(train_worker(args.data, args.method)))
+        return
+
+    messages = pd.read_csv(args.data)["Message"].dropna().tolist()
+    metrics = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        if "startup" not in args.skip:
+            print("Startup...", file=sys.stderr)
+            metrics.update(bench_startup(["sync", "background", "lazy"]))
+        if "training" not in args.skip:
+            print("Training...", file=sys.stderr)
+            metrics.update(bench_training(args.data, args.scales, args.methods, work_dir))
+
+        detectors = {}
+        for method in ("count", "hashing"):
+            detectors[method] = SpamDetector()
+            detectors[method].train(args.data, vectorizer_type=method)
+
+        if "loading" not in args.skip or "inference" not in args.skip:
+            print("Model loading...", file=sys.stderr)
+            metrics.update(bench_loading(detectors, work_dir))
+        if "inference" not in args.skip:
+            print("Inference...", file=sys.stderr)
+            metrics.update(bench_inference(detectors, messages, args.repeat, work_dir))
+        if "http" not in args.skip:
+            print("HTTP...", file=sys.stderr)
+            metrics.update(bench_http(detectors["count"], messages, args.http_duration))
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "data": args.data,
+        },
+        "metrics": {name: round(value, 6) for name, value in sorted(metrics.items())},
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["metrics"]
+        regressions = compare(results["metrics"], baseline, args.max_slowdown, args.max_accuracy_drop)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Gunicorn settings for the spam detection service.
+
+Run from the SpamDetection directory:
+    gunicorn -c gunicorn.conf.py run:app
+"""
+import gc
+import multiprocessing
+import os
+
+# Load the model synchronously while the master preloads the app (below),
+# so it is in memory before the workers are forked
+os.environ.setdefault("SPAM_WARMUP", "sync")
+# The master only forks workers: they follow the registry (post_fork), it doesn't
+os.environ["SPAM_WATCH_ON_WARMUP"] = "0"
+
+bind = os.getenv("SPAM_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("SPAM_WORKERS", multiprocessing.cpu_count()))
+
+# Threaded workers: prediction is short and numpy releases the GIL for part
+# of it, so a few threads per worker keep CPUs busy while requests do I/O
+worker_class = "gthread"
+threads = int(os.getenv("SPAM_THREADS", 4))
+
+# Keep connections from the Node app open between announcements
+keepalive = int(os.getenv("SPAM_KEEPALIVE_TIMEOUT", 30))
+timeout = int(os.getenv("SPAM_WORKER_TIMEOUT", 60))
+
+# Request size limits (request line and headers; the body limit is
+# MAX_CONTENT_LENGTH, enforced by Flask)
+limit_request_line = 4094
+limit_request_fields = 100
+limit_request_field_size = 8190
+
+# Import the app, and with it the model, once in the master before forking.
+# Workers inherit it copy-on-write, and the memory-mapped model arrays
+# (SPAM_MODEL_MMAP, on by default) stay shared through the page cache.
+preload_app = True
+
+def when_ready(server):
+    # Runs in the master after the preload and before any worker is forked:
+    # freezing moves the preloaded objects out of the collector's reach, so
+    # GC passes in the workers don't write to (and copy) their pages
+    gc.freeze()
+
+def post_fork(server, worker):
+    # Threads don't survive the fork; each worker polls the registry itself
+    from app.api import routes
+    routes.start_registry_watcher()
@@ -1,6 +1,45 @@
+import argparse
+import os
 from app import create_app
 
 app = create_app()
 
+def main():
+    parser = argparse.ArgumentParser(description="Run the spam detection service")
+    parser.add_argument("--dev", action="store_true",
+                        help="use the Flask development server (debugger and reloader on)")
+    parser.add_argument("--host", default=os.getenv("SPAM_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("SPAM_PORT", 5000)))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("SPAM_THREADS", 8)),
+                        help="request-handling threads")
+    parser.add_argument("--connection-limit", type=int, default=int(os.getenv("SPAM_CONNECTION_LIMIT", 200)),
+                        help="maximum simultaneous connections")
+    parser.add_argument("--keepalive-timeout", type=int, default=int(os.getenv("SPAM_KEEPALIVE_TIMEOUT", 30)),
+                        help="seconds an idle keep-alive connection stays open")
+    args = parser.parse_args()
+
+    if args.dev:
+        app.run(host=args.host, port=args.port, debug=True)
+        return
+
+    try:
+        from waitress import serve
+    except ImportError:
+        raise SystemExit("waitress is not installed: pip install waitress, "
+                         "or run 'gunicorn -c gunicorn.conf.py run:app', or pass --dev")
+
+    # Multi-threaded production server with HTTP/1.1 keep-alive; the model is
+    # already loaded by create_app() and shared by all threads
+    serve(
+        app,
+        host=args.host,
+        port=args.port,
+        threads=args.threads,
+        connection_limit=args.connection_limit,
+        channel_timeout=args.keepalive_timeout,
+        max_request_body_size=app.config["MAX_CONTENT_LENGTH"],
+        ident="spam-detection"
+    )
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True) 
\ No newline at end of file
+    main()
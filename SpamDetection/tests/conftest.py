@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Import the service as the benchmarks do, from the SpamDetection directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+
+import pytest
+
+from app.models import FeedbackLearner, ModelRegistry, ModelStore, SpamDetector
+from app.models.feedback import FeedbackLog
+
+SEED_MESSAGES = ["win a free prize now", "claim your cash reward", "see you at lunch", "call me when you land"]
+SEED_LABELS = ["Spam", "Spam", "Not Spam", "Not Spam"]
+
+def make_learner(root):
+    registry = ModelRegistry(root)
+    store = ModelStore()
+    # Checkpoints only when a test asks for one
+    learner = FeedbackLearner(store, registry, os.path.join(root, "feedback.jsonl"), batch_size=1000,
+                              checkpoint_every=10**9, checkpoint_interval=10**9)
+    return registry, store, learner
+
+def follow(registry, store, learner):
+    """What routes.watch_registry does: load a version promoted elsewhere, replaying the log"""
+    version = registry.current()
+    if store.current is None or store.current.registry_version != version:
+        store.publish(learner.replay(registry.load(version)))
+    learner.catch_up()
+
+def worker(root, connection):
+    """A serving process, driven one command at a time over a pipe"""
+    registry, store, learner = make_learner(root)
+    follow(registry, store, learner)
+    while True:
+        command, *args = connection.recv()
+        if command == "stop":
+            return
+        if command == "add":
+            learner.add(*args, flush=True)
+        elif command == "checkpoint":
+            learner.checkpoint()
+        elif command == "follow":
+            follow(registry, store, learner)
+        live = store.current
+        connection.send((live.registry_version, live.feedback_applied, float(live.model.class_count_.sum())))
+
+@pytest.fixture
+def registry_root(tmp_path):
+    detector = SpamDetector()
+    detector.partial_fit(SEED_MESSAGES, SEED_LABELS)
+    registry = ModelRegistry(str(tmp_path))
+    registry.promote(registry.add_detector(detector, {"source": "test"}))
+    return str(tmp_path)
+
+def start_worker(context, root):
+    parent, child = context.Pipe()
+    process = context.Process(target=worker, args=(root, child))
+    process.start()
+    return process, parent
+
+def call(connection, *command):
+    connection.send(command)
+    return connection.recv()
+
+def test_feedback_log_reads_only_complete_lines(tmp_path):
+    log = FeedbackLog(str(tmp_path / "feedback.jsonl"))
+    log.append(["a", "b"], ["Spam", "Not Spam"])
+    with open(log.path, "ab") as f:
+        f.write(b'{"message": "half-writ')
+    messages, labels, end = log.read()
+    assert (messages, labels) == (["a", "b"], ["Spam", "Not Spam"])
+    assert log.read(end)[:2] == ([], [])
+
+def test_feedback_from_two_processes_survives_checkpoints(registry_root):
+    context = multiprocessing.get_context("spawn")
+    process_a, a = start_worker(context, registry_root)
+    process_b, b = start_worker(context, registry_root)
+    try:
+        # A applies its labels; B applies its own on top of everything logged so far
+        assert call(a, "add", ["free prize inside"] * 3, ["Spam"] * 3)[1] == 3
+        assert call(b, "add", ["lunch at noon?"] * 5, ["Not Spam"] * 5)[1] == 8
+
+        # A checkpoints what it had applied, without B's labels, and promotes it
+        version, applied, _ = call(a, "checkpoint")
+        assert applied == 3
+
+        # B follows the promotion and still has its labels: they are replayed from the log
+        assert call(b, "follow")[:2] == (version, 8)
+        version, applied, counts = call(b, "checkpoint")
+        assert applied == 8
+
+        # A catches up with B's checkpoint; both serve the same model
+        assert call(a, "follow") == (version, 8, counts)
+    finally:
+        for connection, process in ((a, process_a), (b, process_b)):
+            connection.send(("stop",))
+            process.join(timeout=30)
+
+    # Every label made it into the registry exactly once
+    registry, _, _ = make_learner(registry_root)
+    detector = registry.load(registry.current())
+    assert detector.feedback_applied == 8
+    assert detector.model.class_count_.sum() == len(SEED_MESSAGES) + 8
+
+def test_replay_onto_a_memory_mapped_version(registry_root):
+    registry, store, learner = make_learner(registry_root)
+    learner.log.append(["free prize inside"] * 3, ["Spam"] * 3)
+    # How routes.load_detector loads versions by default
+    loaded = registry.load(registry.current(), mmap_mode="r")
+    detector = learner.replay(loaded)
+    assert detector.feedback_applied == 3
+    assert detector.model.class_count_.sum() == len(SEED_MESSAGES) + 3
+    # The mapped version is left as it was
+    assert loaded.feedback_applied == 0
+    assert loaded.model.class_count_.sum() == len(SEED_MESSAGES)
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+
+import pytest
+
+from app.models import ModelRegistry, SpamDetector
+
+SEED_MESSAGES = ["win a free prize now", "claim your cash reward", "see you at lunch", "call me when you land"]
+SEED_LABELS = ["Spam", "Spam", "Not Spam", "Not Spam"]
+
+def worker(root, connection):
+    """A serving process answering API requests sent over a pipe"""
+    os.chdir(root)
+    os.environ["SPAM_REGISTRY_POLL_INTERVAL"] = "3600"
+    from app import create_app
+    from app.api import routes
+
+    client = create_app(warmup="sync").test_client()
+    while True:
+        command, *args = connection.recv()
+        if command == "stop":
+            return
+        method, path = args
+        response = client.open(path, method=method)
+        connection.send((response.status_code, response.get_json(), routes.registry.current()))
+
+@pytest.fixture
+def service_root(tmp_path):
+    """A registry with three versions, the second one live after the first"""
+    registry = ModelRegistry(str(tmp_path / "app" / "models" / "registry"))
+    versions = []
+    for extra in ([], ["free entry in a weekly draw"], ["urgent: your account is locked"]):
+        detector = SpamDetector()
+        detector.partial_fit(SEED_MESSAGES + extra, SEED_LABELS + ["Spam"] * len(extra))
+        versions.append(registry.add_detector(detector, {"source": "test"}))
+    registry.promote(versions[0])
+    registry.promote(versions[1])
+    # Feedback to replay on every load
+    with open(tmp_path / "app" / "models" / "registry" / "feedback.jsonl", "w") as f:
+        f.write('{"message": "lunch at noon?", "label": "Not Spam"}\n')
+    return str(tmp_path), registry, versions
+
+def corrupt(registry, version):
+    with open(os.path.join(registry.path(version), "spam_model.pkl"), "wb") as f:
+        f.write(b"not a pickle")
+
+def test_failed_load_leaves_the_registry_where_it_was(service_root):
+    root, registry, (first, live, candidate) = service_root
+    corrupt(registry, candidate)
+    corrupt(registry, first)
+    parent, child = multiprocessing.get_context("spawn").Pipe()
+    process = multiprocessing.get_context("spawn").Process(target=worker, args=(root, child))
+    process.start()
+    try:
+        parent.send(("request", "POST", f"/api/models/{candidate}/promote"))
+        status, _, current = parent.recv()
+        assert (status, current) == (500, live)
+
+        parent.send(("request", "POST", "/api/models/rollback"))
+        status, _, current = parent.recv()
+        assert (status, current) == (500, live)
+        assert registry.previous() == first
+
+        parent.send(("request", "GET", "/api/models"))
+        assert parent.recv()[1]["live"] == live
+    finally:
+        parent.send(("stop",))
+        process.join(timeout=30)
+
+def promote_all(root, versions):
+    registry = ModelRegistry(root, max_versions=1000)
+    for version in versions:
+        registry.promote(version)
+
+def test_concurrent_promotions_keep_every_version_in_the_history(tmp_path):
+    registry = ModelRegistry(str(tmp_path), max_versions=1000)
+    versions = [registry.add_version(lambda directory: None) for _ in range(160)]
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=promote_all, args=(str(tmp_path), versions[i::4])) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=60)
+    # Each version was promoted once: all but the current one were pushed to the history
+    state = registry._read_state()
+    assert sorted(state["history"] + [state["current"]]) == versions
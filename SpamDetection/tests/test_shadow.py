@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from app.models import ModelRegistry, SpamDetector
+
+SEED_MESSAGES = ["win a free prize now", "claim your cash reward", "see you at lunch", "call me when you land"]
+SEED_LABELS = ["Spam", "Spam", "Not Spam", "Not Spam"]
+
+def worker(root, connection):
+    """A serving process with its own copy of the routes' state, driven over a pipe"""
+    os.chdir(root)
+    # The watcher never wakes up on its own; the test syncs explicitly
+    os.environ["SPAM_REGISTRY_POLL_INTERVAL"] = "3600"
+    from app import create_app
+    from app.api import routes
+
+    client = create_app(warmup="sync").test_client()
+    while True:
+        command, *args = connection.recv()
+        if command == "stop":
+            return
+        if command == "request":
+            method, path = args
+            response = client.open(path, method=method)
+            connection.send((response.status_code, response.get_json()))
+        elif command == "shadow":
+            version, sample_rate = args
+            response = client.post(f"/api/models/{version}/shadow", json={"sample_rate": sample_rate})
+            connection.send((response.status_code, response.get_json()))
+        elif command == "predict":
+            name, count = args
+            for i in range(count):
+                client.post("/api/predict", json={"message": f"{name} message {i}: claim your prize"})
+            # Let the shadow thread score everything that was queued
+            shadow = routes.shadow_scorer
+            while shadow is not None and shadow.scored + shadow.errors < count:
+                time.sleep(0.01)
+            connection.send(None)
+        elif command == "sync":
+            routes.sync_shadow()
+            shadow = routes.shadow_scorer
+            connection.send(shadow.version if shadow else None)
+
+@pytest.fixture
+def service_root(tmp_path):
+    """A registry with a live version and a candidate, where routes expects it"""
+    registry = ModelRegistry(str(tmp_path / "app" / "models" / "registry"))
+    versions = []
+    for extra in ([], ["free entry in a weekly draw"]):
+        detector = SpamDetector()
+        detector.partial_fit(SEED_MESSAGES + extra, SEED_LABELS + ["Spam"] * len(extra))
+        versions.append(registry.add_detector(detector, {"source": "test"}))
+    registry.promote(versions[0])
+    return str(tmp_path), versions[1]
+
+def start_worker(context, root):
+    parent, child = context.Pipe()
+    process = context.Process(target=worker, args=(root, child))
+    process.start()
+    return process, parent
+
+def call(connection, *command):
+    connection.send(command)
+    return connection.recv()
+
+def test_shadow_runs_in_every_worker_and_reports_their_combined_stats(service_root):
+    root, candidate = service_root
+    context = multiprocessing.get_context("spawn")
+    workers = [start_worker(context, root) for _ in range(2)]
+    (_, a), (_, b) = workers
+    try:
+        status, body = call(a, "shadow", candidate, 1.0)
+        assert status == 200 and body["shadow"]["version"] == candidate
+
+        # Worker B picks the shadow up at its next registry poll
+        assert call(b, "sync") == candidate
+        call(a, "predict", "a", 3)
+        call(b, "predict", "b", 5)
+        call(b, "sync")
+
+        # Either worker reports the traffic scored by both
+        for connection in (a, b):
+            status, stats = call(connection, "request", "GET", "/api/models/shadow")
+            assert status == 200
+            assert stats["scored"] == 8 and stats["workers"] == 2
+
+        # Stopping it in B stops it everywhere
+        status, stats = call(b, "request", "DELETE", "/api/models/shadow")
+        assert status == 200 and stats["scored"] == 8
+        assert call(a, "sync") is None
+        assert call(a, "request", "GET", "/api/models/shadow")[0] == 404
+
+        # A new run starts from zero
+        call(b, "shadow", candidate, 1.0)
+        call(a, "sync")
+        call(a, "predict", "a", 2)
+        call(a, "sync")
+        status, stats = call(b, "request", "GET", "/api/models/shadow")
+        assert stats["scored"] == 2
+
+        # Promoting the candidate ends its shadow in every worker
+        assert call(a, "request", "POST", f"/api/models/{candidate}/promote")[0] == 200
+        assert call(b, "sync") is None
+    finally:
+        for process, connection in workers:
+            connection.send(("stop",))
+            process.join(timeout=30)
@@ -0,0 +1,84 @@
+"""Embedding throughput of the student chatbot, in chunks/sec.
+
+Embeds the chunks of the PDFs in a directory (or synthetic chunks) with
+each batch size and thread count, cold and then from the on-disk cache.
+
+Run from the chatbot directory:
+    python benchmarks/embedding_throughput.py --pdf-dir ../data --batch-sizes 16 64 --threads 1 4
+    python benchmarks/embedding_throughput.py --backend onnx --onnx-dir ./onnx_model
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embeddings import DEFAULT_MODEL, EmbeddingCache, EmbeddingService, OnnxBackend, SentenceTransformerBackend
+
+WORDS = ("database query index transaction normalization algorithm memory cache pipeline register "
+         "derivative integral theorem equation widget stream future async await function").split()
+
+def load_chunks(pdf_dir, limit):
+    from ingest import parse_pdf, scan_pdfs
+
+    chunks = []
+    for path in scan_pdfs(pdf_dir).values():
+        chunks.extend(chunk.page_content for chunk in parse_pdf(path))
+        if len(chunks) >= limit:
+            break
+    return chunks[:limit]
+
+def synthetic_chunks(count):
+    rng = random.Random(0)
+    # Chunks of up to 1000 characters, like ingest.py's splitter produces
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 150))) for _ in range(count)]
+
+def make_backend(args, batch_size, threads):
+    if args.backend == "onnx":
+        return OnnxBackend(args.onnx_dir, quantized=not args.float32, batch_size=batch_size, threads=threads)
+    return SentenceTransformerBackend(DEFAULT_MODEL, batch_size=batch_size, threads=threads)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["torch", "onnx"], default="torch")
+    parser.add_argument("--onnx-dir", default="./onnx_model")
+    parser.add_argument("--float32", action="store_true", help="onnx: the unquantized model")
+    parser.add_argument("--pdf-dir", help="embed chunks of these PDFs instead of synthetic ones")
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--threads", type=int, nargs="+", default=[os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.pdf_dir, args.chunks) if args.pdf_dir else synthetic_chunks(args.chunks)
+    results = []
+    for threads in args.threads:
+        for batch_size in args.batch_sizes:
+            cache_dir = tempfile.mkdtemp(prefix="embedding-cache-")
+            try:
+                service = EmbeddingService(make_backend(args, batch_size, threads), EmbeddingCache(cache_dir))
+                service.embed_documents(chunks[:batch_size])  # warm up the runtime
+                service = EmbeddingService(service.backend, EmbeddingCache(tempfile.mkdtemp(dir=cache_dir)))
+                timings = {}
+                for run in ("cold", "cached"):
+                    start = time.perf_counter()
+                    service.embed_documents(chunks)
+                    timings[run] = time.perf_counter() - start
+            finally:
+                shutil.rmtree(cache_dir)
+            results.append({
+                "backend": service.backend.name,
+                "threads": threads,
+                "batch_size": batch_size,
+                "chunks": len(chunks),
+                "cold_chunks_per_sec": round(len(chunks) / timings["cold"], 1),
+                "cached_chunks_per_sec": round(len(chunks) / timings["cached"], 1),
+            })
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Load test for POST /chat of the admin/instructor chatbot.
+
+Starts the LLM and MySQL stubs from stubs.py, then the chatbot in each
+requested mode, and drives it with concurrent users asking questions that
+need the full NL-to-SQL pipeline (two LLM calls and one query each).
+
+    sync:  chatbot.py under waitress with a fixed thread pool
+    async: chatbot_async.py under uvicorn, a single process
+
+Run from the chatbot directory:
+    python benchmarks/load_test.py --spawn sync async --users 32 --llm-latency 0.5
+    python benchmarks/load_test.py --url http://127.0.0.1:5002
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+LLM_PORT = 5990
+MYSQL_PORT = 5991
+
+QUESTIONS = [
+    "Which department has the most instructors",
+    "What is the average final grade across all courses",
+    "Which courses had the most dropped enrollments",
+    "List instructors without any assigned course",
+]
+
+def server_command(mode, port, threads):
+    if mode == "sync":
+        return ["waitress-serve", f"--threads={threads}", "--host=127.0.0.1", f"--port={port}", "chatbot:app"]
+    return [sys.executable, "-m", "uvicorn", "chatbot_async:app", "--host", "127.0.0.1",
+            "--port", str(port), "--log-level", "warning"]
+
+def user_loop(host, port, duration, offset, latencies, errors):
+    """One user: ask question after question for duration seconds"""
+    deadline = time.perf_counter() + duration
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    headers = {"Content-Type": "application/json"}
+    i = offset
+    while time.perf_counter() < deadline:
+        # Distinct questions so the SQL cache doesn't skip the first LLM call
+        body = json.dumps({"question": f"{QUESTIONS[i % len(QUESTIONS)]} (#{i})?", "role_id": 1})
+        i += 1
+        start = time.perf_counter()
+        try:
+            connection.request("POST", "/chat", body, headers)
+            response = connection.getresponse()
+            payload = json.loads(response.read())
+            if response.status != 200 or "error" in payload:
+                errors.append(payload.get("error", response.status))
+                continue
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=60)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+def run_load(url, users, duration):
+    parsed = urlparse(url)
+    latencies, errors = [], []
+    # Users mostly wait on the server, so threads are enough to drive it
+    threads = [
+        threading.Thread(target=user_loop, args=(parsed.hostname, parsed.port or 80, duration,
+                                                 n * 100000, latencies, errors))
+        for n in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    values = np.asarray(latencies or [0.0]) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "first_error": str(errors[0]) if errors else None,
+        "throughput_rps": round(len(latencies) / duration, 2),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+    }
+
+def wait_until_up(host, port, path="/health", timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=1)
+            if path is None:
+                connection.connect()
+                return
+            connection.request("GET", path)
+            if connection.getresponse().status < 500:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not come up")
+
+def start(command, env=None):
+    # Own session so the whole process group can be stopped
+    return subprocess.Popen(command, env=env, start_new_session=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def stop(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="load-test an already running chatbot")
+    parser.add_argument("--spawn", nargs="+", choices=["sync", "async"],
+                        help="start the stubs and the chatbot in each mode and load-test it")
+    parser.add_argument("--port", type=int, default=5992)
+    parser.add_argument("--users", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--threads", type=int, default=8, help="waitress threads in sync mode")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--db-latency", type=float, default=0.005)
+    parser.add_argument("--db-pool-size", type=int, default=8)
+    args = parser.parse_args()
+
+    results = {}
+    if args.url:
+        results[args.url] = run_load(args.url, args.users, args.duration)
+
+    if args.spawn:
+        stubs = [
+            start([sys.executable, "benchmarks/stubs.py", "llm", "--port", str(LLM_PORT),
+                   "--latency", str(args.llm_latency)]),
+            start([sys.executable, "benchmarks/stubs.py", "mysql", "--port", str(MYSQL_PORT),
+                   "--latency", str(args.db_latency)]),
+        ]
+        env = dict(
+            os.environ,
+            GROQ_API_KEY_NEW="stub",
+            GROQ_API_BASE=f"http://127.0.0.1:{LLM_PORT}",
+            DB_HOST="127.0.0.1",
+            DB_PORT=str(MYSQL_PORT),
+            DB_USER="stub",
+            DB_PASSWORD="",
+            DB_NAME="sis",
+            DB_POOL_SIZE=str(args.db_pool_size),
+        )
+        try:
+            wait_until_up("127.0.0.1", LLM_PORT, path="/")
+            wait_until_up("127.0.0.1", MYSQL_PORT, path=None)
+            for mode in args.spawn:
+                server = start(server_command(mode, args.port, args.threads), env)
+                try:
+                    wait_until_up("127.0.0.1", args.port)
+                    results[mode] = run_load(f"http://127.0.0.1:{args.port}", args.users, args.duration)
+                finally:
+                    stop(server)
+        finally:
+            for stub in stubs:
+                stop(stub)
+
+    if not results:
+        parser.error("pass --url and/or --spawn")
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
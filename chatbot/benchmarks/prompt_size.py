@@ -0,0 +1,99 @@
+"""Prompt size of the student chatbot before and after context assembly.
+
+Retrieves the k best chunks for known-item queries sampled from an index
+(see retrieval_quality.py) and compares the context as it was, every chunk
+in full, with the assembled one: overlap merged, duplicates dropped, within
+the token budget. With --llm, also times the LLM answering both prompts
+(GROQ_API_KEY_NEW, and GROQ_API_BASE for another endpoint).
+
+Run from the chatbot directory, against an index built by the chatbot or
+ingest.py:
+    python benchmarks/prompt_size.py --persist-directory ./chroma_db --k 3 5 8
+    python benchmarks/prompt_size.py --persist-directory ./chroma_db --budget 1000 --llm --llm-queries 20
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.vectorstores import Chroma
+from context_budget import ContextBudget
+from embeddings import create_embeddings
+from hybrid_retriever import HybridRetriever
+from ingest import load_keyword_index
+from retrieval_cache import RetrievalCache
+from retrieval_quality import sample_queries
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[int(fraction * (len(values) - 1))]
+
+def time_llm(llm, question, context):
+    from langchain.schema import HumanMessage
+
+    started = time.perf_counter()
+    llm.invoke([HumanMessage(content=f"Answer from the context.\n\nQuestion: {question}\n\nContext:\n{context}\n\nAnswer:")])
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 8], help="chunks retrieved per question")
+    parser.add_argument("--budget", type=int, default=1500, help="context tokens")
+    parser.add_argument("--llm", action="store_true", help="also time the LLM on both prompts")
+    parser.add_argument("--llm-queries", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    store = Chroma(persist_directory=args.persist_directory, embedding_function=create_embeddings())
+    keyword_index = load_keyword_index(store, args.persist_directory)
+    chunks = store.get(include=["documents"])["documents"]
+    queries = [query for query, _ in sample_queries(chunks, args.queries, 8, True, random.Random(args.seed))]
+    if not queries:
+        raise SystemExit("No queries: the index has too little text")
+    llm = None
+    if args.llm:
+        from langchain_groq import ChatGroq
+        llm = ChatGroq(groq_api_key=os.getenv('GROQ_API_KEY_NEW'), groq_api_base=os.getenv('GROQ_API_BASE'),
+                       temperature=0.0, model="llama3-70b-8192")
+
+    results = []
+    for k in args.k:
+        retriever = HybridRetriever(vector_store=store, keyword_index=keyword_index, cache=RetrievalCache(maxsize=0),
+                                    k=k, candidates=max(20, k))
+        budget = ContextBudget(max_tokens=args.budget)
+        before, after, truncated, latencies = [], [], 0, {"before": [], "after": []}
+        for i, question in enumerate(queries):
+            docs = retriever.invoke(question)
+            context = budget.assemble(docs)
+            before.append(context.stats["tokens_before"])
+            after.append(context.stats["tokens"])
+            truncated += context.stats["truncated"]
+            if llm is not None and i < args.llm_queries:
+                latencies["before"].append(time_llm(llm, question, "".join(f"{doc.page_content}\n\n" for doc in docs)))
+                latencies["after"].append(time_llm(llm, question, context.text))
+        result = {
+            "k": k,
+            "queries": len(queries),
+            "tokens_before": round(statistics.mean(before)),
+            "tokens_after": round(statistics.mean(after)),
+            "p95_tokens_before": percentile(before, 0.95),
+            "p95_tokens_after": percentile(after, 0.95),
+            "reduction": round(1 - sum(after) / sum(before), 3),
+            "truncated": round(truncated / len(queries), 3),
+            "assemble_ms": budget.stats()["mean_ms"],
+        }
+        if llm is not None:
+            result["llm_ms_before"] = round(statistics.mean(latencies["before"]) * 1000, 1)
+            result["llm_ms_after"] = round(statistics.mean(latencies["after"]) * 1000, 1)
+        results.append(result)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
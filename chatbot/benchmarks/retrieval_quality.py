@@ -0,0 +1,133 @@
+"""Retrieval quality and latency of the student chatbot: dense, BM25, hybrid.
+
+Indexes the PDFs of a directory into a scratch Chroma store, then answers
+known-item queries: each is a phrase taken from a sampled chunk, and any
+chunk containing that phrase counts as relevant. Phrases are picked around
+a rare term (an identifier, a section number) and, with --paraphrase, have
+every other word dropped, so exact-match and semantic retrieval are both
+exercised. Labelled questions can be given instead as JSON lines of
+{"question": ..., "answer": ...}, where answer is a phrase the relevant
+chunks contain. Reports hit rate at k, MRR at 10, the context characters
+of the k chunks and per-query latency for each method.
+
+Run from the chatbot directory:
+    python benchmarks/retrieval_quality.py --pdf-dir ../data --queries 200
+    python benchmarks/retrieval_quality.py --pdf-dir ../data --rerank-model cross-encoder/ms-marco-MiniLM-L-6-v2
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.vectorstores import Chroma
+from bm25 import tokenize
+from embeddings import create_embeddings
+from hybrid_retriever import CrossEncoderReranker, HybridRetriever
+from ingest import load_keyword_index, sync_vector_store
+from retrieval_cache import RetrievalCache
+
+def sample_queries(chunks, count, words, paraphrase, rng):
+    """(query, answer phrase) pairs around terms found in few chunks"""
+    frequency = {}
+    for text in chunks:
+        for term in set(tokenize(text)):
+            frequency[term] = frequency.get(term, 0) + 1
+    queries = []
+    for text in rng.sample(chunks, min(count * 3, len(chunks))):
+        tokens = text.split()
+        rare = [i for i, token in enumerate(tokens)
+                if 1 <= frequency.get(token.lower().strip(".,;:()[]\"'"), 0) <= 3 and len(token) > 3]
+        if len(tokens) < words or not rare:
+            continue
+        start = max(0, min(rng.choice(rare) - words // 2, len(tokens) - words))
+        phrase = " ".join(tokens[start:start + words])
+        query = " ".join(tokens[start:start + words:2]) if paraphrase else phrase
+        queries.append((query, phrase))
+        if len(queries) == count:
+            break
+    return queries
+
+def evaluate(name, search, queries, k):
+    hits, reciprocal_ranks, latencies, context = 0, [], [], []
+    for question, answer in queries:
+        started = time.perf_counter()
+        docs = search(question)
+        latencies.append(time.perf_counter() - started)
+        # Phrases are matched across the line breaks of the extracted text
+        ranks = [rank for rank, doc in enumerate(docs[:10], start=1) if answer in " ".join(doc.page_content.split())]
+        hits += bool(ranks and ranks[0] <= k)
+        reciprocal_ranks.append(1 / ranks[0] if ranks else 0.0)
+        context.append(sum(len(doc.page_content) for doc in docs[:k]))
+    latencies.sort()
+    return {
+        "method": name,
+        "queries": len(queries),
+        f"hit@{k}": round(hits / len(queries), 3),
+        "mrr@10": round(statistics.mean(reciprocal_ranks), 3),
+        "context_chars": round(statistics.mean(context)),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdf-dir", required=True)
+    parser.add_argument("--persist-directory", help="reuse an index here instead of a scratch one")
+    parser.add_argument("--questions", help="labelled questions, JSON lines of {question, answer}")
+    parser.add_argument("--queries", type=int, default=200, help="known-item queries to sample")
+    parser.add_argument("--words", type=int, default=8, help="words per sampled query")
+    parser.add_argument("--paraphrase", action="store_true", help="drop every other word of sampled queries")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--rerank-model", help="also evaluate hybrid retrieval reranked by this cross-encoder")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    persist_directory = args.persist_directory or tempfile.mkdtemp(prefix="retrieval-quality-")
+    try:
+        store = Chroma(persist_directory=persist_directory, embedding_function=create_embeddings())
+        keyword_index = load_keyword_index(store, persist_directory)
+        print(json.dumps({"index": sync_vector_store(store, args.pdf_dir, persist_directory,
+                                                     keyword_index=keyword_index)}))
+
+        if args.questions:
+            with open(args.questions) as f:
+                queries = [(item["question"], item["answer"]) for item in map(json.loads, f) if item]
+        else:
+            chunks = store.get(include=["documents"])["documents"]
+            queries = sample_queries(chunks, args.queries, args.words, args.paraphrase, random.Random(args.seed))
+        if not queries:
+            raise SystemExit("No queries: index more text or lower --words")
+
+        # No cache: every query is searched
+        cache = RetrievalCache(maxsize=0)
+        dense = HybridRetriever(vector_store=store, cache=cache, k=10, candidates=10)
+        hybrid = HybridRetriever(vector_store=store, keyword_index=keyword_index, cache=cache,
+                                 k=10, candidates=args.candidates)
+        methods = [
+            ("dense", lambda question: dense.dense_search(question, 10)),
+            ("bm25", lambda question: hybrid.keyword_search(question, 10)),
+            ("hybrid", hybrid._search),
+        ]
+        if args.rerank_model:
+            reranked = HybridRetriever(vector_store=store, keyword_index=keyword_index, cache=cache,
+                                       reranker=CrossEncoderReranker(args.rerank_model), k=10,
+                                       candidates=args.candidates, rerank_candidates=args.candidates)
+            methods.append(("hybrid+rerank", reranked._search))
+
+        for _, search in methods:
+            search(queries[0][0])  # warm up
+        print(json.dumps([evaluate(name, search, queries, args.k) for name, search in methods], indent=2))
+    finally:
+        if not args.persist_directory:
+            shutil.rmtree(persist_directory)
+
+if __name__ == "__main__":
+    main()
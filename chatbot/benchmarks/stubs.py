@@ -0,0 +1,120 @@
+"""Stand-in servers for load-testing the chatbots without Groq or MySQL.
+
+llm:   an OpenAI-compatible /openai/v1/chat/completions endpoint (what
+       ChatGroq calls) that answers after a fixed delay, word by word
+       ("stream": true) when asked. Point the chatbots at it with
+       GROQ_API_BASE=http://127.0.0.1:<port>.
+mysql: a MySQL-protocol server (needs `pip install mysql-mimic`) that
+       answers every query with the same rows after a fixed delay.
+
+    python benchmarks/stubs.py llm --port 5990 --latency 0.5 --token-latency 0.02
+    python benchmarks/stubs.py mysql --port 5991 --latency 0.005
+"""
+import argparse
+import asyncio
+import json
+import re
+import time
+
+import uvicorn
+
+SQL_ANSWER = "SELECT department, COUNT(*) AS instructors FROM instructor_profiles GROUP BY department"
+TEXT_ANSWER = ("The Computer Science department has the most instructors, followed by Mathematics. "
+               "Each department's database of course sections is kept up to date every semester.")
+
+def completion_text(body):
+    """SQL for NL-to-SQL prompts, prose for everything else"""
+    prompt = body["messages"][-1]["content"]
+    return SQL_ANSWER if "into a MySQL query" in prompt else TEXT_ANSWER
+
+def completion_chunk(request, delta, finish_reason=None):
+    return b"data: " + json.dumps({
+        "id": "stub",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": request.get("model", "stub"),
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }).encode() + b"\n\n"
+
+async def stream_completion(send, request, text, token_latency):
+    """Answer a "stream": true request as SSE chunks, one word at a time"""
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"text/event-stream")]})
+    await send({"type": "http.response.body", "more_body": True,
+                "body": completion_chunk(request, {"role": "assistant", "content": ""})})
+    for word in re.findall(r"\S+\s*", text):
+        await asyncio.sleep(token_latency)
+        await send({"type": "http.response.body", "more_body": True,
+                    "body": completion_chunk(request, {"content": word})})
+    await send({"type": "http.response.body", "more_body": True,
+                "body": completion_chunk(request, {}, "stop")})
+    await send({"type": "http.response.body", "body": b"data: [DONE]\n\n"})
+
+def llm_app(latency, token_latency=0.0):
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        await asyncio.sleep(latency)
+        request = json.loads(body or b"{}")
+        text = completion_text(request) if "messages" in request else ""
+        if request.get("stream"):
+            await stream_completion(send, request, text, token_latency)
+            return
+        # A whole answer takes as long as streaming it word by word
+        await asyncio.sleep(token_latency * len(text.split()))
+        payload = json.dumps({
+            "id": "stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": len(text.split()), "total_tokens": 1 + len(text.split())},
+        }).encode()
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": payload})
+    return app
+
+def serve_llm(port, latency, token_latency):
+    uvicorn.run(llm_app(latency, token_latency), host="127.0.0.1", port=port, log_level="warning")
+
+def serve_mysql(port, latency):
+    try:
+        from mysql_mimic import MysqlServer, Session
+    except ImportError:
+        raise SystemExit("The MySQL stub needs mysql-mimic: pip install mysql-mimic")
+
+    class StubSession(Session):
+        async def query(self, expression, sql, attrs):
+            await asyncio.sleep(latency)
+            return [("Computer Science", 12), ("Mathematics", 8)], ["department", "instructors"]
+
+    async def main():
+        server = MysqlServer(session_factory=StubSession, port=port)
+        await server.serve_forever()
+
+    asyncio.run(main())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("server", choices=["llm", "mysql"])
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before each answer")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="llm: seconds between words of a streamed answer")
+    args = parser.parse_args()
+
+    if args.server == "llm":
+        serve_llm(args.port, args.latency, args.token_latency)
+    else:
+        serve_mysql(args.port, args.latency)
+
+if __name__ == "__main__":
+    main()
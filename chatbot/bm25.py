@@ -0,0 +1,122 @@
+import heapq
+import math
+import os
+import pickle
+import re
+import threading
+from collections import Counter, defaultdict
+
+# Words, numbers and dotted/colon-joined identifiers ("future.wait", "3.2",
+# "dart:async"); joined ones are also indexed by their parts
+TOKEN_PATTERN = re.compile(r"\w+(?:[.:]\w+)*")
+TOKEN_SEPARATOR = re.compile(r"[.:]")
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if "." in token or ":" in token:
+            tokens.extend(TOKEN_SEPARATOR.split(token))
+    return tokens
+
+class BM25Index:
+    """Okapi BM25 over the chunks of the vector store, maintained per file
+
+    Only the term counts of each chunk are stored (save/load); the inverted
+    index is rebuilt from them on load. sources() maps each indexed file to
+    the sha256 it was indexed at, to check the index against the ingest
+    manifest.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        # chunk id -> (term counts, length)
+        self._chunks = {}
+        # source -> (sha256, chunk ids)
+        self._sources = {}
+        # term -> {chunk id: count}
+        self._postings = defaultdict(dict)
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._chunks)
+
+    def sources(self):
+        with self._lock:
+            return {source: digest for source, (digest, _) in self._sources.items()}
+
+    def add_source(self, source, digest, ids, texts):
+        """Index the chunks of one file, replacing what was indexed for it"""
+        with self._lock:
+            self.remove_source(source)
+            for chunk_id, text in zip(ids, texts):
+                counts = Counter(tokenize(text))
+                length = sum(counts.values())
+                self._chunks[chunk_id] = (counts, length)
+                self._total_length += length
+                for term, count in counts.items():
+                    self._postings[term][chunk_id] = count
+            self._sources[source] = (digest, list(ids))
+
+    def remove_source(self, source):
+        with self._lock:
+            _, ids = self._sources.pop(source, (None, []))
+            for chunk_id in ids:
+                counts, length = self._chunks.pop(chunk_id)
+                self._total_length -= length
+                for term in counts:
+                    postings = self._postings[term]
+                    postings.pop(chunk_id, None)
+                    if not postings:
+                        del self._postings[term]
+
+    def search(self, query, n=10):
+        """The n best (chunk id, score) for a query, best first"""
+        with self._lock:
+            if not self._chunks:
+                return []
+            total = len(self._chunks)
+            average_length = self._total_length / total
+            scores = defaultdict(float)
+            for term, query_count in Counter(tokenize(query)).items():
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, count in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._chunks[chunk_id][1] / average_length)
+                    scores[chunk_id] += query_count * idf * count * (self.k1 + 1) / (count + norm)
+            return heapq.nlargest(n, scores.items(), key=lambda item: item[1])
+
+    def save(self, path):
+        with self._lock:
+            state = {
+                "k1": self.k1,
+                "b": self.b,
+                "sources": self._sources,
+                "chunks": {chunk_id: dict(counts) for chunk_id, (counts, _) in self._chunks.items()}
+            }
+        # Replace atomically, as the ingest manifest
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """The index saved at path, or None if there is none"""
+        try:
+            with open(path, "rb") as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        index = cls(k1=state["k1"], b=state["b"])
+        index._sources = state["sources"]
+        for chunk_id, counts in state["chunks"].items():
+            length = sum(counts.values())
+            index._chunks[chunk_id] = (Counter(counts), length)
+            index._total_length += length
+            for term, count in counts.items():
+                index._postings[term][chunk_id] = count
+        return index
@@ -1,13 +1,20 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from langchain_groq import ChatGroq
 from langchain.schema import HumanMessage, SystemMessage
 import mysql.connector
+import mysql.connector.pooling
 import os
 from flask_cors import CORS
 import json
 import datetime
 import re
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
+from sql_cache import SQLCache, is_read_only
+from intents import CourseCatalog, IntentRouter, default_intents
+from sse import SSE_HEADERS, sse_event
+from results import RETRY_UNWRAPPED_ERRNOS, FETCH_SIZE, BoundedRows, ResultStore, bounded_query, result_digest
 
 # Load environment variables from config.env
 load_dotenv('config.env')
@@ -17,7 +24,7 @@ CORS(app)
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy"}), 200
+    return jsonify({"status": "healthy", "sql_cache": sql_cache.stats(), "result_store": result_store.stats()}), 200
 
 # Database Configuration
 DB_CONFIG = {
@@ -31,13 +38,85 @@ DB_CONFIG = {
 # Set up your API key for the Groq LLM
 os.environ["GROQ_API_KEY"] = os.getenv('GROQ_API_KEY_NEW')
 
+# Connection pool shared by all requests: size and how long a request waits
+# for a free connection before giving up
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+# MySQLConnectionPool fails at once when it is exhausted; this makes
+# concurrent chats queue for a connection instead
+_db_pool_slots = threading.BoundedSemaphore(DB_POOL_SIZE)
+
+def get_db_pool():
+    """Create the connection pool on first use"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = mysql.connector.pooling.MySQLConnectionPool(
+                    pool_name="chatbot",
+                    pool_size=DB_POOL_SIZE,
+                    **DB_CONFIG
+                )
+    return _db_pool
+
 def get_db_connection():
+    """Borrow a pooled connection, reconnecting it if it went stale
+    
+    The caller must close() it to hand it back; prefer db_cursor().
+    """
+    if not _db_pool_slots.acquire(timeout=DB_POOL_TIMEOUT):
+        print("Error connecting to database: no free connection in the pool")
+        return None
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        return connection
+        connection = get_db_pool().get_connection()
     except mysql.connector.Error as err:
+        _db_pool_slots.release()
         print(f"Error connecting to database: {err}")
         return None
+    
+    # Health check: the server may have dropped an idle pooled connection
+    try:
+        connection.ping(reconnect=True, attempts=2, delay=0)
+    except mysql.connector.Error as err:
+        release_db_connection(connection)
+        print(f"Error connecting to database: {err}")
+        return None
+    return connection
+
+def release_db_connection(connection):
+    """Return a connection from get_db_connection() to the pool"""
+    try:
+        connection.close()
+    except mysql.connector.Error as err:
+        print(f"Error returning connection to the pool: {err}")
+    finally:
+        _db_pool_slots.release()
+
+@contextmanager
+def db_cursor(dictionary=True):
+    """Cursor on a pooled connection, or None if the database is unavailable
+    
+    The cursor is closed and the connection returned to the pool on exit,
+    including when the block raises.
+    """
+    connection = get_db_connection()
+    if not connection:
+        yield None
+        return
+    cursor = None
+    try:
+        cursor = connection.cursor(dictionary=dictionary)
+        yield cursor
+    finally:
+        if cursor is not None:
+            try:
+                cursor.close()
+            except mysql.connector.Error:
+                pass
+        release_db_connection(connection)
 
 def get_database_schema():
     """Get the database schema to help the LLM understand the structure"""
@@ -117,89 +196,154 @@ def get_role_specific_prompt(role_id, user_id=None):
     else:
         return base_prompt
 
+# Generated SQL reused for repeated questions (SQL_CACHE_SIZE=0 disables it).
+# SQL_CACHE_SEMANTIC=1 also matches paraphrases by embedding similarity.
+SQL_CACHE_SIZE = int(os.getenv('SQL_CACHE_SIZE', 1000))
+SQL_CACHE_TTL = int(os.getenv('SQL_CACHE_TTL', 3600))
+SQL_CACHE_SEMANTIC = os.getenv('SQL_CACHE_SEMANTIC', '0') == '1'
+SQL_CACHE_SIMILARITY = float(os.getenv('SQL_CACHE_SIMILARITY', 0.92))
+
+def create_sql_cache():
+    embed = None
+    if SQL_CACHE_SEMANTIC:
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        embed = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2").embed_documents
+    return SQLCache(maxsize=SQL_CACHE_SIZE, ttl=SQL_CACHE_TTL, embed=embed,
+                    similarity_threshold=SQL_CACHE_SIMILARITY)
+
+sql_cache = create_sql_cache()
+
+# Common questions (GPA, enrollment counts, rosters, grade distributions,
+# office hours) answered from SQL templates without calling the LLM. Course
+# codes in them are checked against the courses table, reloaded every
+# INTENT_COURSES_TTL seconds.
+INTENT_COURSES_TTL = int(os.getenv('INTENT_COURSES_TTL', 300))
+
+intent_router = IntentRouter(default_intents(), catalog=CourseCatalog(ttl=INTENT_COURSES_TTL))
+
+# Bounds on the results of LLM-generated SQL: rows and bytes kept per result,
+# the most sent to the LLM before it gets a digest instead, and pagination of
+# the kept rows through /results
+RESULT_MAX_ROWS = int(os.getenv('RESULT_MAX_ROWS', 1000))
+RESULT_MAX_BYTES = int(os.getenv('RESULT_MAX_BYTES', 1024 * 1024))
+RESULT_PROMPT_ROWS = int(os.getenv('RESULT_PROMPT_ROWS', 20))
+RESULT_PROMPT_BYTES = int(os.getenv('RESULT_PROMPT_BYTES', 4000))
+RESULT_PAGE_SIZE = int(os.getenv('RESULT_PAGE_SIZE', 50))
+RESULT_STORE_BYTES = int(os.getenv('RESULT_STORE_BYTES', 32 * 1024 * 1024))
+RESULT_STORE_TTL = int(os.getenv('RESULT_STORE_TTL', 900))
+
+result_store = ResultStore(max_bytes=RESULT_STORE_BYTES, ttl=RESULT_STORE_TTL, page_size=RESULT_PAGE_SIZE)
+
 def serialize_date(obj):
     """Convert date objects to string format"""
     if isinstance(obj, (datetime.date, datetime.datetime)):
         return obj.isoformat()
     raise TypeError(f"Type {type(obj)} not serializable")
 
-def execute_sql_query(query):
+def serialize_rows(rows):
+    """Convert result rows to a JSON-serializable format"""
+    serialized_results = []
+    for row in rows:
+        serialized_row = {}
+        for key, value in row.items():
+            if isinstance(value, (datetime.date, datetime.datetime)):
+                serialized_row[key] = value.isoformat()
+            else:
+                serialized_row[key] = value
+        serialized_results.append(serialized_row)
+    return serialized_results
+
+def execute_sql_query(query, params=None):
     """Execute SQL query and return results"""
-    connection = get_db_connection()
-    if not connection:
-        return {"error": "Database connection failed"}
-    
     try:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(query)
-        results = cursor.fetchall()
-        cursor.close()
-        connection.close()
+        with db_cursor() as cursor:
+            if not cursor:
+                return {"error": "Database connection failed"}
+            cursor.execute(query, params)
+            results = cursor.fetchall()
         
-        # Convert results to JSON-serializable format
-        serialized_results = []
-        for row in results:
-            serialized_row = {}
-            for key, value in row.items():
-                if isinstance(value, (datetime.date, datetime.datetime)):
-                    serialized_row[key] = value.isoformat()
-                else:
-                    serialized_row[key] = value
-            serialized_results.append(serialized_row)
-            
-        return {"results": serialized_results}
+        return {"results": serialize_rows(results)}
     except mysql.connector.Error as err:
         return {"error": f"Database error: {err}"}
 
+def execute_bounded_query(query):
+    """Execute LLM-generated SQL, keeping at most RESULT_MAX_ROWS rows and
+    RESULT_MAX_BYTES bytes of its results"""
+    try:
+        with db_cursor() as cursor:
+            if not cursor:
+                return {"error": "Database connection failed"}
+            bounded = bounded_query(query, RESULT_MAX_ROWS)
+            try:
+                cursor.execute(bounded)
+            except mysql.connector.Error as err:
+                # Statements that can't be wrapped run as they are
+                if err.errno not in RETRY_UNWRAPPED_ERRNOS or bounded == query:
+                    raise
+                cursor.execute(query)
+            # Fetch in batches so even an unwrapped query is never held whole
+            rows = BoundedRows(RESULT_MAX_ROWS, RESULT_MAX_BYTES)
+            # Writes have no result set
+            while cursor.description is not None:
+                batch = cursor.fetchmany(FETCH_SIZE)
+                if not batch or not rows.extend(serialize_rows(batch)):
+                    break
+            if rows.truncated:
+                # Skip the rest so the connection can go back to the pool
+                while cursor.fetchmany(FETCH_SIZE):
+                    pass
+        
+        return {"results": rows.rows, "truncated": rows.truncated, "size": rows.size}
+    except mysql.connector.Error as err:
+        return {"error": f"Database error: {err}"}
+
+CURRENT_SEMESTER_QUERY = """
+    SELECT semester_id 
+    FROM semesters 
+    WHERE start_date <= CURDATE() 
+    AND end_date >= CURDATE() 
+    LIMIT 1
+"""
+
+# Active courses of a student in a semester (%s: user_id, semester_id)
+CURRENT_COURSES_QUERY = """
+    SELECT 
+        c.course_id,
+        c.course_code,
+        c.title,
+        c.description,
+        c.credit_hours,
+        CONCAT(u.first_name, ' ', u.last_name) as instructor_name,
+        ip.office_location,
+        ip.office_hours
+    FROM enrollments e
+    JOIN courses c ON e.course_id = c.course_id
+    LEFT JOIN course_instructors ci ON c.course_id = ci.course_id
+    LEFT JOIN users u ON ci.instructor_id = u.user_id
+    LEFT JOIN instructor_profiles ip ON u.user_id = ip.user_id
+    WHERE e.student_id = %s
+    AND c.semester_id = %s
+    AND e.status = 'active'
+    ORDER BY c.course_code
+"""
+
 def get_current_courses(user_id):
     """Get current courses for a student"""
     try:
-        connection = get_db_connection()
-        if not connection:
-            return {"error": "Database connection failed"}
-        
-        cursor = connection.cursor(dictionary=True)
-        
-        # Get current semester
-        cursor.execute("""
-            SELECT semester_id 
-            FROM semesters 
-            WHERE start_date <= CURDATE() 
-            AND end_date >= CURDATE() 
-            LIMIT 1
-        """)
-        current_semester = cursor.fetchone()
-        
-        if not current_semester:
-            return {"error": "No active semester found"}
-        
-        # Get current courses
-        query = """
-            SELECT 
-                c.course_id,
-                c.course_code,
-                c.title,
-                c.description,
-                c.credit_hours,
-                CONCAT(u.first_name, ' ', u.last_name) as instructor_name,
-                ip.office_location,
-                ip.office_hours
-            FROM enrollments e
-            JOIN courses c ON e.course_id = c.course_id
-            LEFT JOIN course_instructors ci ON c.course_id = ci.course_id
-            LEFT JOIN users u ON ci.instructor_id = u.user_id
-            LEFT JOIN instructor_profiles ip ON u.user_id = ip.user_id
-            WHERE e.student_id = %s
-            AND c.semester_id = %s
-            AND e.status = 'active'
-            ORDER BY c.course_code
-        """
-        
-        cursor.execute(query, (user_id, current_semester['semester_id']))
-        courses = cursor.fetchall()
-        
-        cursor.close()
-        connection.close()
+        with db_cursor() as cursor:
+            if not cursor:
+                return {"error": "Database connection failed"}
+            
+            # Get current semester
+            cursor.execute(CURRENT_SEMESTER_QUERY)
+            current_semester = cursor.fetchone()
+            
+            if not current_semester:
+                return {"error": "No active semester found"}
+            
+            # Get current courses
+            cursor.execute(CURRENT_COURSES_QUERY, (user_id, current_semester['semester_id']))
+            courses = cursor.fetchall()
         
         return {"results": courses}
     except mysql.connector.Error as err:
@@ -227,66 +371,68 @@ def format_course_response(courses):
     
     return response
 
+def identifier_condition(identifier):
+    """(WHERE condition on users u, params) matching a student identifier, or None"""
+    # Email
+    if re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', identifier):
+        return "u.email = %s", (identifier,)
+    # Student ID
+    if re.match(r'^STU[0-9]+$', identifier, re.IGNORECASE):
+        return "u.user_id IN (SELECT user_id FROM student_profiles WHERE student_id = %s)", (identifier,)
+    # Username
+    if re.match(r'^[a-zA-Z0-9._-]+$', identifier):
+        return "u.username = %s", (identifier,)
+    # Name (first last or last first, partial match)
+    name_parts = identifier.strip().split()
+    if len(name_parts) >= 2:
+        first, last = name_parts[0], name_parts[1]
+        return ("((u.first_name LIKE %s AND u.last_name LIKE %s) OR (u.first_name LIKE %s AND u.last_name LIKE %s))",
+                (f'%{first}%', f'%{last}%', f'%{last}%', f'%{first}%'))
+    return None
+
+# All courses of a student (any semester, any status); {student} is an SQL
+# expression for the student's user_id
+STUDENT_COURSES_QUERY = """
+    SELECT 
+        c.course_id,
+        c.course_code,
+        c.title,
+        c.description,
+        c.credit_hours,
+        CONCAT(u2.first_name, ' ', u2.last_name) as instructor_name,
+        ip.office_location,
+        ip.office_hours,
+        e.status as enrollment_status,
+        e.enrollment_date,
+        s.semester_name
+    FROM enrollments e
+    JOIN courses c ON e.course_id = c.course_id
+    LEFT JOIN course_instructors ci ON c.course_id = ci.course_id
+    LEFT JOIN users u2 ON ci.instructor_id = u2.user_id
+    LEFT JOIN instructor_profiles ip ON u2.user_id = ip.user_id
+    LEFT JOIN semesters s ON c.semester_id = s.semester_id
+    WHERE e.student_id = {student}
+    ORDER BY c.semester_id DESC, c.course_code
+"""
+
 def get_student_courses_by_identifier(identifier):
     """Get all courses for a student by email, username, student ID, or name"""
     try:
-        connection = get_db_connection()
-        if not connection:
-            return {"error": "Database connection failed"}
-        cursor = connection.cursor(dictionary=True)
-        # Try to find the user by email, username, student_id, or name
-        user = None
-        # Email
-        if re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', identifier):
-            cursor.execute("SELECT user_id, first_name, last_name FROM users WHERE email = %s", (identifier,))
-            user = cursor.fetchone()
-        # Student ID
-        elif re.match(r'^STU[0-9]+$', identifier, re.IGNORECASE):
-            cursor.execute("SELECT u.user_id, u.first_name, u.last_name FROM users u JOIN student_profiles sp ON u.user_id = sp.user_id WHERE sp.student_id = %s", (identifier,))
-            user = cursor.fetchone()
-        # Username
-        elif re.match(r'^[a-zA-Z0-9._-]+$', identifier):
-            cursor.execute("SELECT user_id, first_name, last_name FROM users WHERE username = %s", (identifier,))
-            user = cursor.fetchone()
-        # Name (first last or last first, partial match)
-        else:
-            name_parts = identifier.strip().split()
-            if len(name_parts) >= 2:
-                first, last = name_parts[0], name_parts[1]
-                cursor.execute("SELECT user_id, first_name, last_name FROM users WHERE (first_name LIKE %s AND last_name LIKE %s) OR (first_name LIKE %s AND last_name LIKE %s)", (f'%{first}%', f'%{last}%', f'%{last}%', f'%{first}%'))
+        with db_cursor() as cursor:
+            if not cursor:
+                return {"error": "Database connection failed"}
+            # Try to find the user by email, username, student_id, or name
+            user = None
+            condition = identifier_condition(identifier)
+            if condition:
+                cursor.execute(f"SELECT u.user_id, u.first_name, u.last_name FROM users u WHERE {condition[0]} ORDER BY u.user_id LIMIT 1", condition[1])
                 user = cursor.fetchone()
-        if not user:
-            cursor.close()
-            connection.close()
-            return {"error": f"No user found with identifier '{identifier}'"}
-        user_id = user['user_id']
-        # Get all courses (any semester, any status)
-        query = """
-            SELECT 
-                c.course_id,
-                c.course_code,
-                c.title,
-                c.description,
-                c.credit_hours,
-                CONCAT(u2.first_name, ' ', u2.last_name) as instructor_name,
-                ip.office_location,
-                ip.office_hours,
-                e.status as enrollment_status,
-                e.enrollment_date,
-                s.semester_name
-            FROM enrollments e
-            JOIN courses c ON e.course_id = c.course_id
-            LEFT JOIN course_instructors ci ON c.course_id = ci.course_id
-            LEFT JOIN users u2 ON ci.instructor_id = u2.user_id
-            LEFT JOIN instructor_profiles ip ON u2.user_id = ip.user_id
-            LEFT JOIN semesters s ON c.semester_id = s.semester_id
-            WHERE e.student_id = %s
-            ORDER BY c.semester_id DESC, c.course_code
-        """
-        cursor.execute(query, (user_id,))
-        courses = cursor.fetchall()
-        cursor.close()
-        connection.close()
+            if not user:
+                return {"error": f"No user found with identifier '{identifier}'"}
+            user_id = user['user_id']
+            # Get all courses (any semester, any status)
+            cursor.execute(STUDENT_COURSES_QUERY.format(student="%s"), (user_id,))
+            courses = cursor.fetchall()
         return {"results": courses, "student_name": f"{user['first_name']} {user['last_name']}"}
     except mysql.connector.Error as err:
         return {"error": f"Database error: {err}"}
@@ -322,59 +468,33 @@ def format_student_courses_response(courses, student_name=None):
         response += "\n"
     return response
 
-def get_chatbot_response(question, llm, role_id, user_id=None):
-    # Check if this is a student courses query by identifier (email, username, student id, or name)
-    identifier = None
+# Phrases that route a question to the two hand-written course lookups
+STUDENT_COURSES_PHRASES = ['courses', 'enrolled', 'taking', 'registered']
+CURRENT_COURSES_PHRASES = ['current courses', 'courses i take', 'my courses', 'enrolled courses']
+
+def extract_student_identifier(question):
+    """Email, student id, username or name a question asks about, or None"""
     # Try to extract email
     email_pattern = r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}'
     email_match = re.search(email_pattern, question)
     if email_match:
-        identifier = email_match.group()
-    else:
-        # Try to extract student id (e.g., STU12345)
-        student_id_match = re.search(r'STU[0-9]+', question, re.IGNORECASE)
-        if student_id_match:
-            identifier = student_id_match.group()
-        else:
-            # Try to extract username (single word after 'for' or 'of' or 'user')
-            username_match = re.search(r'(?:for|of|user)\s+([a-zA-Z0-9._-]+)', question)
-            if username_match:
-                identifier = username_match.group(1)
-            else:
-                # Try to extract name (words after 'for' or 'of')
-                name_match = re.search(r'(?:for|of)\s+([a-zA-Z]+\s+[a-zA-Z]+)', question)
-                if name_match:
-                    identifier = name_match.group(1)
-    if identifier and any(phrase in question.lower() for phrase in ['courses', 'enrolled', 'taking', 'registered']):
-        if role_id != 1:  # Not an admin
-            return {"error": "Only administrators can view other students' courses"}
-        courses_result = get_student_courses_by_identifier(identifier)
-        if "error" in courses_result:
-            return {"error": courses_result["error"]}
-        formatted_response = format_student_courses_response(courses_result["results"], courses_result.get("student_name"))
-        return {
-            "answer": formatted_response,
-            "raw_results": courses_result["results"]
-        }
-    
-    # Check if this is a current courses query
-    if any(phrase in question.lower() for phrase in ['current courses', 'courses i take', 'my courses', 'enrolled courses']):
-        if role_id != 3:  # Not a student
-            return {"error": "Only students can view their current courses"}
-        
-        courses_result = get_current_courses(user_id)
-        if "error" in courses_result:
-            return {"error": courses_result["error"]}
-        
-        formatted_response = format_course_response(courses_result["results"])
-        return {
-            "answer": formatted_response,
-            "raw_results": courses_result["results"]
-        }
-    
-    # Get role-specific system prompt
-    system_prompt = get_role_specific_prompt(role_id, user_id)
-    
+        return email_match.group()
+    # Try to extract student id (e.g., STU12345)
+    student_id_match = re.search(r'STU[0-9]+', question, re.IGNORECASE)
+    if student_id_match:
+        return student_id_match.group()
+    # Try to extract username (single word after 'for' or 'of' or 'user')
+    username_match = re.search(r'(?:for|of|user)\s+([a-zA-Z0-9._-]+)', question)
+    if username_match:
+        return username_match.group(1)
+    # Try to extract name (words after 'for' or 'of')
+    name_match = re.search(r'(?:for|of)\s+([a-zA-Z]+\s+[a-zA-Z]+)', question)
+    if name_match:
+        return name_match.group(1)
+    return None
+
+def build_sql_messages(question, system_prompt):
+    """Messages asking the LLM to translate a question into SQL"""
     # Create the user prompt
     user_prompt = f"""
     Convert this question into a MySQL query:
@@ -384,28 +504,30 @@ def get_chatbot_response(question, llm, role_id, user_id=None):
     """
 
     # Create the list of messages
-    messages = [
+    return [
         SystemMessage(content=system_prompt),
         HumanMessage(content=user_prompt)
     ]
 
-    # Call the LLM to get the SQL query
-    sql_query = llm.predict_messages(messages).content.strip()
+def build_response_messages(question, results, role_id, truncated=False):
+    """Messages asking the LLM to phrase query results as an answer
     
-    # Execute the query
-    query_result = execute_sql_query(sql_query)
-    
-    if "error" in query_result:
-        return {"error": query_result["error"]}
-    
-    # Format the results into a natural language response
-    results = query_result["results"]
+    Results too large for the prompt are replaced by a digest computed
+    here: statistics of every column over all rows, and the first rows.
+    """
+    digest = result_digest(results, truncated, RESULT_PROMPT_ROWS, RESULT_PROMPT_BYTES)
+    if digest is None:
+        results_text = f"Results: {json.dumps(results, default=str)}"
+    else:
+        row_count = f"{len(results)}{' or more' if truncated else ''}"
+        results_text = (f"Results ({row_count} rows, too many to list; 'columns' summarizes every row "
+                        f"and 'sample' shows the first ones): {json.dumps(digest, default=str)}")
     
     # Create a response prompt based on role
     response_prompt = f"""
     Convert these database results into a natural language response:
     Question: {question}
-    Results: {json.dumps(results)}
+    {results_text}
     
     Provide a clear, concise answer that directly addresses the question.
     If there are no results, say so politely.
@@ -432,25 +554,127 @@ def get_chatbot_response(question, llm, role_id, user_id=None):
         - Provide actionable suggestions for improvement
         """
     
-    response_messages = [
+    return [
         SystemMessage(content="You are a helpful academic database assistant."),
         HumanMessage(content=response_prompt)
     ]
+
+def prepare_chatbot_response(question, llm, role_id, user_id=None, sql_cache=sql_cache, intent_router=intent_router):
+    """Everything up to phrasing the answer
     
-    natural_response = llm.predict_messages(response_messages).content
+    Returns (response, None) when the response is already complete (fast
+    paths and errors), or (response without 'answer', messages) where the
+    LLM still has to turn messages into the answer.
+    """
+    # Answer templated questions locally, in milliseconds
+    if intent_router is not None:
+        routed = intent_router.answer(question, role_id, user_id, execute_sql_query)
+        if routed is not None:
+            return routed, None
     
+    # Check if this is a student courses query by identifier (email, username, student id, or name)
+    identifier = extract_student_identifier(question)
+    if identifier and any(phrase in question.lower() for phrase in STUDENT_COURSES_PHRASES):
+        if role_id != 1:  # Not an admin
+            return {"error": "Only administrators can view other students' courses"}, None
+        courses_result = get_student_courses_by_identifier(identifier)
+        if "error" in courses_result:
+            return {"error": courses_result["error"]}, None
+        formatted_response = format_student_courses_response(courses_result["results"], courses_result.get("student_name"))
+        return {
+            "answer": formatted_response,
+            "raw_results": courses_result["results"]
+        }, None
+    
+    # Check if this is a current courses query
+    if any(phrase in question.lower() for phrase in CURRENT_COURSES_PHRASES):
+        if role_id != 3:  # Not a student
+            return {"error": "Only students can view their current courses"}, None
+        
+        courses_result = get_current_courses(user_id)
+        if "error" in courses_result:
+            return {"error": courses_result["error"]}, None
+        
+        formatted_response = format_course_response(courses_result["results"])
+        return {
+            "answer": formatted_response,
+            "raw_results": courses_result["results"]
+        }, None
+    
+    # Reuse the SQL generated for the same question in the same scope
+    sql_query = sql_cache.get(question, role_id, user_id) if sql_cache is not None else None
+    cached_sql = sql_query is not None
+    if not cached_sql:
+        # Call the LLM to get the SQL query
+        messages = build_sql_messages(question, get_role_specific_prompt(role_id, user_id))
+        sql_query = llm.predict_messages(messages).content.strip()
+    
+    # Execute the query, bounded: the SQL may select a whole table
+    query_result = execute_bounded_query(sql_query)
+    
+    if "error" in query_result:
+        return {"error": query_result["error"]}, None
+    if sql_cache is not None and not is_read_only(sql_query):
+        sql_cache.invalidate(sql_query)
+    elif sql_cache is not None and not cached_sql:
+        # Only SQL that ran successfully is worth repeating
+        sql_cache.put(question, role_id, user_id, sql_query)
+    
+    # The client gets the first page, the rest stays here for /results
+    results = query_result["results"]
+    page = result_store.put(results, query_result["truncated"], role_id, user_id, query_result["size"])
+    
+    # The results still need to be phrased as a natural language response
     return {
-        "answer": natural_response,
         "sql_query": sql_query,
-        "raw_results": results
-    }
+        "cached_sql": cached_sql,
+        "raw_results": page["rows"],
+        "result": page["result"]
+    }, build_response_messages(question, results, role_id, query_result["truncated"])
+
+def get_chatbot_response(question, llm, role_id, user_id=None, sql_cache=sql_cache, intent_router=intent_router):
+    response, answer_messages = prepare_chatbot_response(question, llm, role_id, user_id, sql_cache, intent_router)
+    if answer_messages is not None:
+        response["answer"] = llm.predict_messages(answer_messages).content
+    return response
+
+def stream_chatbot_response(question, llm, role_id, user_id=None):
+    """get_chatbot_response as server-sent events
+    
+    'metadata' carries everything but the answer (sql_query, raw_results,
+    ...), 'token' events carry the answer as the LLM generates it, then
+    'done'; failures end the stream with an 'error' event.
+    """
+    try:
+        response, answer_messages = prepare_chatbot_response(question, llm, role_id, user_id)
+        if "error" in response:
+            yield sse_event("error", response)
+            return
+        answer = response.pop("answer", None)
+        yield sse_event("metadata", response)
+        if answer_messages is None:
+            yield sse_event("token", {"text": answer})
+        else:
+            for chunk in llm.stream(answer_messages):
+                if chunk.content:
+                    yield sse_event("token", {"text": chunk.content})
+        yield sse_event("done", {})
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
+
+def create_llm():
+    """The Groq chat model the routes use; get_chatbot_response takes any
+    client with predict_messages() and stream()"""
+    return ChatGroq(
+        groq_api_key=os.environ["GROQ_API_KEY"],
+        # Optional override, e.g. a stub server for load tests
+        groq_api_base=os.getenv('GROQ_API_BASE'),
+        temperature=0.0,
+        model="llama3-70b-8192"
+    )
 
 # Initialize the LLM
-llm = ChatGroq(
-    groq_api_key=os.environ["GROQ_API_KEY"],
-    temperature=0.0,
-    model="llama3-70b-8192"
-)
+llm = create_llm()
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -472,6 +696,79 @@ def chat():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """/chat as server-sent events, sending the answer as it is generated"""
+    data = request.get_json(silent=True) or {}
+    question = data.get('question')
+    role_id = data.get('role_id')
+    user_id = data.get('user_id')
+    
+    if not question:
+        return jsonify({"error": "No question provided"}), 400
+    if not role_id:
+        return jsonify({"error": "No role ID provided"}), 400
+    if role_id in [2, 3] and not user_id:  # Instructor or Student role requires user_id
+        return jsonify({"error": "User ID required for this role"}), 400
+    
+    return Response(stream_with_context(stream_chatbot_response(question, llm, role_id, user_id)),
+                    mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@app.route('/results', methods=['POST'])
+def get_results():
+    """Another page of a /chat result, by the result_id /chat returned"""
+    try:
+        data = request.json
+        result_id = data.get('result_id')
+        if not result_id:
+            return jsonify({"error": "No result ID provided"}), 400
+        
+        try:
+            page = result_store.page(result_id, data.get('role_id'), data.get('user_id'),
+                                     data.get('page', 1), data.get('page_size'))
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid page or page size"}), 400
+        if page is None:
+            return jsonify({"error": "Result not found or expired"}), 404
+        
+        return jsonify({"raw_results": page["rows"], "result": page["result"]})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Student profile with enrolled courses, by student_id (used by /student-info)
+STUDENT_INFO_QUERY = """
+    SELECT 
+        u.user_id,
+        u.username,
+        u.email,
+        u.first_name,
+        u.last_name,
+        sp.student_id,
+        sp.date_of_birth,
+        sp.address,
+        sp.phone,
+        sp.enrollment_date,
+        sp.current_semester,
+        GROUP_CONCAT(
+            CONCAT(
+                c.course_code, ' - ',
+                c.title, ' (',
+                CASE e.status
+                    WHEN 'active' THEN 'Currently Enrolled'
+                    WHEN 'completed' THEN 'Completed'
+                    WHEN 'dropped' THEN 'Dropped'
+                END,
+                ')'
+            )
+        ) as enrolled_courses
+    FROM users u
+    JOIN student_profiles sp ON u.user_id = sp.user_id
+    LEFT JOIN enrollments e ON u.user_id = e.student_id
+    LEFT JOIN courses c ON e.course_id = c.course_id
+    WHERE sp.student_id = %s
+    GROUP BY u.user_id, sp.student_id
+"""
+
 @app.route('/student-info', methods=['POST'])
 def get_student_info():
     try:
@@ -480,49 +777,11 @@ def get_student_info():
         if not student_id:
             return jsonify({"error": "No student ID provided"}), 400
 
-        # Create SQL query to get student information including enrolled courses
-        query = """
-        SELECT 
-            u.user_id,
-            u.username,
-            u.email,
-            u.first_name,
-            u.last_name,
-            sp.student_id,
-            sp.date_of_birth,
-            sp.address,
-            sp.phone,
-            sp.enrollment_date,
-            sp.current_semester,
-            GROUP_CONCAT(
-                CONCAT(
-                    c.course_code, ' - ',
-                    c.title, ' (',
-                    CASE e.status
-                        WHEN 'active' THEN 'Currently Enrolled'
-                        WHEN 'completed' THEN 'Completed'
-                        WHEN 'dropped' THEN 'Dropped'
-                    END,
-                    ')'
-                )
-            ) as enrolled_courses
-        FROM users u
-        JOIN student_profiles sp ON u.user_id = sp.user_id
-        LEFT JOIN enrollments e ON u.user_id = e.student_id
-        LEFT JOIN courses c ON e.course_id = c.course_id
-        WHERE sp.student_id = %s
-        GROUP BY u.user_id, sp.student_id
-        """
-
-        connection = get_db_connection()
-        if not connection:
-            return jsonify({"error": "Database connection failed"}), 500
-
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(query, (student_id,))
-        result = cursor.fetchone()
-        cursor.close()
-        connection.close()
+        with db_cursor() as cursor:
+            if not cursor:
+                return jsonify({"error": "Database connection failed"}), 500
+            cursor.execute(STUDENT_INFO_QUERY, (student_id,))
+            result = cursor.fetchone()
 
         if not result:
             return jsonify({"error": "Student not found"}), 404
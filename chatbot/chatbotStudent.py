@@ -1,16 +1,20 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from langchain_community.vectorstores import Chroma
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
 from langchain_groq import ChatGroq
 from langchain.schema import HumanMessage, SystemMessage
 import os
 import re
+import threading
 import warnings
 import logging
 from flask_cors import CORS
 from dotenv import load_dotenv
+from sse import SSE_HEADERS, IncrementalHighlighter, sse_event
+from ingest import load_keyword_index, manifest_version, sync_vector_store
+from embeddings import create_embeddings
+from retrieval_cache import RetrievalCache
+from hybrid_retriever import CrossEncoderReranker, HybridRetriever
+from context_budget import ContextBudget
 
 load_dotenv('config.env')
 
@@ -28,6 +32,34 @@ CORS(app)
 # Set up your API key for the Groq LLM
 os.environ["GROQ_API_KEY"] = os.getenv('GROQ_API_KEY_NEW')
 
+# Processes parsing PDFs when the vector store is updated (default: CPU count)
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 0)) or None
+_index_lock = threading.Lock()
+
+# Repeated questions (RETRIEVAL_CACHE_SIZE=0 disables): question embeddings,
+# retrieved chunks and, with ANSWER_CACHE_TTL > 0, whole answers. Chunks and
+# answers are dropped whenever an ingestion changes the index.
+RETRIEVAL_CACHE_SIZE = int(os.getenv('RETRIEVAL_CACHE_SIZE', 1000))
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', 0))
+
+retrieval_cache = RetrievalCache(maxsize=RETRIEVAL_CACHE_SIZE, answer_ttl=ANSWER_CACHE_TTL,
+                                 index_version=lambda: manifest_version("./chroma_db"))
+
+# Retrieval: the RETRIEVAL_K best chunks after fusing the RETRIEVAL_CANDIDATES
+# nearest by embedding with as many BM25 matches (KEYWORD_SEARCH=0 for dense
+# only). Set RERANK_MODEL (e.g. cross-encoder/ms-marco-MiniLM-L-6-v2, needs
+# sentence-transformers) to rerank the first RERANK_CANDIDATES fused chunks.
+RETRIEVAL_K = int(os.getenv('RETRIEVAL_K', 3))
+RETRIEVAL_CANDIDATES = int(os.getenv('RETRIEVAL_CANDIDATES', 20))
+KEYWORD_SEARCH = os.getenv('KEYWORD_SEARCH', '1') == '1'
+RERANK_MODEL = os.getenv('RERANK_MODEL', '')
+RERANK_CANDIDATES = int(os.getenv('RERANK_CANDIDATES', 20))
+
+# Most tokens of retrieved text in a prompt; see context_budget.py
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', 1500))
+
+context_budget = ContextBudget(max_tokens=CONTEXT_TOKEN_BUDGET)
+
 def ensure_data_directory():
     """Ensure the data directory exists"""
     data_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
@@ -36,56 +68,29 @@ def ensure_data_directory():
         logger.info(f"Created data directory at {data_dir}")
     return data_dir
 
-# Load and process documents
-def load_documents():
+# Index new and changed PDFs into the vector store and drop deleted ones;
+# when nothing changed this only stats the files. The keyword index, if
+# any, is updated along with it. Returns the sync's stats, or None if it failed.
+def update_vector_store(vector_store, keyword_index=None):
     try:
         data_dir = ensure_data_directory()
-        logger.info(f"Loading documents from {data_dir}")
-        
-        # Load all PDF files from the data directory
-        loader = DirectoryLoader(data_dir, glob="**/*.pdf", loader_cls=PyPDFLoader)
-        documents = loader.load()
-        
-        if not documents:
-            logger.warning("No documents found in the specified directory")
-            return []
-            
-        logger.info(f"Successfully loaded {len(documents)} documents")
-        return documents
-    except Exception as e:
-        logger.error(f"Error loading documents: {str(e)}")
-        return []
-
-# Create the vector store
-def create_vector_store(_documents):
-    try:
-        if not _documents:
-            logger.error("No documents provided to create vector store")
-            return None
-            
-        logger.info("Creating vector store...")
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
-        )
-        texts = text_splitter.split_documents(_documents)
-        
-        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        vector_store = Chroma.from_documents(texts, embeddings, persist_directory="./chroma_db")
-        vector_store.persist()
-        logger.info("Vector store created and persisted successfully")
-        return vector_store
+        # One sync at a time: a second would re-index the same files
+        with _index_lock:
+            logger.info(f"Updating vector store from {data_dir}")
+            stats = sync_vector_store(vector_store, data_dir, "./chroma_db", INGEST_WORKERS, keyword_index)
+        logger.info(f"Vector store up to date: {stats}")
+        return stats
     except Exception as e:
-        logger.error(f"Error creating vector store: {str(e)}")
+        # The chatbot can still answer from what is already indexed
+        logger.error(f"Error updating vector store: {str(e)}")
         return None
 
 # Load the vector store from disk
 def load_vector_store():
     try:
         logger.info("Loading vector store from disk...")
-        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        # Shared by indexing and queries; see embeddings.py for the EMBEDDING_* settings
+        embeddings = create_embeddings()
         vector_store = Chroma(persist_directory="./chroma_db", embedding_function=embeddings)
         logger.info("Vector store loaded successfully")
         return vector_store
@@ -93,21 +98,8 @@ def load_vector_store():
         logger.error(f"Error loading vector store: {str(e)}")
         return None
 
-def get_chatbot_response(question, retriever, llm):
-    try:
-        logger.info(f"Processing question: {question}")
-        
-        # Retrieve documents
-        docs = retriever.get_relevant_documents(question)
-        logger.info(f"Retrieved {len(docs)} relevant documents")
-
-        # Construct context
-        context = ""
-        for doc in docs:
-            context += f"{doc.page_content}\n\n"
-
-        # Create the system prompt
-        system_prompt = """You are an expert academic assistant specializing in computer science, mathematics, and programming. 
+# Create the system prompt
+SYSTEM_PROMPT = """You are an expert academic assistant specializing in computer science, mathematics, and programming. 
         You have access to the following textbooks:
         - Database Systems Fundamentals (7th Edition)
         - Computer Organization and Architecture (10th Edition) by William Stallings
@@ -124,10 +116,36 @@ def get_chatbot_response(question, retriever, llm):
         5. Include code examples when relevant
         6. Explain complex concepts in simple terms"""
 
-        # Create the user prompt
-        user_prompt = f"""
+# Terms wrapped in <mark> in every answer
+KEY_TERMS = [
+    # Programming terms
+    'algorithm', 'function', 'variable', 'loop', 'array', 'matrix', 'class', 'object',
+    'method', 'interface', 'inheritance', 'polymorphism', 'encapsulation',
+    # Database terms
+    'database', 'query', 'table', 'index', 'transaction', 'ACID', 'normalization',
+    # Computer Architecture terms
+    'CPU', 'memory', 'cache', 'bus', 'register', 'instruction', 'pipeline',
+    # Mathematics terms
+    'derivative', 'integral', 'theorem', 'proof', 'equation', 'function',
+    # Dart-specific terms
+    'dart', 'flutter', 'widget', 'async', 'await', 'stream', 'future'
+]
+
+def assemble_context(docs, budget=context_budget):
+    """Context of the prompt from retrieved documents, within the token budget"""
+    context = budget.assemble(docs)
+    stats = context.stats
+    logger.info(f"Context: {stats['chunks']} chunks as {stats['passages']} passages, "
+                f"{stats['tokens_before']} -> {stats['tokens']} tokens")
+    return context
+
+def build_messages(question, context):
+    """Prompt messages answering a question from an assembled context"""
+    # Create the user prompt
+    user_prompt = f"""
 Use the following context to answer the question below. Provide a comprehensive and accurate answer. 
 Include specific references in APA format at the end of your response, including the book/source name, chapter number, and page number.
+Each passage of the context starts with its book and page number: take references from these.
 
 Question: {question}
 
@@ -137,36 +155,41 @@ Context:
 Answer:
 """
 
-        # Create the list of messages
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_prompt)
-        ]
+    # Create the list of messages
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
+        HumanMessage(content=user_prompt)
+    ]
+
+def highlight_key_terms(answer):
+    """Wrap key terms of an answer in <mark> tags"""
+    for term in KEY_TERMS:
+        pattern = re.compile(fr'\b({term})\b', re.IGNORECASE)
+        replacement = r'<mark>\1</mark>'
+        answer = pattern.sub(replacement, answer)
+    return answer
+
+def get_chatbot_response(question, retriever, llm, answer_cache=retrieval_cache):
+    try:
+        logger.info(f"Processing question: {question}")
+        
+        cached = answer_cache.get_answer(question) if answer_cache is not None else None
+        if cached is not None:
+            logger.info("Answered from cache")
+            return cached["answer"]
+        
+        # Retrieve documents
+        docs = retriever.get_relevant_documents(question)
+        logger.info(f"Retrieved {len(docs)} relevant documents")
+
+        context = assemble_context(docs)
 
         # Call the LLM
         logger.info("Generating response from LLM...")
-        response = llm.predict_messages(messages)
-        answer = response.content
-
-        # Highlight key terms in the answer
-        key_terms = [
-            # Programming terms
-            'algorithm', 'function', 'variable', 'loop', 'array', 'matrix', 'class', 'object',
-            'method', 'interface', 'inheritance', 'polymorphism', 'encapsulation',
-            # Database terms
-            'database', 'query', 'table', 'index', 'transaction', 'ACID', 'normalization',
-            # Computer Architecture terms
-            'CPU', 'memory', 'cache', 'bus', 'register', 'instruction', 'pipeline',
-            # Mathematics terms
-            'derivative', 'integral', 'theorem', 'proof', 'equation', 'function',
-            # Dart-specific terms
-            'dart', 'flutter', 'widget', 'async', 'await', 'stream', 'future'
-        ]
-        
-        for term in key_terms:
-            pattern = re.compile(fr'\b({term})\b', re.IGNORECASE)
-            replacement = r'<mark>\1</mark>'
-            answer = pattern.sub(replacement, answer)
+        response = llm.predict_messages(build_messages(question, context.text))
+        answer = highlight_key_terms(response.content)
+        if answer_cache is not None:
+            answer_cache.put_answer(question, {"answer": answer, "sources": context.sources})
 
         logger.info("Response generated successfully")
         return answer
@@ -174,31 +197,87 @@ Answer:
         logger.error(f"Error generating response: {str(e)}")
         return "I apologize, but I encountered an error while processing your question. Please try again."
 
-# Initialize the chatbot components
-try:
-    logger.info("Initializing chatbot components...")
+def stream_chatbot_response(question, retriever, llm, answer_cache=retrieval_cache):
+    """get_chatbot_response as server-sent events
     
-    if os.path.exists("./chroma_db"):
-        logger.info("Found existing vector store, loading...")
+    A 'metadata' event with the sources of the context's passages, then the
+    highlighted answer in 'token' events as the LLM generates it, then 'done'.
+    """
+    try:
+        logger.info(f"Processing question: {question}")
+        cached = answer_cache.get_answer(question) if answer_cache is not None else None
+        if cached is not None:
+            logger.info("Answered from cache")
+            yield sse_event("metadata", {"sources": cached["sources"]})
+            yield sse_event("token", {"text": cached["answer"]})
+            yield sse_event("done", {})
+            return
+        
+        docs = retriever.get_relevant_documents(question)
+        logger.info(f"Retrieved {len(docs)} relevant documents")
+        context = assemble_context(docs)
+        sources = context.sources
+        yield sse_event("metadata", {"sources": sources})
+        
+        highlighter = IncrementalHighlighter(highlight_key_terms)
+        answer = []
+        for chunk in llm.stream(build_messages(question, context.text)):
+            text = highlighter.feed(chunk.content)
+            if text:
+                answer.append(text)
+                yield sse_event("token", {"text": text})
+        text = highlighter.flush()
+        if text:
+            answer.append(text)
+            yield sse_event("token", {"text": text})
+        if answer_cache is not None:
+            answer_cache.put_answer(question, {"answer": "".join(answer), "sources": sources})
+        yield sse_event("done", {})
+    except Exception as e:
+        logger.error(f"Error streaming response: {str(e)}")
+        yield sse_event("error", {"error": "I apologize, but I encountered an error while processing your question. Please try again."})
+
+# The chatbot components, set by init()
+vector_store = keyword_index = retriever = llm = None
+
+def init():
+    """Initialize the chatbot components, indexing new or changed PDFs
+
+    Called by the entry points, not on import: spawned indexing workers
+    re-import the main module and only need ingest.parse_pdf.
+    """
+    global vector_store, keyword_index, retriever, llm
+    try:
+        logger.info("Initializing chatbot components...")
+
+        # Created empty on first run, then filled by update_vector_store
         vector_store = load_vector_store()
-    else:
-        logger.info("No existing vector store found, creating new one...")
-        documents = load_documents()
-        vector_store = create_vector_store(documents)
-
-    if vector_store is None:
-        raise ValueError("Failed to initialize vector store")
-
-    retriever = vector_store.as_retriever(search_kwargs={"k": 3})
-    llm = ChatGroq(
-        groq_api_key=os.environ["GROQ_API_KEY"],
-        temperature=0.0,
-        model="llama3-70b-8192",
-    )
-    logger.info("Chatbot components initialized successfully")
-except Exception as e:
-    logger.error(f"Error initializing chatbot components: {str(e)}")
-    raise
+        if vector_store is None:
+            raise ValueError("Failed to initialize vector store")
+        keyword_index = load_keyword_index(vector_store, "./chroma_db") if KEYWORD_SEARCH else None
+        update_vector_store(vector_store, keyword_index)
+
+        # Repeated questions skip embedding, search and reranking
+        retriever = HybridRetriever(
+            vector_store=vector_store,
+            keyword_index=keyword_index,
+            cache=retrieval_cache,
+            reranker=CrossEncoderReranker(RERANK_MODEL) if RERANK_MODEL else None,
+            k=RETRIEVAL_K,
+            candidates=RETRIEVAL_CANDIDATES,
+            rerank_candidates=RERANK_CANDIDATES
+        )
+        llm = ChatGroq(
+            groq_api_key=os.environ["GROQ_API_KEY"],
+            # Optional override, e.g. a stub server for load tests
+            groq_api_base=os.getenv('GROQ_API_BASE'),
+            temperature=0.0,
+            model="llama3-70b-8192",
+        )
+        logger.info("Chatbot components initialized successfully")
+    except Exception as e:
+        logger.error(f"Error initializing chatbot components: {str(e)}")
+        raise
 
 @app.route('/chat', methods=['POST'])
 def chat():
@@ -216,10 +295,37 @@ def chat():
         logger.error(f"Error in chat endpoint: {str(e)}")
         return jsonify({"error": "An error occurred while processing your request"}), 500
 
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    """/chat as server-sent events, sending the answer as it is generated"""
+    data = request.get_json(silent=True) or {}
+    question = data.get('question')
+    if not question:
+        logger.warning("No question provided in request")
+        return jsonify({"error": "No question provided"}), 400
+
+    logger.info(f"Received question: {question}")
+    return Response(stream_with_context(stream_chatbot_response(question, retriever, llm)),
+                    mimetype='text/event-stream', headers=SSE_HEADERS)
+
+@app.route('/reindex', methods=['POST'])
+def reindex():
+    """Pick up added, changed and deleted PDFs without a restart
+    
+    Chroma's on-disk store must only be written by the process serving from
+    it, so a running chatbot is re-indexed here rather than by ingest.py.
+    """
+    stats = update_vector_store(vector_store, keyword_index)
+    if stats is None:
+        return jsonify({"error": "Indexing failed"}), 500
+    return jsonify(stats)
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy"}), 200
+    return jsonify({"status": "healthy", "embeddings": vector_store.embeddings.stats(),
+                    "retrieval_cache": retrieval_cache.stats(), "context_budget": context_budget.stats()}), 200
 
 if __name__ == '__main__':
+    init()
     logger.info("Starting chatbot server...")
     app.run(host='0.0.0.0', port=5005)
\ No newline at end of file
@@ -0,0 +1,133 @@
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+import asyncio
+import chatbotStudent
+from chatbotStudent import (assemble_context, build_messages, highlight_key_terms, update_vector_store,
+                            retrieval_cache, context_budget, logger)
+from sse import SSE_HEADERS, IncrementalHighlighter, sse_event
+
+# ASGI version of chatbotStudent.py: retrieval runs in the default executor
+# and the LLM call is awaited (ChatGroq.ainvoke), so a waiting chat doesn't
+# hold a thread. Run with: python chatbot/chatbotStudent_async.py
+# or: uvicorn chatbotStudent_async:app --port 5005 (from the chatbot directory)
+
+app = cors(Quart(__name__), allow_origin="*")
+
+@app.before_serving
+async def startup():
+    # Not on import: spawned indexing workers re-import the main module
+    chatbotStudent.init()
+
+async def get_chatbot_response(question, retriever, llm, answer_cache=retrieval_cache):
+    try:
+        logger.info(f"Processing question: {question}")
+
+        cached = answer_cache.get_answer(question) if answer_cache is not None else None
+        if cached is not None:
+            logger.info("Answered from cache")
+            return cached["answer"]
+
+        # Retrieve documents
+        docs = await retriever.ainvoke(question)
+        logger.info(f"Retrieved {len(docs)} relevant documents")
+
+        context = assemble_context(docs)
+
+        # Call the LLM
+        logger.info("Generating response from LLM...")
+        response = await llm.ainvoke(build_messages(question, context.text))
+        answer = highlight_key_terms(response.content)
+        if answer_cache is not None:
+            answer_cache.put_answer(question, {"answer": answer, "sources": context.sources})
+
+        logger.info("Response generated successfully")
+        return answer
+    except Exception as e:
+        logger.error(f"Error generating response: {str(e)}")
+        return "I apologize, but I encountered an error while processing your question. Please try again."
+
+async def stream_chatbot_response(question, retriever, llm, answer_cache=retrieval_cache):
+    """Async stream_chatbot_response of chatbotStudent.py, over llm.astream"""
+    try:
+        logger.info(f"Processing question: {question}")
+        cached = answer_cache.get_answer(question) if answer_cache is not None else None
+        if cached is not None:
+            logger.info("Answered from cache")
+            yield sse_event("metadata", {"sources": cached["sources"]})
+            yield sse_event("token", {"text": cached["answer"]})
+            yield sse_event("done", {})
+            return
+
+        docs = await retriever.ainvoke(question)
+        logger.info(f"Retrieved {len(docs)} relevant documents")
+        context = assemble_context(docs)
+        sources = context.sources
+        yield sse_event("metadata", {"sources": sources})
+
+        highlighter = IncrementalHighlighter(highlight_key_terms)
+        answer = []
+        async for chunk in llm.astream(build_messages(question, context.text)):
+            text = highlighter.feed(chunk.content)
+            if text:
+                answer.append(text)
+                yield sse_event("token", {"text": text})
+        text = highlighter.flush()
+        if text:
+            answer.append(text)
+            yield sse_event("token", {"text": text})
+        if answer_cache is not None:
+            answer_cache.put_answer(question, {"answer": "".join(answer), "sources": sources})
+        yield sse_event("done", {})
+    except Exception as e:
+        logger.error(f"Error streaming response: {str(e)}")
+        yield sse_event("error", {"error": "I apologize, but I encountered an error while processing your question. Please try again."})
+
+@app.route('/chat', methods=['POST'])
+async def chat():
+    try:
+        data = await request.get_json()
+        question = data.get('question')
+        if not question:
+            logger.warning("No question provided in request")
+            return jsonify({"error": "No question provided"}), 400
+
+        logger.info(f"Received question: {question}")
+        answer = await get_chatbot_response(question, chatbotStudent.retriever, chatbotStudent.llm)
+        return jsonify({"answer": answer})
+    except Exception as e:
+        logger.error(f"Error in chat endpoint: {str(e)}")
+        return jsonify({"error": "An error occurred while processing your request"}), 500
+
+@app.route('/chat/stream', methods=['POST'])
+async def chat_stream():
+    """/chat as server-sent events, sending the answer as it is generated"""
+    data = await request.get_json(silent=True) or {}
+    question = data.get('question')
+    if not question:
+        logger.warning("No question provided in request")
+        return jsonify({"error": "No question provided"}), 400
+
+    logger.info(f"Received question: {question}")
+    response = Response(stream_chatbot_response(question, chatbotStudent.retriever, chatbotStudent.llm),
+                        mimetype='text/event-stream', headers=SSE_HEADERS)
+    response.timeout = None  # Long answers may stream for longer than the default 60s
+    return response
+
+@app.route('/reindex', methods=['POST'])
+async def reindex():
+    """Pick up added, changed and deleted PDFs without a restart"""
+    stats = await asyncio.to_thread(update_vector_store, chatbotStudent.vector_store,
+                                    chatbotStudent.keyword_index)
+    if stats is None:
+        return jsonify({"error": "Indexing failed"}), 500
+    return jsonify(stats)
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    return jsonify({"status": "healthy", "embeddings": chatbotStudent.vector_store.embeddings.stats(),
+                    "retrieval_cache": retrieval_cache.stats(), "context_budget": context_budget.stats()}), 200
+
+if __name__ == '__main__':
+    import uvicorn
+    logger.info("Starting chatbot server...")
+    uvicorn.run(app, host='0.0.0.0', port=5005)
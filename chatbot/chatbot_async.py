@@ -0,0 +1,341 @@
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+import aiomysql
+import asyncio
+from contextlib import asynccontextmanager
+from chatbot import (DB_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT, STUDENT_COURSES_PHRASES, CURRENT_COURSES_PHRASES,
+                     CURRENT_SEMESTER_QUERY, CURRENT_COURSES_QUERY, STUDENT_COURSES_QUERY, STUDENT_INFO_QUERY,
+                     get_role_specific_prompt, serialize_rows, identifier_condition, extract_student_identifier,
+                     build_sql_messages, build_response_messages, format_course_response,
+                     format_student_courses_response, sql_cache, intent_router, result_store, llm,
+                     RESULT_MAX_ROWS, RESULT_MAX_BYTES)
+from sql_cache import is_read_only
+from results import RETRY_UNWRAPPED_ERRNOS, FETCH_SIZE, BoundedRows, bounded_query
+from sse import SSE_HEADERS, sse_event
+
+# ASGI version of chatbot.py: same routes and answers, but LLM calls
+# (ChatGroq.ainvoke) and queries (aiomysql) don't hold a thread while they
+# wait, so one process serves as many concurrent chats as the LLM and the
+# connection pool allow. Run with: python chatbot/chatbot_async.py
+# or: uvicorn chatbot_async:app --port 5002 (from the chatbot directory)
+
+app = cors(Quart(__name__), allow_origin="*")
+
+_db_pool = None
+_db_pool_lock = asyncio.Lock()
+# Fire-and-forget work (SQL cache stores) still in flight
+_background_tasks = set()
+
+class DatabaseUnavailable(Exception):
+    pass
+
+async def get_db_pool():
+    """Create the connection pool on first use"""
+    global _db_pool
+    if _db_pool is None:
+        async with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = await aiomysql.create_pool(
+                    host=DB_CONFIG['host'],
+                    port=DB_CONFIG['port'],
+                    user=DB_CONFIG['user'],
+                    password=DB_CONFIG['password'] or "",
+                    db=DB_CONFIG['database'],
+                    minsize=1,
+                    maxsize=DB_POOL_SIZE,
+                    autocommit=True
+                )
+    return _db_pool
+
+@asynccontextmanager
+async def db_cursor(cursor_class=aiomysql.DictCursor):
+    """Dict cursor on a pooled connection, or None if the database is unavailable"""
+    connection = None
+    try:
+        pool = await get_db_pool()
+        # The pool queues callers while every connection is borrowed
+        connection = await asyncio.wait_for(pool.acquire(), DB_POOL_TIMEOUT)
+        # Health check: the server may have dropped an idle pooled connection
+        await connection.ping(reconnect=True)
+    except (asyncio.TimeoutError, aiomysql.Error, OSError) as err:
+        if connection is not None:
+            pool.release(connection)
+        print(f"Error connecting to database: {err}")
+        yield None
+        return
+    try:
+        async with connection.cursor(cursor_class) as cursor:
+            yield cursor
+    finally:
+        pool.release(connection)
+
+async def fetch_all(query, params=None):
+    """Rows of a query on its own pooled connection"""
+    async with db_cursor() as cursor:
+        if not cursor:
+            raise DatabaseUnavailable()
+        await cursor.execute(query, params)
+        return await cursor.fetchall()
+
+async def execute_sql_query(query, params=None):
+    """Execute SQL query and return results"""
+    try:
+        return {"results": serialize_rows(await fetch_all(query, params))}
+    except DatabaseUnavailable:
+        return {"error": "Database connection failed"}
+    except aiomysql.Error as err:
+        return {"error": f"Database error: {err}"}
+
+async def execute_bounded_query(query):
+    """Async execute_bounded_query of chatbot.py
+    
+    An unbuffered cursor streams the rows; closing it skips whatever wasn't
+    fetched, before the connection goes back to the pool.
+    """
+    try:
+        async with db_cursor(aiomysql.SSDictCursor) as cursor:
+            if not cursor:
+                return {"error": "Database connection failed"}
+            bounded = bounded_query(query, RESULT_MAX_ROWS)
+            try:
+                await cursor.execute(bounded)
+            except aiomysql.Error as err:
+                # Statements that can't be wrapped run as they are
+                if not err.args or err.args[0] not in RETRY_UNWRAPPED_ERRNOS or bounded == query:
+                    raise
+                await cursor.execute(query)
+            rows = BoundedRows(RESULT_MAX_ROWS, RESULT_MAX_BYTES)
+            # Writes have no result set
+            while cursor.description is not None:
+                batch = await cursor.fetchmany(FETCH_SIZE)
+                if not batch or not rows.extend(serialize_rows(batch)):
+                    break
+        return {"results": rows.rows, "truncated": rows.truncated, "size": rows.size}
+    except aiomysql.Error as err:
+        return {"error": f"Database error: {err}"}
+
+async def get_current_courses(user_id):
+    """Get current courses for a student"""
+    try:
+        async with db_cursor() as cursor:
+            if not cursor:
+                return {"error": "Database connection failed"}
+            await cursor.execute(CURRENT_SEMESTER_QUERY)
+            current_semester = await cursor.fetchone()
+            if not current_semester:
+                return {"error": "No active semester found"}
+            await cursor.execute(CURRENT_COURSES_QUERY, (user_id, current_semester['semester_id']))
+            courses = await cursor.fetchall()
+    except aiomysql.Error as err:
+        return {"error": f"Database error: {err}"}
+    return {"results": courses}
+
+async def get_student_courses_by_identifier(identifier):
+    """Get all courses for a student by email, username, student ID, or name"""
+    condition = identifier_condition(identifier)
+    if not condition:
+        return {"error": f"No user found with identifier '{identifier}'"}
+    where, params = condition
+
+    try:
+        async with db_cursor() as cursor:
+            if not cursor:
+                return {"error": "Database connection failed"}
+            await cursor.execute(f"SELECT u.user_id, u.first_name, u.last_name FROM users u WHERE {where} ORDER BY u.user_id LIMIT 1", params)
+            user = await cursor.fetchone()
+            if not user:
+                return {"error": f"No user found with identifier '{identifier}'"}
+            await cursor.execute(STUDENT_COURSES_QUERY.format(student="%s"), (user['user_id'],))
+            courses = await cursor.fetchall()
+    except aiomysql.Error as err:
+        return {"error": f"Database error: {err}"}
+    return {"results": courses, "student_name": f"{user['first_name']} {user['last_name']}"}
+
+async def prepare_chatbot_response(question, llm, role_id, user_id=None, sql_cache=sql_cache, intent_router=intent_router):
+    """Async prepare_chatbot_response of chatbot.py: (response, answer messages or None)"""
+    # Answer templated questions locally, in milliseconds
+    if intent_router is not None:
+        routed = await intent_router.aanswer(question, role_id, user_id, execute_sql_query)
+        if routed is not None:
+            return routed, None
+
+    # Check if this is a student courses query by identifier (email, username, student id, or name)
+    identifier = extract_student_identifier(question)
+    if identifier and any(phrase in question.lower() for phrase in STUDENT_COURSES_PHRASES):
+        if role_id != 1:  # Not an admin
+            return {"error": "Only administrators can view other students' courses"}, None
+        courses_result = await get_student_courses_by_identifier(identifier)
+        if "error" in courses_result:
+            return {"error": courses_result["error"]}, None
+        formatted_response = format_student_courses_response(courses_result["results"], courses_result.get("student_name"))
+        return {
+            "answer": formatted_response,
+            "raw_results": courses_result["results"]
+        }, None
+
+    # Check if this is a current courses query
+    if any(phrase in question.lower() for phrase in CURRENT_COURSES_PHRASES):
+        if role_id != 3:  # Not a student
+            return {"error": "Only students can view their current courses"}, None
+
+        courses_result = await get_current_courses(user_id)
+        if "error" in courses_result:
+            return {"error": courses_result["error"]}, None
+
+        formatted_response = format_course_response(courses_result["results"])
+        return {
+            "answer": formatted_response,
+            "raw_results": courses_result["results"]
+        }, None
+
+    if sql_cache is None:
+        sql_query = None
+    elif sql_cache.embed is not None:
+        # A semantic cache embeds the question on a miss; keep that off the event loop
+        sql_query = await asyncio.to_thread(sql_cache.get, question, role_id, user_id)
+    else:
+        sql_query = sql_cache.get(question, role_id, user_id)
+    cached_sql = sql_query is not None
+    if not cached_sql:
+        system_prompt = get_role_specific_prompt(role_id, user_id)
+        sql_query = (await llm.ainvoke(build_sql_messages(question, system_prompt))).content.strip()
+
+    query_result = await execute_bounded_query(sql_query)
+    if "error" in query_result:
+        return {"error": query_result["error"]}, None
+
+    if sql_cache is not None and not is_read_only(sql_query):
+        sql_cache.invalidate(sql_query)
+    # Store the SQL in the background while the LLM phrases the answer
+    elif sql_cache is not None and not cached_sql:
+        store = asyncio.ensure_future(asyncio.to_thread(sql_cache.put, question, role_id, user_id, sql_query))
+        # The event loop only keeps weak references to tasks
+        _background_tasks.add(store)
+        store.add_done_callback(_background_tasks.discard)
+    results = query_result["results"]
+    page = result_store.put(results, query_result["truncated"], role_id, user_id, query_result["size"])
+    return {
+        "sql_query": sql_query,
+        "cached_sql": cached_sql,
+        "raw_results": page["rows"],
+        "result": page["result"]
+    }, build_response_messages(question, results, role_id, query_result["truncated"])
+
+async def get_chatbot_response(question, llm, role_id, user_id=None, sql_cache=sql_cache, intent_router=intent_router):
+    response, answer_messages = await prepare_chatbot_response(question, llm, role_id, user_id, sql_cache, intent_router)
+    if answer_messages is not None:
+        response["answer"] = (await llm.ainvoke(answer_messages)).content
+    return response
+
+async def stream_chatbot_response(question, llm, role_id, user_id=None):
+    """Async stream_chatbot_response of chatbot.py, over llm.astream"""
+    try:
+        response, answer_messages = await prepare_chatbot_response(question, llm, role_id, user_id)
+        if "error" in response:
+            yield sse_event("error", response)
+            return
+        answer = response.pop("answer", None)
+        yield sse_event("metadata", response)
+        if answer_messages is None:
+            yield sse_event("token", {"text": answer})
+        else:
+            async for chunk in llm.astream(answer_messages):
+                if chunk.content:
+                    yield sse_event("token", {"text": chunk.content})
+        yield sse_event("done", {})
+    except Exception as e:
+        yield sse_event("error", {"error": str(e)})
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    return jsonify({"status": "healthy", "sql_cache": sql_cache.stats(), "result_store": result_store.stats()}), 200
+
+@app.route('/chat', methods=['POST'])
+async def chat():
+    try:
+        data = await request.get_json()
+        question = data.get('question')
+        role_id = data.get('role_id')
+        user_id = data.get('user_id')
+
+        if not question:
+            return jsonify({"error": "No question provided"}), 400
+        if not role_id:
+            return jsonify({"error": "No role ID provided"}), 400
+        if role_id in [2, 3] and not user_id:  # Instructor or Student role requires user_id
+            return jsonify({"error": "User ID required for this role"}), 400
+
+        response = await get_chatbot_response(question, llm, role_id, user_id)
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/chat/stream', methods=['POST'])
+async def chat_stream():
+    """/chat as server-sent events, sending the answer as it is generated"""
+    data = await request.get_json(silent=True) or {}
+    question = data.get('question')
+    role_id = data.get('role_id')
+    user_id = data.get('user_id')
+
+    if not question:
+        return jsonify({"error": "No question provided"}), 400
+    if not role_id:
+        return jsonify({"error": "No role ID provided"}), 400
+    if role_id in [2, 3] and not user_id:  # Instructor or Student role requires user_id
+        return jsonify({"error": "User ID required for this role"}), 400
+
+    response = Response(stream_chatbot_response(question, llm, role_id, user_id),
+                        mimetype='text/event-stream', headers=SSE_HEADERS)
+    response.timeout = None  # Long answers may stream for longer than the default 60s
+    return response
+
+@app.route('/results', methods=['POST'])
+async def get_results():
+    """Another page of a /chat result, by the result_id /chat returned"""
+    try:
+        data = await request.get_json()
+        result_id = data.get('result_id')
+        if not result_id:
+            return jsonify({"error": "No result ID provided"}), 400
+
+        try:
+            page = result_store.page(result_id, data.get('role_id'), data.get('user_id'),
+                                     data.get('page', 1), data.get('page_size'))
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid page or page size"}), 400
+        if page is None:
+            return jsonify({"error": "Result not found or expired"}), 404
+
+        return jsonify({"raw_results": page["rows"], "result": page["result"]})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/student-info', methods=['POST'])
+async def get_student_info():
+    try:
+        data = await request.get_json()
+        student_id = data.get('student_id')
+        if not student_id:
+            return jsonify({"error": "No student ID provided"}), 400
+
+        try:
+            rows = await fetch_all(STUDENT_INFO_QUERY, (student_id,))
+        except DatabaseUnavailable:
+            return jsonify({"error": "Database connection failed"}), 500
+        if not rows:
+            return jsonify({"error": "Student not found"}), 404
+
+        return jsonify(rows[0])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.after_serving
+async def close_db_pool():
+    if _db_pool is not None:
+        _db_pool.close()
+        await _db_pool.wait_closed()
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=5002)
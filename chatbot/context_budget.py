@@ -0,0 +1,165 @@
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+
+# Context of the student chatbot's prompt, assembled from retrieved chunks:
+# chunks of one page that overlap (the splitter repeats up to 200 characters
+# between neighbours) are merged into one passage, repeated text is sent
+# once, passages keep the retriever's order (best first) under a header with
+# their book and page for the APA references, and the whole fits a token
+# budget, cutting the last passage that fits only in part.
+
+# Roughly, for English prose and code, where tiktoken's encoding can't load
+CHARS_PER_TOKEN = 4
+
+# Shortest common span taken as overlap rather than coincidence
+MIN_OVERLAP = 40
+
+# Don't send a cut passage shorter than this many tokens
+MIN_PASSAGE_TOKENS = 50
+
+Context = namedtuple("Context", ["text", "sources", "stats"])
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def make_token_counter(encoding="cl100k_base"):
+    """Tokens in a text by a tiktoken encoding, close to Llama 3's tokenizer
+
+    Falls back to estimate_tokens when tiktoken isn't installed or can't
+    fetch the encoding (it downloads it on first use).
+    """
+    try:
+        import tiktoken
+        encode = tiktoken.get_encoding(encoding).encode
+    except Exception:
+        return estimate_tokens
+    return lambda text: len(encode(text, disallowed_special=()))
+
+def overlap_length(before, after, min_length=MIN_OVERLAP):
+    """Length of the longest suffix of before that after starts with"""
+    if len(after) < min_length:
+        return 0
+    probe = after[:min_length]
+    start = before.find(probe)
+    while start != -1:
+        if after.startswith(before[start:]):
+            return len(before) - start
+        start = before.find(probe, start + 1)
+    return 0
+
+def source_label(metadata):
+    """'<book>, page <n>' of a chunk, with PyPDFLoader's 0-based page made 1-based"""
+    label = os.path.splitext(os.path.basename(metadata.get("source", "unknown source")))[0]
+    page = metadata.get("page")
+    return f"{label}, page {page + 1}" if isinstance(page, int) else label
+
+class ContextBudget:
+    """Assembles retrieved documents into at most max_tokens of context
+
+    assemble() returns a Context: the text for the prompt, the metadata of
+    the passages it contains (what the answer can cite) and counts of what
+    was removed. stats() has the running totals, to report the reduction in
+    prompt size.
+    """
+
+    def __init__(self, max_tokens=1500, count_tokens=None, min_overlap=MIN_OVERLAP):
+        self.max_tokens = max_tokens
+        self.count_tokens = count_tokens or make_token_counter()
+        self.min_overlap = min_overlap
+        self._lock = threading.Lock()
+        self.contexts = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.seconds = 0.0
+
+    def _passages(self, docs):
+        """[metadata, text] per passage, best first, merging overlapping chunks of a page"""
+        passages = []
+        stats = {"duplicates": 0, "overlap_chars": 0}
+        for doc in docs:
+            text = doc.page_content.strip()
+            if not text:
+                continue
+            key = (doc.metadata.get("source"), doc.metadata.get("page"))
+            for passage in passages:
+                if (passage[0].get("source"), passage[0].get("page")) != key:
+                    continue
+                if text in passage[1]:
+                    stats["duplicates"] += 1
+                    break
+                # The chunk continues the passage, or the passage continues it
+                overlap = overlap_length(passage[1], text, self.min_overlap)
+                if overlap:
+                    passage[1] += text[overlap:]
+                    stats["overlap_chars"] += overlap
+                    break
+                overlap = overlap_length(text, passage[1], self.min_overlap)
+                if overlap:
+                    passage[1] = text + passage[1][overlap:]
+                    stats["overlap_chars"] += overlap
+                    break
+            else:
+                passages.append([doc.metadata, text])
+        return passages, stats
+
+    def _cut(self, text, max_tokens):
+        """Longest prefix of text, ending at a space, within max_tokens"""
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.count_tokens(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        cut = text[:low]
+        return cut[:cut.rfind(" ")] if " " in cut else cut
+
+    def assemble(self, docs):
+        started = time.perf_counter()
+        passages, stats = self._passages(docs)
+        blocks = []
+        sources = []
+        used = 0
+        stats.update(chunks=len(docs), passages=len(passages), dropped=0, truncated=False)
+        for number, (metadata, text) in enumerate(passages, start=1):
+            header = f"[{number}] {source_label(metadata)}\n"
+            tokens = self.count_tokens(header + text + "\n\n")
+            if used + tokens > self.max_tokens:
+                room = self.max_tokens - used - self.count_tokens(header + " ...\n\n")
+                if room < MIN_PASSAGE_TOKENS:
+                    stats["dropped"] = len(passages) - len(blocks)
+                    break
+                text = self._cut(text, room) + " ..."
+                tokens = self.count_tokens(header + text + "\n\n")
+                stats["truncated"] = True
+                stats["dropped"] = len(passages) - len(blocks) - 1
+            blocks.append(header + text + "\n\n")
+            sources.append(metadata)
+            used += tokens
+            if stats["truncated"]:
+                break
+
+        context = "".join(blocks)
+        # What the prompt had before: every chunk in full
+        stats["tokens_before"] = self.count_tokens("".join(f"{doc.page_content}\n\n" for doc in docs))
+        stats["tokens"] = used
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.contexts += 1
+            self.tokens_before += stats["tokens_before"]
+            self.tokens_after += used
+            self.seconds += seconds
+        return Context(context, sources, stats)
+
+    def stats(self):
+        return {
+            "max_tokens": self.max_tokens,
+            "contexts": self.contexts,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "reduction": round(1 - self.tokens_after / self.tokens_before, 3) if self.tokens_before else 0.0,
+            "mean_ms": round(self.seconds * 1000 / self.contexts, 3) if self.contexts else 0.0
+        }
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Embeddings for the student chatbot's vector store: one shared model for
+# indexing and queries, batched CPU inference with a set number of threads,
+# an on-disk cache of chunk embeddings keyed by content hash (repeated
+# headers, boilerplate pages and re-ingested files are embedded once), and
+# an optional ONNX Runtime backend, int8-quantized by default.
+# Export the model for the ONNX backend (needs `pip install optimum[onnxruntime]`):
+#     python embeddings.py export --output-dir ./onnx_model
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+# Longest input of all-MiniLM-L6-v2, in tokens
+MAX_SEQ_LENGTH = 256
+
+def model_id(model_name):
+    """Hub id of a sentence-transformers model given by its short name"""
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+def text_key(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """Embeddings on disk, keyed by the sha256 of the embedded text
+
+    vectors.f32 is a float32 matrix appended one row per text and read
+    through a memory map; keys.txt holds the key of each row, in order.
+    Rows are written before their keys, so an interrupted write never leaves
+    a key without its vector. Use one directory per model and backend: the
+    cache doesn't know which one produced a vector.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._keys_path = os.path.join(directory, "keys.txt")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._matrix = None
+        self.dim = None
+
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                self.dim = json.load(f)["dim"]
+            keys = []
+            if os.path.exists(self._keys_path):
+                with open(self._keys_path) as f:
+                    keys = f.read().split()
+            size = os.path.getsize(self._vectors_path) if os.path.exists(self._vectors_path) else 0
+            # Drop whatever an interrupted write left past the last complete row
+            complete = min(len(keys), size // (4 * self.dim))
+            if complete < len(keys) or size != complete * 4 * self.dim:
+                with open(self._vectors_path, "ab") as f:
+                    f.truncate(complete * 4 * self.dim)
+                with open(self._keys_path, "w") as f:
+                    f.write("".join(key + "\n" for key in keys[:complete]))
+            self._rows = {key: row for row, key in enumerate(keys[:complete])}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _map(self):
+        # Remap when rows were appended since the last map
+        if self._matrix is None or len(self._matrix) < len(self._rows):
+            self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._rows), self.dim))
+        return self._matrix
+
+    def get_many(self, keys):
+        """key -> vector for the keys that are cached"""
+        with self._lock:
+            rows = {key: self._rows[key] for key in keys if key in self._rows}
+            if not rows:
+                return {}
+            # One fancy-indexed read copies every hit out of the map at once
+            vectors = self._map()[list(rows.values())]
+            return dict(zip(rows, vectors))
+
+    def put_many(self, keys, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self._meta_path, "w") as f:
+                    json.dump({"dim": self.dim}, f)
+            new = [i for i, key in enumerate(keys) if key not in self._rows]
+            if not new:
+                return
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors[new].tobytes())
+            with open(self._keys_path, "a") as f:
+                f.write("".join(keys[i] + "\n" for i in new))
+            for i in new:
+                self._rows[keys[i]] = len(self._rows)
+
+class SentenceTransformerBackend:
+    """The model on PyTorch, as HuggingFaceEmbeddings runs it"""
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=32, threads=None):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.name = f"{model_name.replace('/', '_')}-torch"
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_id(model_name), device="cpu")
+
+    def embed(self, texts):
+        return self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True).astype(np.float32)
+
+class OnnxBackend:
+    """An exported model (see export_onnx) on ONNX Runtime
+
+    Mean pooling and L2 normalization as in the sentence-transformers
+    pipeline of all-MiniLM-L6-v2. Texts are batched by length so a batch
+    pads to similar lengths.
+    """
+
+    def __init__(self, model_dir, quantized=True, batch_size=32, threads=None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_file = "model_int8.onnx" if quantized else "model.onnx"
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(os.path.join(model_dir, model_file), options,
+                                                    providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+        self.name = f"{os.path.basename(os.path.normpath(model_dir))}-onnx{'-int8' if quantized else ''}"
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in batch])
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+            mask = inputs["attention_mask"][:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            for i, vector in zip(batch, pooled):
+                vectors[i] = vector
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+
+class EmbeddingService(Embeddings):
+    """langchain Embeddings over a backend, with the on-disk cache for documents
+
+    embed_documents embeds each distinct uncached text once and logs its
+    throughput in chunks/sec; stats() has the running totals. Queries skip
+    the disk cache: they rarely repeat exactly.
+    """
+
+    def __init__(self, backend, cache=None):
+        self.backend = backend
+        self.cache = cache
+        self._lock = threading.Lock()
+        self.texts = 0
+        self.cache_hits = 0
+        self.embedded = 0
+        self.seconds = 0.0
+
+    def embed_documents(self, texts):
+        started = time.perf_counter()
+        keys = [text_key(text) for text in texts]
+        vectors = self.cache.get_many(keys) if self.cache is not None else {}
+        hits = sum(key in vectors for key in keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            embedded = self.backend.embed(list(missing.values()))
+            vectors.update(zip(missing, embedded))
+            if self.cache is not None:
+                self.cache.put_many(list(missing), embedded)
+
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.texts += len(texts)
+            self.cache_hits += hits
+            self.embedded += len(missing)
+            self.seconds += seconds
+        if texts:
+            logger.info(f"Embedded {len(texts)} chunks ({hits} cached, {len(missing)} computed) in {seconds:.2f}s: "
+                        f"{len(texts) / max(seconds, 1e-9):.1f} chunks/sec")
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text):
+        return self.backend.embed([text])[0].tolist()
+
+    def stats(self):
+        return {
+            "backend": self.backend.name,
+            "batch_size": self.backend.batch_size,
+            "texts": self.texts,
+            "cache_hits": self.cache_hits,
+            "embedded": self.embedded,
+            "cached_vectors": len(self.cache) if self.cache is not None else 0,
+            "seconds": round(self.seconds, 3),
+            "chunks_per_sec": round(self.texts / self.seconds, 1) if self.seconds else 0.0
+        }
+
+def quantize_onnx(model_dir):
+    """model_int8.onnx next to model.onnx: weights as int8, dequantized on the fly"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(os.path.join(model_dir, "model.onnx"), os.path.join(model_dir, "model_int8.onnx"),
+                     weight_type=QuantType.QInt8)
+
+def export_onnx(model_name=DEFAULT_MODEL, output_dir="./onnx_model", quantize=True):
+    """Export a sentence-transformers model for OnnxBackend"""
+    try:
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+    except ImportError:
+        raise SystemExit("Exporting to ONNX needs optimum: pip install optimum[onnxruntime]")
+
+    ORTModelForFeatureExtraction.from_pretrained(model_id(model_name), export=True).save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(model_id(model_name)).save_pretrained(output_dir)
+    if quantize:
+        quantize_onnx(output_dir)
+
+def create_embeddings():
+    """EmbeddingService configured from the environment
+
+    EMBEDDING_BACKEND      torch (default) or onnx
+    EMBEDDING_ONNX_DIR     exported model for the onnx backend (./onnx_model)
+    EMBEDDING_QUANTIZED    1 (default) to run the int8 model on onnx
+    EMBEDDING_BATCH_SIZE   texts per inference batch (32)
+    EMBEDDING_THREADS      CPU inference threads (0: the runtime's default)
+    EMBEDDING_CACHE_DIR    on-disk cache (./embedding_cache; empty disables)
+    """
+    batch_size = int(os.getenv('EMBEDDING_BATCH_SIZE', 32))
+    threads = int(os.getenv('EMBEDDING_THREADS', 0)) or None
+    if os.getenv('EMBEDDING_BACKEND', 'torch') == 'onnx':
+        backend = OnnxBackend(os.getenv('EMBEDDING_ONNX_DIR', './onnx_model'),
+                              quantized=os.getenv('EMBEDDING_QUANTIZED', '1') == '1',
+                              batch_size=batch_size, threads=threads)
+    else:
+        backend = SentenceTransformerBackend(DEFAULT_MODEL, batch_size=batch_size, threads=threads)
+
+    cache_dir = os.getenv('EMBEDDING_CACHE_DIR', './embedding_cache')
+    # Vectors of different backends differ slightly: one cache each
+    cache = EmbeddingCache(os.path.join(cache_dir, backend.name)) if cache_dir else None
+    return EmbeddingService(backend, cache)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export the student chatbot's embedding model to ONNX")
+    parser.add_argument("command", choices=["export", "quantize"])
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--output-dir", default="./onnx_model")
+    parser.add_argument("--no-quantize", action="store_true", help="export only the float32 model")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.model, args.output_dir, quantize=not args.no_quantize)
+    else:
+        quantize_onnx(args.output_dir)
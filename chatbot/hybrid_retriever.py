@@ -0,0 +1,100 @@
+from typing import Any, Optional
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from retrieval_cache import RetrievalCache
+
+# Constant of reciprocal rank fusion: how much the top ranks dominate
+RRF_K = 60
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+def chunk_key(doc):
+    # Documents from Chroma's search don't carry their ids; overlapping
+    # chunks of one page still differ in content
+    return (doc.metadata.get("source"), doc.metadata.get("page"), doc.page_content)
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """One ranking from several, each a list of documents best first
+
+    A document scores sum(1 / (k + rank)) over the rankings it appears in,
+    so agreeing rankings reinforce each other and raw scores on different
+    scales (cosine distance, BM25) never need to be compared.
+    """
+    scores = {}
+    docs = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = chunk_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+class CrossEncoderReranker:
+    """Reorders candidates by a cross-encoder's score for (question, chunk)
+
+    Reads the question and each chunk together, which ranks better than
+    comparing separately computed embeddings but costs one inference per
+    candidate; meant for a few dozen candidates on CPU.
+    """
+
+    def __init__(self, model_name=DEFAULT_RERANK_MODEL, batch_size=32, max_length=512):
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = CrossEncoder(model_name, device="cpu", max_length=max_length)
+
+    def rerank(self, question, docs):
+        if not docs:
+            return []
+        scores = self.model.predict([(question, doc.page_content) for doc in docs], batch_size=self.batch_size)
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [docs[i] for i in order]
+
+class HybridRetriever(BaseRetriever):
+    """Dense and BM25 retrieval fused by reciprocal rank, through a RetrievalCache
+
+    Each side contributes its `candidates` best chunks; the fused list (or,
+    with a reranker, the first `rerank_candidates` of it reordered by the
+    cross-encoder) is cut to k. Exact terms such as identifiers, error
+    messages and section numbers are found by BM25 even when the embedding
+    misses them. Without a keyword index it is plain dense retrieval.
+    """
+
+    vector_store: Any
+    keyword_index: Any = None
+    cache: RetrievalCache
+    reranker: Optional[Any] = None
+    k: int = 3
+    candidates: int = 20
+    rerank_candidates: int = 20
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def dense_search(self, question, n):
+        vector = self.cache.embedding(question, self.vector_store.embeddings.embed_query)
+        return self.vector_store.similarity_search_by_vector(vector, k=n)
+
+    def keyword_search(self, question, n):
+        if self.keyword_index is None:
+            return []
+        ids = [chunk_id for chunk_id, _ in self.keyword_index.search(question, n)]
+        if not ids:
+            return []
+        stored = self.vector_store.get(ids=ids, include=["documents", "metadatas"])
+        docs = {chunk_id: Document(page_content=text, metadata=metadata or {})
+                for chunk_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"])}
+        # Chroma returns them in its own order
+        return [docs[chunk_id] for chunk_id in ids if chunk_id in docs]
+
+    def _search(self, question):
+        dense = self.dense_search(question, self.candidates)
+        keyword = self.keyword_search(question, self.candidates)
+        fused = reciprocal_rank_fusion([dense, keyword]) if keyword else dense
+        if self.reranker is not None:
+            fused = self.reranker.rerank(question, fused[:self.rerank_candidates])
+        return fused[:self.k]
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.cache.documents(query, self._search)
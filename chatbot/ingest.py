@@ -0,0 +1,248 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from langchain_community.document_loaders import PyPDFLoader
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from bm25 import BM25Index
+
+# Incremental indexing of the PDFs in the data directory into the Chroma
+# store of chatbotStudent.py. A manifest next to the store records what each
+# file looked like when it was indexed, so a run only parses and embeds new
+# or changed files and removes the chunks of deleted ones. A BM25 index of
+# the same chunks, for keyword search, is kept next to the store.
+# Run from the chatbot directory to index while the chatbot is stopped
+# (a running one is re-indexed with POST /reindex: Chroma's on-disk store
+# must only be written by the process serving from it):
+#     python ingest.py [--data-dir ../data] [--workers 4]
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "ingest_manifest.json"
+KEYWORD_INDEX_NAME = "bm25_index.pkl"
+
+def make_text_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        length_function=len,
+        separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
+    )
+
+def file_hash(path):
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def parse_pdf(path):
+    """Chunks of one PDF; runs in a worker process"""
+    return make_text_splitter().split_documents(PyPDFLoader(path).load())
+
+def scan_pdfs(data_dir):
+    """Path relative to data_dir -> path of every PDF under it"""
+    pdfs = {}
+    for root, _, names in os.walk(data_dir):
+        for name in names:
+            if name.lower().endswith(".pdf"):
+                path = os.path.join(root, name)
+                pdfs[os.path.relpath(path, data_dir)] = path
+    return pdfs
+
+def load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def save_manifest(path, manifest):
+    # Replace atomically: an interrupted run must not leave half a manifest
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+def manifest_version(persist_directory):
+    """Changes whenever a sync changes the index: (mtime, size) of the manifest"""
+    try:
+        status = os.stat(os.path.join(persist_directory, MANIFEST_NAME))
+    except FileNotFoundError:
+        return None
+    return (status.st_mtime_ns, status.st_size)
+
+def manifest_from_store(vector_store, data_dir):
+    """Manifest for a store indexed before manifests existed
+
+    Every source in the store is listed without a hash, so files still
+    present are re-indexed once and deleted ones removed.
+    """
+    metadatas = vector_store.get(include=["metadatas"])["metadatas"]
+    sources = {metadata["source"] for metadata in metadatas if metadata and "source" in metadata}
+    return {os.path.relpath(source, data_dir): {"source": source, "sha256": None} for source in sources}
+
+def delete_source(vector_store, source):
+    """Remove every chunk of one file from the store"""
+    ids = vector_store.get(where={"source": source}, include=[])["ids"]
+    if ids:
+        vector_store.delete(ids=ids)
+    return len(ids)
+
+def load_keyword_index(vector_store, persist_directory):
+    """BM25 index of the store's chunks, as saved by sync_vector_store
+
+    Rebuilt from the chunks in the store when it is missing or doesn't
+    match the manifest (e.g. a sync was interrupted before saving it).
+    """
+    path = os.path.join(persist_directory, KEYWORD_INDEX_NAME)
+    manifest = load_manifest(os.path.join(persist_directory, MANIFEST_NAME)) or {}
+    digests = {entry["source"]: entry["sha256"] for entry in manifest.values()}
+    index = BM25Index.load(path)
+    if index is not None and index.sources() == digests:
+        return index
+
+    started = time.perf_counter()
+    stored = vector_store.get(include=["documents", "metadatas"])
+    chunks = {}
+    for chunk_id, text, metadata in zip(stored["ids"], stored["documents"], stored["metadatas"]):
+        source = (metadata or {}).get("source")
+        if source in digests:
+            ids, texts = chunks.setdefault(source, ([], []))
+            ids.append(chunk_id)
+            texts.append(text)
+    index = BM25Index()
+    for source, digest in digests.items():
+        ids, texts = chunks.get(source, ([], []))
+        index.add_source(source, digest, ids, texts)
+    index.save(path)
+    logger.info(f"Rebuilt the BM25 index of {len(index)} chunks in {time.perf_counter() - started:.2f}s")
+    return index
+
+def sync_vector_store(vector_store, data_dir, persist_directory, workers=None, keyword_index=None):
+    """Bring the store in line with the PDFs in data_dir
+
+    Files whose size and mtime match the manifest are skipped without being
+    read; the rest are hashed, and only those whose contents changed are
+    parsed (across a process pool) and re-embedded. The manifest is saved
+    after every file, so an interrupted run resumes where it stopped.
+    keyword_index (see load_keyword_index) is updated along with the store
+    and saved at the end. Returns counts of what changed and the time it took.
+    """
+    started = time.perf_counter()
+    manifest_path = os.path.join(persist_directory, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    if manifest is None:
+        manifest = manifest_from_store(vector_store, data_dir)
+
+    pdfs = scan_pdfs(data_dir)
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0, "chunks": 0}
+
+    for relative in sorted(set(manifest) - set(pdfs)):
+        source = manifest.pop(relative)["source"]
+        delete_source(vector_store, source)
+        if keyword_index is not None:
+            keyword_index.remove_source(source)
+        save_manifest(manifest_path, manifest)
+        stats["removed"] += 1
+        logger.info(f"Removed {relative} from the vector store")
+
+    changed = {}
+    touched = False
+    for relative, path in sorted(pdfs.items()):
+        status = os.stat(path)
+        entry = manifest.get(relative)
+        if entry and entry.get("size") == status.st_size and entry.get("mtime") == status.st_mtime:
+            stats["unchanged"] += 1
+            continue
+        digest = file_hash(path)
+        if entry and entry.get("sha256") == digest:
+            # Touched but not modified
+            entry.update(size=status.st_size, mtime=status.st_mtime)
+            touched = True
+            stats["unchanged"] += 1
+            continue
+        changed[relative] = (path, digest, status)
+
+    if not changed:
+        # Left alone when nothing changed: rewriting it would look like an index change
+        if touched or not os.path.exists(manifest_path):
+            save_manifest(manifest_path, manifest)
+        if stats["removed"] and keyword_index is not None:
+            keyword_index.save(os.path.join(persist_directory, KEYWORD_INDEX_NAME))
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        stats["chunks_per_sec"] = 0.0
+        return stats
+
+    logger.info(f"Indexing {len(changed)} new or changed PDF(s)...")
+    workers = min(workers or os.cpu_count() or 1, len(changed))
+    executor = None
+    # Spawned, not forked: /reindex runs this in a multi-threaded server, and
+    # a fork copies locks other threads may hold. Spawned workers re-import
+    # the main module, so the chatbots only initialize from their entry points.
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        futures = {executor.submit(parse_pdf, path): relative for relative, (path, _, _) in changed.items()}
+        parsed = ((futures[future], future) for future in as_completed(futures))
+    else:
+        parsed = ((relative, path) for relative, (path, _, _) in changed.items())
+
+    try:
+        # Embed each file as soon as it is parsed, while the pool parses the rest
+        for relative, result in parsed:
+            path, digest, status = changed[relative]
+            try:
+                chunks = result.result() if executor else parse_pdf(result)
+            except Exception as e:
+                # Keep whatever was indexed before; the next run retries
+                logger.error(f"Error parsing {relative}: {str(e)}")
+                stats["failed"] += 1
+                continue
+
+            entry = manifest.get(relative)
+            if entry:
+                delete_source(vector_store, entry["source"])
+                if keyword_index is not None:
+                    keyword_index.remove_source(entry["source"])
+            # Deterministic ids: re-adding after an interrupted run overwrites
+            prefix = hashlib.sha256(f"{relative}\0{digest}".encode()).hexdigest()[:24]
+            ids = [f"{prefix}-{i}" for i in range(len(chunks))]
+            if chunks:
+                vector_store.add_documents(chunks, ids=ids)
+            if keyword_index is not None:
+                keyword_index.add_source(path, digest, ids, [chunk.page_content for chunk in chunks])
+            manifest[relative] = {"source": path, "sha256": digest, "size": status.st_size,
+                                  "mtime": status.st_mtime, "chunks": len(chunks)}
+            save_manifest(manifest_path, manifest)
+            stats["updated" if entry else "added"] += 1
+            stats["chunks"] += len(chunks)
+            logger.info(f"Indexed {relative}: {len(chunks)} chunks")
+    finally:
+        if executor:
+            executor.shutdown(cancel_futures=True)
+        if keyword_index is not None:
+            keyword_index.save(os.path.join(persist_directory, KEYWORD_INDEX_NAME))
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["chunks_per_sec"] = round(stats["chunks"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    return stats
+
+if __name__ == "__main__":
+    import argparse
+    from langchain_community.vectorstores import Chroma
+    from embeddings import create_embeddings
+
+    parser = argparse.ArgumentParser(description="Index new and changed PDFs for the student chatbot")
+    parser.add_argument("--data-dir", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+    parser.add_argument("--persist-directory", default="./chroma_db")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = Chroma(persist_directory=args.persist_directory, embedding_function=create_embeddings())
+    keyword_index = load_keyword_index(store, args.persist_directory)
+    print(json.dumps(sync_vector_store(store, args.data_dir, args.persist_directory, args.workers, keyword_index)))
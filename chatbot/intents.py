@@ -0,0 +1,456 @@
+import re
+import time
+
+ADMIN, INSTRUCTOR, STUDENT = 1, 2, 3
+
+# Templates match the whole question, so a qualifier they don't know about
+# ("how many students failed CS101", "students who dropped CS101") falls
+# through to the LLM instead of being answered as the plain question. The
+# router lowercases the question, collapses whitespace and strips the
+# courtesy below and trailing punctuation first; the templates themselves
+# allow only a few filler words (ASK, "the", "course").
+LEADING_COURTESY = re.compile(r"^(?:(?:please|kindly|hi|hey|hello)[ ,]+|(?:can|could|would|will) you (?:please )?)+")
+TRAILING_COURTESY = re.compile(r"[ ,]+please$")
+ASK = (r"(?:(?:what is|what's|whats|what are|what were|when is|when are|show me|show|tell me|give me|"
+       r"list|get|display|find|check|see) )?")
+THE = r"(?:the )?"
+
+# Words followed by a number that aren't course codes ("more than 100",
+# "fall 2023", "stu123"); the router also checks codes against the courses
+# table when it has a CourseCatalog
+NOT_COURSE_PREFIXES = ("stu", "than", "over", "under", "above", "below", "least", "most", "fall", "spring",
+                       "summer", "winter", "year", "term", "page", "room", "top", "last", "first", "from",
+                       "since", "till", "until", "to")
+
+# Slot patterns. Course codes like CS101, "MATH 202" or IT-310.
+COURSE = (r"(?P<course>\b(?!(?:" + "|".join(NOT_COURSE_PREFIXES) + r")[ -]?\d)"
+          r"[a-z]{2,4}[ -]?\d{3,4}[a-z]?\b)")
+COURSE_REF = THE + r"(?:course |class )?" + COURSE + r"(?: course| class)?"
+
+# Words that end up in a slot when a question isn't about one person
+NOT_NAMES = ("my", "me", "the", "this", "that", "all", "our", "your", "his", "her", "their", "them", "us",
+             "each", "every", "everyone", "everybody", "course", "courses", "class", "classes", "student",
+             "students", "instructor", "instructors", "professor", "professors", "teacher", "teachers",
+             "department", "office", "hours", "available")
+NOT_NAME = r"(?!(?:" + "|".join(NOT_NAMES) + r")\b)"
+IDENTIFIER = NOT_NAME + r"(?P<identifier>[a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,}|stu\d+|[a-z0-9._-]+)"
+PERSON = r"(?:dr\.? |prof(?:essor)?\.? )?(?P<name>" + NOT_NAME + r"[a-z]+(?: " + NOT_NAME + r"[a-z]+)?)"
+
+# Same scale as Student.calculateGPA in the web app: letter grades of
+# completed courses, and posted scores of current ones
+GRADE_POINTS = {
+    "A+": 4.0, "A": 4.0, "A-": 3.7,
+    "B+": 3.3, "B": 3.0, "B-": 2.7,
+    "C+": 2.3, "C": 2.0, "C-": 1.7,
+    "D+": 1.3, "D": 1.0, "D-": 0.7,
+    "F": 0.0
+}
+SCORE_POINTS = [(90, 4.0), (87, 3.7), (84, 3.3), (80, 3.0), (77, 2.7), (74, 2.3), (70, 2.0),
+                (67, 1.7), (64, 1.3), (60, 1.0)]
+GRADE_POINTS_SQL = "CASE e.final_grade " + " ".join(
+    f"WHEN '{grade}' THEN {points}" for grade, points in GRADE_POINTS.items()
+) + " ELSE 0 END"
+SCORE_POINTS_SQL = "CASE " + " ".join(
+    f"WHEN g.total_score >= {score} THEN {points}" for score, points in SCORE_POINTS
+) + " ELSE 0 END"
+
+def normalize_question(question):
+    question = " ".join(question.lower().split()).strip(" ?.!")
+    question = TRAILING_COURTESY.sub("", LEADING_COURTESY.sub("", question))
+    return question.strip(" ?.!,")
+
+class IntentError(Exception):
+    """A matched intent the user isn't allowed to ask, answered with an error"""
+
+class Intent:
+    """A question shape answered by a parameterized SQL template
+
+    patterns are regexes that must match the whole normalized question
+    (see normalize_question); named groups become slots. query(slots,
+    role_id, user_id) returns (sql, params) with the caller's access scope
+    applied, and format(rows, slots) turns the rows into the answer text.
+    """
+
+    def __init__(self, name, patterns, query, format, roles=(ADMIN, INSTRUCTOR, STUDENT)):
+        self.name = name
+        self.patterns = [re.compile(pattern) for pattern in patterns]
+        self.query = query
+        self.format = format
+        self.roles = roles
+
+    def match(self, question):
+        for pattern in self.patterns:
+            match = pattern.fullmatch(question)
+            if match:
+                return {name: value for name, value in match.groupdict().items() if value is not None}
+        return None
+
+class CourseCatalog:
+    """Normalized codes of the courses in the database, reloaded every ttl seconds
+
+    Tells course codes from words that look like one. The router refreshes
+    it through its run_query; until a load succeeds no course slot matches,
+    so those questions go to the LLM.
+    """
+
+    QUERY = "SELECT DISTINCT course_code FROM courses"
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self.codes = None
+        self.loaded_at = None
+
+    def stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at >= self.ttl
+
+    def update(self, result):
+        """Take the result of run_query(QUERY); a failed load keeps the old codes"""
+        if "error" in result:
+            return
+        self.codes = frozenset(normalize_course(row["course_code"]) for row in result["results"])
+        self.loaded_at = time.monotonic()
+
+    def __contains__(self, code):
+        return self.codes is not None and normalize_course(code) in self.codes
+
+class IntentRouter:
+    """Answers common questions from SQL templates, without calling the LLM
+
+    Intents are tried in registration order; the first whose pattern matches
+    wins, so register more specific shapes first. With a catalog, a course
+    slot must name a course that exists.
+    """
+
+    def __init__(self, intents=(), catalog=None):
+        self.intents = list(intents)
+        self.catalog = catalog
+
+    def register(self, intent):
+        self.intents.append(intent)
+        return intent
+
+    def match(self, question):
+        """(intent, slots) for the first matching intent, or None"""
+        question = normalize_question(question)
+        for intent in self.intents:
+            slots = intent.match(question)
+            if slots is None:
+                continue
+            if "course" in slots and self.catalog is not None and slots["course"] not in self.catalog:
+                continue
+            return intent, slots
+        return None
+
+    def prepare(self, question, role_id, user_id):
+        """(intent, slots, sql, params) for a templated question, an error
+        response if the caller may not ask it, or None if no intent matches"""
+        matched = self.match(question)
+        if matched is None:
+            return None
+        intent, slots = matched
+
+        try:
+            if role_id not in intent.roles:
+                raise IntentError("You don't have access to this information")
+            query, params = intent.query(slots, role_id, user_id)
+        except IntentError as e:
+            return {"error": str(e), "intent": intent.name}
+        return intent, slots, query, params
+
+    @staticmethod
+    def respond(intent, slots, result):
+        """Response dict from the result of a prepared query"""
+        if "error" in result:
+            return {"error": result["error"], "intent": intent.name}
+        return {
+            "answer": intent.format(result["results"], slots),
+            "raw_results": result["results"],
+            "intent": intent.name
+        }
+
+    def answer(self, question, role_id, user_id, run_query):
+        """Response dict for a templated question, or None to fall back to the LLM
+
+        run_query(sql, params) must return {"results": rows} or {"error": ...},
+        like chatbot.execute_sql_query.
+        """
+        if self.catalog is not None and self.catalog.stale():
+            self.catalog.update(run_query(CourseCatalog.QUERY, None))
+        prepared = self.prepare(question, role_id, user_id)
+        if not isinstance(prepared, tuple):
+            return prepared
+        intent, slots, query, params = prepared
+        return self.respond(intent, slots, run_query(query, params))
+
+    async def aanswer(self, question, role_id, user_id, run_query):
+        """answer() for an async run_query"""
+        if self.catalog is not None and self.catalog.stale():
+            self.catalog.update(await run_query(CourseCatalog.QUERY, None))
+        prepared = self.prepare(question, role_id, user_id)
+        if not isinstance(prepared, tuple):
+            return prepared
+        intent, slots, query, params = prepared
+        return self.respond(intent, slots, await run_query(query, params))
+
+def normalize_course(code):
+    return re.sub(r"[ -]", "", code).upper()
+
+def course_filter(slots, role_id, user_id):
+    """WHERE conditions for the slot's course, limited to the caller's courses"""
+    conditions = "REPLACE(REPLACE(c.course_code, ' ', ''), '-', '') = %s"
+    params = [normalize_course(slots["course"])]
+    if role_id == INSTRUCTOR:
+        conditions += " AND c.course_id IN (SELECT course_id FROM course_instructors WHERE instructor_id = %s)"
+        params.append(user_id)
+    elif role_id == STUDENT:
+        conditions += " AND c.course_id IN (SELECT course_id FROM enrollments WHERE student_id = %s)"
+        params.append(user_id)
+    return conditions, params
+
+def not_found(slots):
+    return f"I couldn't find {normalize_course(slots['course'])} among the courses you have access to."
+
+# Enrollment counts
+
+def enrollment_count_query(slots, role_id, user_id):
+    conditions, params = course_filter(slots, role_id, user_id)
+    return f"""
+        SELECT
+            c.course_code,
+            c.title,
+            s.semester_name,
+            COUNT(DISTINCT CASE WHEN e.status = 'active' THEN e.student_id END) AS active_students,
+            COUNT(DISTINCT e.student_id) AS total_students
+        FROM courses c
+        LEFT JOIN semesters s ON c.semester_id = s.semester_id
+        LEFT JOIN enrollments e ON e.course_id = c.course_id
+        WHERE {conditions}
+        GROUP BY c.course_id, c.course_code, c.title, s.semester_name, c.semester_id
+        ORDER BY c.semester_id DESC
+    """, params
+
+def format_enrollment_count(rows, slots):
+    if not rows:
+        return not_found(slots)
+    response = ""
+    for row in rows:
+        semester = f" ({row['semester_name']})" if row.get('semester_name') else ""
+        response += (f"📚 {row['course_code']} - {row['title']}{semester}: "
+                     f"{row['active_students']} active students, {row['total_students']} enrolled in total\n")
+    return response
+
+# Course rosters
+
+def roster_query(slots, role_id, user_id):
+    conditions, params = course_filter(slots, role_id, user_id)
+    return f"""
+        SELECT
+            c.course_code,
+            s.semester_name,
+            sp.student_id,
+            CONCAT(u.first_name, ' ', u.last_name) AS student_name,
+            u.email,
+            e.status
+        FROM courses c
+        JOIN enrollments e ON e.course_id = c.course_id
+        JOIN users u ON e.student_id = u.user_id
+        LEFT JOIN student_profiles sp ON u.user_id = sp.user_id
+        LEFT JOIN semesters s ON c.semester_id = s.semester_id
+        WHERE {conditions}
+        ORDER BY c.semester_id DESC, u.last_name, u.first_name
+        LIMIT 500
+    """, params
+
+def format_roster(rows, slots):
+    if not rows:
+        return f"No students are enrolled in {normalize_course(slots['course'])} in the courses you have access to."
+    response = ""
+    current = None
+    for row in rows:
+        offering = (row['course_code'], row.get('semester_name'))
+        if offering != current:
+            current = offering
+            semester = f" ({row['semester_name']})" if row.get('semester_name') else ""
+            if response:
+                response += "\n"
+            response += f"Students in {row['course_code']}{semester}:\n"
+        student_id = f" [{row['student_id']}]" if row.get('student_id') else ""
+        response += f"   • {row['student_name']}{student_id} - {row['email']} ({row['status']})\n"
+    if len(rows) == 500:
+        response += "\nOnly the first 500 students are listed."
+    return response
+
+# Grade distributions
+
+def grade_distribution_query(slots, role_id, user_id):
+    if role_id == STUDENT:
+        raise IntentError("Only administrators and instructors can view grade distributions")
+    conditions, params = course_filter(slots, role_id, user_id)
+    return f"""
+        SELECT
+            c.course_code,
+            COALESCE(e.final_grade, 'Not graded') AS final_grade,
+            COUNT(*) AS students
+        FROM courses c
+        JOIN enrollments e ON e.course_id = c.course_id
+        WHERE {conditions}
+        GROUP BY c.course_code, COALESCE(e.final_grade, 'Not graded')
+    """, params
+
+def format_grade_distribution(rows, slots):
+    if not rows:
+        return f"No grades found for {normalize_course(slots['course'])} in the courses you have access to."
+    order = list(GRADE_POINTS) + ["Not graded"]
+    rows = sorted(rows, key=lambda row: order.index(row['final_grade']) if row['final_grade'] in order else len(order))
+    total = sum(row['students'] for row in rows)
+    response = f"Final grade distribution for {rows[0]['course_code']} ({total} students):\n\n"
+    for row in rows:
+        response += f"   {row['final_grade']}: {row['students']} ({row['students'] / total:.0%})\n"
+    return response
+
+# Instructor office hours
+
+def office_hours_query(slots, role_id, user_id):
+    if "course" in slots:
+        conditions, params = course_filter(slots, role_id, user_id)
+    elif "name" in slots:
+        parts = slots["name"].split()
+        if len(parts) == 2:
+            conditions = "((u.first_name LIKE %s AND u.last_name LIKE %s) OR (u.first_name LIKE %s AND u.last_name LIKE %s))"
+            params = [f"%{parts[0]}%", f"%{parts[1]}%", f"%{parts[1]}%", f"%{parts[0]}%"]
+        else:
+            conditions = "(u.first_name LIKE %s OR u.last_name LIKE %s)"
+            params = [f"%{parts[0]}%"] * 2
+    elif role_id == STUDENT:
+        conditions = "c.course_id IN (SELECT course_id FROM enrollments WHERE student_id = %s AND status = 'active')"
+        params = [user_id]
+    elif role_id == INSTRUCTOR:
+        conditions = "u.user_id = %s"
+        params = [user_id]
+    else:
+        raise IntentError("Please name the instructor or course code")
+    return f"""
+        SELECT DISTINCT
+            CONCAT(u.first_name, ' ', u.last_name) AS instructor_name,
+            ip.office_location,
+            ip.office_hours,
+            c.course_code
+        FROM course_instructors ci
+        JOIN courses c ON ci.course_id = c.course_id
+        JOIN users u ON ci.instructor_id = u.user_id
+        LEFT JOIN instructor_profiles ip ON u.user_id = ip.user_id
+        WHERE {conditions}
+        ORDER BY instructor_name, c.course_code
+        LIMIT 100
+    """, params
+
+def format_office_hours(rows, slots):
+    if not rows:
+        return "I couldn't find an instructor matching that question."
+    instructors = {}
+    for row in rows:
+        instructor = instructors.setdefault(row['instructor_name'], dict(row, courses=[]))
+        if row['course_code'] not in instructor['courses']:
+            instructor['courses'].append(row['course_code'])
+    response = ""
+    for name, instructor in instructors.items():
+        response += f"👤 {name} ({', '.join(instructor['courses'])})\n"
+        response += f"   Office: {instructor['office_location'] or 'Not listed'}\n"
+        response += f"   Office Hours: {instructor['office_hours'] or 'Not listed'}\n\n"
+    return response
+
+# GPA
+
+def gpa_query(slots, role_id, user_id):
+    if "identifier" not in slots:
+        if role_id != STUDENT:
+            raise IntentError("Only students have a GPA; ask for a specific student's GPA instead")
+        target, params = "u.user_id = %s", [user_id]
+    elif role_id != ADMIN:
+        raise IntentError("Only administrators can view other students' GPA")
+    else:
+        identifier = slots["identifier"]
+        target = ("(u.email = %s OR u.username = %s OR "
+                  "u.user_id IN (SELECT user_id FROM student_profiles WHERE student_id = %s))")
+        params = [identifier, identifier, identifier.upper()]
+    # Student.calculateGPA's formula: credit-weighted points of the final
+    # grades, plus each posted grade of a course still without one
+    student = f"e.student_id IN (SELECT u.user_id FROM users u WHERE {target})"
+    return f"""
+        SELECT
+            CONCAT(u.first_name, ' ', u.last_name) AS student_name,
+            COUNT(DISTINCT CASE WHEN p.completed = 1 THEN p.course_id END) AS graded_courses,
+            COUNT(DISTINCT CASE WHEN p.completed = 0 THEN p.course_id END) AS current_courses,
+            COALESCE(SUM(p.credit_hours), 0) AS credit_hours,
+            ROUND(SUM(p.credit_hours * p.points) / NULLIF(SUM(p.credit_hours), 0), 2) AS gpa
+        FROM users u
+        LEFT JOIN (
+            SELECT e.student_id, e.course_id, c.credit_hours, 1 AS completed, {GRADE_POINTS_SQL} AS points
+            FROM enrollments e
+            JOIN courses c ON e.course_id = c.course_id
+            WHERE e.final_grade IS NOT NULL AND {student}
+            UNION ALL
+            SELECT e.student_id, e.course_id, c.credit_hours, 0 AS completed, {SCORE_POINTS_SQL} AS points
+            FROM enrollments e
+            JOIN courses c ON e.course_id = c.course_id
+            JOIN grades g ON e.course_id = g.course_id AND e.student_id = g.student_id
+            WHERE e.final_grade IS NULL AND g.status = 'posted' AND {student}
+        ) p ON p.student_id = u.user_id
+        WHERE {target}
+        GROUP BY u.user_id, u.first_name, u.last_name
+        LIMIT 1
+    """, params * 3
+
+def format_gpa(rows, slots):
+    identifier = slots.get("identifier")
+    if not rows:
+        if identifier is None:
+            return "I couldn't find your student record."
+        return f"No student found with identifier '{identifier}'."
+    row = rows[0]
+    owner = "Your" if identifier is None else f"{row['student_name']}'s"
+    if row['gpa'] is None:
+        return f"{owner} GPA isn't available yet: there are no final or posted grades."
+    courses = f"{row['graded_courses']} graded courses"
+    if row['current_courses']:
+        courses += f" and posted grades in {row['current_courses']} current courses"
+    return f"{owner} cumulative GPA is {float(row['gpa']):.2f}, based on {courses} ({row['credit_hours']} credit hours)."
+
+def default_intents():
+    """The built-in templates, most specific first"""
+    return [
+        Intent("gpa", [
+            ASK + r"my (?:current |cumulative |overall )?(?:gpa|grade point average)",
+            ASK + THE + r"(?:current |cumulative |overall )?(?:gpa|grade point average) (?:of|for) (?:student )?"
+            + IDENTIFIER
+        ], gpa_query, format_gpa),
+        Intent("grade_distribution", [
+            ASK + THE + r"(?:final )?grades? (?:distribution|breakdown|spread|summary) (?:of|for|in) " + COURSE_REF,
+            ASK + THE + r"distribution of (?:final )?grades (?:of|for|in) " + COURSE_REF,
+            r"how (?:are|were) " + THE + r"(?:final )?grades (?:distributed )?(?:in|for) " + COURSE_REF,
+            ASK + COURSE_REF + r"(?:'s)? (?:final )?grades? (?:distribution|breakdown|spread|summary)"
+        ], grade_distribution_query, format_grade_distribution, roles=(ADMIN, INSTRUCTOR)),
+        Intent("enrollment_count", [
+            r"how many (?:students|people|learners) (?:are |were )?(?:currently )?(?:enrolled |registered )?"
+            r"(?:in|on|for|taking) " + COURSE_REF,
+            r"how many (?:students|people|learners|enrollments|enrolments) (?:does|do) " + COURSE_REF + r" have",
+            ASK + THE + r"(?:number|count) of (?:students|enrollments|enrolments) (?:enrolled )?(?:in|for|of) "
+            + COURSE_REF,
+            ASK + THE + r"enrol?lment (?:count|size|numbers?) (?:of|for|in) " + COURSE_REF,
+            ASK + COURSE_REF + r"(?:'s)? enrol?lment(?: count| size| numbers?)?"
+        ], enrollment_count_query, format_enrollment_count, roles=(ADMIN, INSTRUCTOR)),
+        Intent("office_hours", [
+            ASK + THE + r"office hours? (?:of|for) (?:the (?:instructor|professor|teacher) (?:of|for) )?" + COURSE_REF,
+            ASK + COURSE_REF + r"(?:'s)? (?:(?:instructor|professor|teacher)(?:'s)? )?office hours?",
+            ASK + r"(?:my|our) (?:(?:instructors?|professors?|teachers?)(?:'s?)? )?office hours?",
+            ASK + THE + r"office hours? (?:of|for) " + PERSON,
+            ASK + PERSON + r"'s office hours?",
+            r"when is " + PERSON + r" available"
+        ], office_hours_query, format_office_hours),
+        Intent("course_roster", [
+            ASK + THE + r"(?:roster|class list|student list|list of students) (?:of|for|in) " + COURSE_REF,
+            ASK + COURSE_REF + r"(?:'s)? (?:roster|class list|student list)",
+            ASK + r"(?:all )?" + THE + r"students (?:who are )?(?:enrolled |registered )?(?:in|taking) " + COURSE_REF,
+            r"(?:who|which students)(?: is| are|'s) (?:enrolled |registered )?(?:in|taking) " + COURSE_REF
+        ], roster_query, format_roster, roles=(ADMIN, INSTRUCTOR))
+    ]
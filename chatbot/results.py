@@ -0,0 +1,221 @@
+import decimal
+import json
+import math
+import re
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+# Statements that can be wrapped in a derived table to bound their rows;
+# anything else (SHOW, DESCRIBE, ...) is bounded while fetching instead
+WRAPPABLE_PATTERN = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+# MySQL rejects a derived table with two columns of the same name
+# (SELECT a.id, b.id ...), and some statements can't be nested at all (a
+# syntax error, e.g. a trailing INTO or FOR UPDATE); both run unwrapped
+DUPLICATE_COLUMN_ERRNO = 1060
+PARSE_ERRNO = 1064
+RETRY_UNWRAPPED_ERRNOS = (DUPLICATE_COLUMN_ERRNO, PARSE_ERRNO)
+
+# String literals, quoted identifiers and comments, which may contain
+# anything (semicolons, parentheses, ORDER BY) without it being SQL
+OPAQUE_PATTERN = re.compile(r"'(?:[^'\\]|\\.|'')*'?|\"(?:[^\"\\]|\\.|\"\")*\"?|`(?:[^`]|``)*`?"
+                            r"|--(?=\s|$)[^\n]*|#[^\n]*|/\*.*?(?:\*/|$)", re.DOTALL)
+TOP_LEVEL_ORDER_PATTERN = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+TOP_LEVEL_LIMIT_PATTERN = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+
+# Rows fetched per round trip while bounding a result
+FETCH_SIZE = 200
+
+# Dates and datetimes as serialize_rows leaves them (isoformat)
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?)?$")
+
+# Values listed per text column in a result digest
+TOP_VALUES = 5
+
+def mask_sql(statement):
+    """statement with comments blanked out and strings and quoted
+    identifiers replaced by underscores, keeping every other character at
+    its position"""
+    def mask(match):
+        text = match.group()
+        return (" " if text[0] in "-#/" else "_") * len(text)
+    return OPAQUE_PATTERN.sub(mask, statement)
+
+def top_level(masked):
+    """masked with everything inside parentheses blanked out"""
+    depth = 0
+    chars = []
+    for char in masked:
+        if char == "(":
+            depth += 1
+        chars.append(char if depth == 0 else " ")
+        if char == ")":
+            depth = max(depth - 1, 0)
+    return "".join(chars)
+
+def bounded_query(query, max_rows):
+    """query returning at most max_rows + 1 rows, the extra row telling
+    that the result was cut short
+
+    The statement goes in a derived table on lines of its own, so a
+    trailing -- comment can't swallow the LIMIT. MariaDB drops the ORDER BY
+    of a derived table, so a statement ordered at its top level gets the
+    LIMIT appended instead, or runs as it is if it has its own LIMIT.
+    """
+    statement = query.strip()
+    masked = mask_sql(statement)
+    # Trailing semicolons (and whatever comments follow them)
+    while masked.rstrip().endswith(";"):
+        masked = masked.rstrip()[:-1]
+        statement = statement[:len(masked)]
+    statement = statement[:len(masked.rstrip())]
+    if not WRAPPABLE_PATTERN.match(statement):
+        return statement
+    outer = top_level(mask_sql(statement))
+    if TOP_LEVEL_ORDER_PATTERN.search(outer):
+        if TOP_LEVEL_LIMIT_PATTERN.search(outer):
+            return statement
+        return f"{statement}\nLIMIT {int(max_rows) + 1}"
+    return f"SELECT * FROM (\n{statement}\n) AS bounded_result LIMIT {int(max_rows) + 1}"
+
+def row_size(row):
+    """Bytes of a row once serialized to JSON"""
+    return len(json.dumps(row, default=str))
+
+class BoundedRows:
+    """Collects serialized rows until max_rows rows or max_bytes bytes
+
+    add() returns False once a limit is reached; the row that didn't fit is
+    dropped and truncated set, so the caller stops fetching.
+    """
+
+    def __init__(self, max_rows, max_bytes):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows = []
+        self.size = 0
+        self.truncated = False
+
+    def add(self, row):
+        size = row_size(row)
+        if len(self.rows) >= self.max_rows or self.size + size > self.max_bytes:
+            self.truncated = True
+            return False
+        self.rows.append(row)
+        self.size += size
+        return True
+
+    def extend(self, rows):
+        for row in rows:
+            if not self.add(row):
+                return False
+        return True
+
+def _is_number(value):
+    return isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool)
+
+def summarize_column(values):
+    """Statistics of one column: min/max/mean/sum for numbers, the range of
+    dates, otherwise the number of distinct values and the most common ones"""
+    present = [value for value in values if value is not None]
+    summary = {"nulls": len(values) - len(present)}
+    if present and all(_is_number(value) for value in present):
+        numbers = [float(value) for value in present]
+        total = math.fsum(numbers)
+        summary.update(type="number", min=min(numbers), max=max(numbers),
+                       sum=total, mean=total / len(numbers))
+    elif present and all(isinstance(value, str) and DATE_PATTERN.match(value) for value in present):
+        summary.update(type="date", min=min(present), max=max(present))
+    else:
+        counts = Counter(str(value) for value in present)
+        summary.update(type="text", distinct=len(counts))
+        # Nothing to rank when every value is different (names, emails, ids)
+        if len(counts) < len(present):
+            summary["top"] = counts.most_common(TOP_VALUES)
+    return summary
+
+def result_digest(rows, truncated=False, prompt_rows=20, prompt_bytes=4000):
+    """Compact stand-in for a result too large to put in a prompt
+
+    None when every row fits in prompt_rows rows and prompt_bytes bytes (send
+    the rows themselves). Otherwise per-column statistics over all rows and
+    the first rows that fit as a sample.
+    """
+    sample = BoundedRows(prompt_rows, prompt_bytes)
+    if sample.extend(rows) and not truncated:
+        return None
+    columns = list(rows[0]) if rows else []
+    return {
+        "row_count": len(rows),
+        "truncated": truncated,
+        "columns": {column: summarize_column([row.get(column) for row in rows]) for column in columns},
+        "sample": sample.rows
+    }
+
+class ResultStore:
+    """Query results kept server-side so clients can page through them
+
+    Results are addressed by an opaque result_id and only served back to the
+    (role_id, user_id) that produced them; clients never send SQL. Entries
+    expire after ttl seconds and the least recently used are evicted beyond
+    max_bytes of serialized rows in total.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=900, page_size=50):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        # result_id -> (expires_at, owner, rows, truncated, size)
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def put(self, rows, truncated, role_id, user_id, size=None):
+        """Store a result and return its first page"""
+        result_id = uuid.uuid4().hex
+        size = sum(map(row_size, rows)) if size is None else size
+        with self._lock:
+            self._entries[result_id] = (time.monotonic() + self.ttl, (role_id, user_id), rows, truncated, size)
+            self._size += size
+            self._evict(time.monotonic())
+        return self._page(result_id, rows, truncated, 1, self.page_size)
+
+    def page(self, result_id, role_id, user_id, page=1, page_size=None):
+        """One page of a stored result, or None if it is unknown, expired or
+        belongs to someone else"""
+        page_size = max(1, min(int(page_size or self.page_size), self.page_size * 10))
+        page = max(1, int(page))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None or entry[0] <= now or entry[1] != (role_id, user_id):
+                return None
+            self._entries.move_to_end(result_id)
+        return self._page(result_id, entry[2], entry[3], page, page_size)
+
+    @staticmethod
+    def _page(result_id, rows, truncated, page, page_size):
+        start = (page - 1) * page_size
+        return {
+            "rows": rows[start:start + page_size],
+            "result": {
+                "result_id": result_id,
+                "page": page,
+                "page_size": page_size,
+                "pages": max(1, math.ceil(len(rows) / page_size)),
+                "total_rows": len(rows),
+                "truncated": truncated
+            }
+        }
+
+    def _evict(self, now):
+        for result_id in [key for key, entry in self._entries.items() if entry[0] <= now]:
+            self._size -= self._entries.pop(result_id)[4]
+        # Keep at least the newest result, even when it alone is too big
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            self._size -= self._entries.popitem(last=False)[1][4]
+
+    def stats(self):
+        return {"size": len(self._entries), "bytes": self._size, "max_bytes": self.max_bytes, "ttl": self.ttl}
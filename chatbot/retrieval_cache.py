@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from sql_cache import normalize_question
+
+class RetrievalCache:
+    """LRU caches for the student chatbot, keyed by normalized question
+
+    Question embeddings depend only on the model, so they outlive index
+    changes. Retrieved documents and, with answer_ttl > 0, whole answers are
+    dropped as soon as index_version() (any comparable value, e.g. the stat
+    of the ingest manifest) returns something new.
+    """
+
+    def __init__(self, maxsize=1000, answer_ttl=0, index_version=None):
+        self.maxsize = maxsize
+        self.answer_ttl = answer_ttl
+        self.index_version = index_version
+        self._lock = threading.Lock()
+        self._version = index_version() if index_version else None
+        self._embeddings = OrderedDict()
+        self._documents = OrderedDict()
+        # question -> (expires_at, answer)
+        self._answers = OrderedDict()
+        self.hits = {"embedding": 0, "documents": 0, "answer": 0}
+        self.misses = {"embedding": 0, "documents": 0, "answer": 0}
+        self.invalidations = 0
+
+    def _check_version(self):
+        if self.index_version is None:
+            return
+        version = self.index_version()
+        if version != self._version:
+            self._version = version
+            self._documents.clear()
+            self._answers.clear()
+            self.invalidations += 1
+
+    def _get(self, entries, kind, key):
+        with self._lock:
+            if kind != "embedding":
+                self._check_version()
+            value = entries.get(key)
+            if value is None:
+                self.misses[kind] += 1
+                return None
+            entries.move_to_end(key)
+            self.hits[kind] += 1
+            return value
+
+    def _put(self, entries, key, value):
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+
+    def embedding(self, question, embed):
+        """Embedding of a question, computed with embed(question) on a miss"""
+        if self.maxsize <= 0:
+            return embed(question)
+        key = normalize_question(question)
+        vector = self._get(self._embeddings, "embedding", key)
+        if vector is None:
+            vector = embed(question)
+            self._put(self._embeddings, key, vector)
+        return vector
+
+    def documents(self, question, search):
+        """Documents retrieved for a question, by search(question) on a miss"""
+        if self.maxsize <= 0:
+            return search(question)
+        key = normalize_question(question)
+        with self._lock:
+            self._check_version()
+            version = self._version
+        docs = self._get(self._documents, "documents", key)
+        if docs is None:
+            docs = search(question)
+            with self._lock:
+                # Don't store what was retrieved from an index replaced meanwhile
+                if version != self._version:
+                    return list(docs)
+            self._put(self._documents, key, docs)
+        return list(docs)
+
+    def get_answer(self, question):
+        """Cached answer to a question, or None"""
+        if self.maxsize <= 0 or self.answer_ttl <= 0:
+            return None
+        key = normalize_question(question)
+        with self._lock:
+            self._check_version()
+            entry = self._answers.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._answers.move_to_end(key)
+                self.hits["answer"] += 1
+                return entry[1]
+            if entry is not None:
+                del self._answers[key]
+            self.misses["answer"] += 1
+            return None
+
+    def put_answer(self, question, answer):
+        if self.maxsize <= 0 or self.answer_ttl <= 0:
+            return
+        self._put(self._answers, normalize_question(question), (time.monotonic() + self.answer_ttl, answer))
+
+    def clear(self):
+        with self._lock:
+            self._embeddings.clear()
+            self._documents.clear()
+            self._answers.clear()
+
+    def stats(self):
+        return {
+            "maxsize": self.maxsize,
+            "answer_ttl": self.answer_ttl,
+            "sizes": {"embedding": len(self._embeddings), "documents": len(self._documents), "answer": len(self._answers)},
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "invalidations": self.invalidations
+        }
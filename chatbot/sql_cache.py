@@ -0,0 +1,175 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Parts of a question that change the SQL even when the wording barely does:
+# emails, quoted strings and anything containing a digit (course codes,
+# student ids, years). Paraphrase matching only considers entries whose
+# literals are identical, so "students in CS101" never reuses CS102's SQL.
+LITERAL_PATTERN = re.compile(r"[\w.%+-]+@[\w.-]+\.\w+|'[^']*'|\"[^\"]*\"|\b\w*\d\w*\b")
+
+# Leading comments, then the first keyword of statements that only read.
+# Anything else may write, so it is never cached: a repeated question must not
+# replay an UPDATE or DELETE without the LLM seeing it again.
+LEADING_COMMENTS_PATTERN = re.compile(r"^(?:\s*(?:--[^\n]*(?:\n|$)|#[^\n]*(?:\n|$)|/\*.*?\*/))*\s*", re.DOTALL)
+READ_ONLY_PATTERN = re.compile(r"(SELECT|WITH|SHOW|DESCRIBE|DESC|EXPLAIN)\b", re.IGNORECASE)
+
+# The table a write statement changes (INSERT, UPDATE, DELETE, DDL, ...)
+WRITTEN_TABLE_PATTERN = re.compile(
+    r"(?:INSERT(?:\s+IGNORE)?(?:\s+INTO)?|REPLACE(?:\s+INTO)?|UPDATE(?:\s+IGNORE)?|DELETE(?:\s+IGNORE)?\s+FROM"
+    r"|(?:ALTER|DROP|CREATE|TRUNCATE|RENAME)(?:\s+TABLE)?(?:\s+IF(?:\s+NOT)?\s+EXISTS)?)\s+`?(\w+)`?",
+    re.IGNORECASE)
+
+def is_read_only(sql):
+    return READ_ONLY_PATTERN.match(sql, LEADING_COMMENTS_PATTERN.match(sql).end()) is not None
+
+def written_table(sql):
+    """Lowercased name of the table a write statement changes, or None if unknown"""
+    match = WRITTEN_TABLE_PATTERN.match(sql, LEADING_COMMENTS_PATTERN.match(sql).end())
+    return match.group(1).lower() if match else None
+
+def normalize_question(question):
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return " ".join(question.lower().split()).rstrip("?.! ")
+
+def question_literals(question):
+    return tuple(sorted(match.lower() for match in LITERAL_PATTERN.findall(question)))
+
+class SQLCache:
+    """LRU cache with TTL of generated SQL, per question and access scope
+
+    The scope is (role_id, user_id) for instructors and students, whose
+    prompts embed their user id, and (role_id, None) for admins, whose SQL is
+    the same for every admin. With an embed function (list of texts -> list
+    of vectors) a miss falls back to the most similar cached question in the
+    same scope with the same literals, if its cosine similarity reaches
+    similarity_threshold.
+
+    Only read-only SQL is stored. After the chatbot runs a write,
+    invalidate() drops the SQL that reads the table it wrote to, which may
+    no longer fit it (ALTER, DROP).
+    """
+
+    def __init__(self, maxsize=1000, ttl=3600, embed=None, similarity_threshold=0.92):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.embed = embed
+        self.similarity_threshold = similarity_threshold
+        self._lock = threading.Lock()
+        # key -> (expires_at, sql, unit embedding or None)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def scope(role_id, user_id):
+        return (role_id, user_id if role_id in (2, 3) else None)
+
+    def _key(self, question, role_id, user_id):
+        return self.scope(role_id, user_id) + (normalize_question(question),)
+
+    def _embed(self, question):
+        import numpy as np
+
+        vector = np.asarray(self.embed([normalize_question(question)])[0], dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, question, role_id, user_id=None):
+        """Cached SQL for a question in this scope, or None"""
+        if self.maxsize <= 0:
+            return None
+
+        key = self._key(question, role_id, user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            if self.embed is None:
+                self.misses += 1
+                return None
+            literals = question_literals(question)
+            candidates = [
+                (candidate_key, entry) for candidate_key, entry in self._entries.items()
+                if candidate_key[:2] == key[:2] and entry[0] > now and entry[2] is not None
+                and question_literals(candidate_key[2]) == literals
+            ]
+
+        if not candidates:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Embedding can take a while; don't hold the lock for it
+        import numpy as np
+
+        vector = self._embed(question)
+        similarities = np.stack([entry[2] for _, entry in candidates]) @ vector
+        best = int(similarities.argmax())
+        with self._lock:
+            if similarities[best] >= self.similarity_threshold:
+                candidate_key = candidates[best][0]
+                if candidate_key in self._entries:
+                    self._entries.move_to_end(candidate_key)
+                self.semantic_hits += 1
+                return candidates[best][1][1]
+            self.misses += 1
+            return None
+
+    def put(self, question, role_id, user_id, sql):
+        """Store SQL that executed successfully, evicting the least recently used"""
+        if self.maxsize <= 0 or not is_read_only(sql):
+            return
+
+        key = self._key(question, role_id, user_id)
+        vector = self._embed(question) if self.embed is not None else None
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, sql, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, sql):
+        """Drop the entries a write statement may have made stale
+
+        Those whose SQL mentions the table it wrote to, or every entry when
+        the table can't be told.
+        """
+        table = written_table(sql)
+        with self._lock:
+            if table is None:
+                stale = list(self._entries)
+            else:
+                mentions = re.compile(rf"\b{re.escape(table)}\b", re.IGNORECASE)
+                stale = [key for key, entry in self._entries.items() if mentions.search(entry[1])]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        """Drop every entry, e.g. after a schema change"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "semantic": self.embed is not None,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0
+        }
@@ -0,0 +1,42 @@
+import json
+import re
+
+# Response headers for event streams; X-Accel-Buffering stops nginx from
+# holding events back until the response is complete
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+# Trailing run of word characters: may be the start of a longer word
+_PARTIAL_WORD = re.compile(r"\w+$")
+
+def sse_event(event, data):
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+class IncrementalHighlighter:
+    """Applies a word-based highlight function to text arriving in pieces
+
+    feed() returns the highlighted text that is safe to send: everything but
+    a trailing partial word, which is held back until the next piece shows
+    where it ends. Splitting only between a non-word character and a word
+    means no whole word ever straddles two pieces, so the concatenated
+    output is exactly highlight(full_text).
+    """
+
+    def __init__(self, highlight):
+        self.highlight = highlight
+        self.pending = ""
+
+    def feed(self, text):
+        self.pending += text
+        match = _PARTIAL_WORD.search(self.pending)
+        split = match.start() if match else len(self.pending)
+        ready, self.pending = self.pending[:split], self.pending[split:]
+        return self.highlight(ready) if ready else ""
+
+    def flush(self):
+        """Highlighted remainder, at the end of the stream"""
+        ready, self.pending = self.pending, ""
+        return self.highlight(ready) if ready else ""
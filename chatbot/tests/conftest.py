@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Import the chatbots as their entry points do, from the chatbot directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# chatbot.py copies the Groq key into the environment at import; no request reaches Groq
+os.environ.setdefault("GROQ_API_KEY_NEW", "test")
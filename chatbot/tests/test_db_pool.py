@@ -0,0 +1,231 @@
+import asyncio
+import threading
+import time
+
+import mysql.connector
+import pytest
+
+import chatbot
+import chatbot_async
+
+class FakeConnection:
+    """A pooled connection: close() hands it back to its pool"""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.connected = True
+        # Whether ping(reconnect=True) can bring a dropped connection back
+        self.reachable = True
+        self.cursors = []
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        if not self.connected:
+            if not (reconnect and self.reachable):
+                raise mysql.connector.errors.InterfaceError("MySQL server has gone away")
+            self.connected = True
+            self.pool.reconnects += 1
+
+    def cursor(self, dictionary=False):
+        cursor = FakeCursor(self)
+        self.cursors.append(cursor)
+        return cursor
+
+    def close(self):
+        self.pool.idle.append(self)
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.closed = False
+
+    def execute(self, query, params=None):
+        if not self.connection.connected:
+            raise mysql.connector.errors.OperationalError("Lost connection to MySQL server")
+        self.connection.pool.executed.append((query, params))
+
+    def fetchone(self):
+        return {"semester_id": 7}
+
+    def fetchall(self):
+        return [{"ok": 1}]
+
+    def close(self):
+        self.closed = True
+
+class FakePool:
+    """Stands in for MySQLConnectionPool: hands out idle connections, opens more up to size"""
+
+    def __init__(self, size):
+        self.size = size
+        self.idle = []
+        self.opened = []
+        self.reconnects = 0
+        self.executed = []
+
+    def get_connection(self):
+        if self.idle:
+            return self.idle.pop()
+        if len(self.opened) == self.size:
+            raise mysql.connector.errors.PoolError("Failed getting connection; pool exhausted")
+        connection = FakeConnection(self)
+        self.opened.append(connection)
+        return connection
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool(size=2)
+    monkeypatch.setattr(chatbot, "_db_pool", pool)
+    monkeypatch.setattr(chatbot, "_db_pool_slots", threading.BoundedSemaphore(pool.size))
+    monkeypatch.setattr(chatbot, "DB_POOL_TIMEOUT", 0.2)
+    return pool
+
+def free_slots():
+    """Connections that could be borrowed right now without waiting"""
+    count = 0
+    while chatbot._db_pool_slots.acquire(blocking=False):
+        count += 1
+    for _ in range(count):
+        chatbot._db_pool_slots.release()
+    return count
+
+def test_connections_are_reused(pool):
+    for _ in range(5):
+        assert chatbot.execute_sql_query("SELECT 1") == {"results": [{"ok": 1}]}
+    assert len(pool.opened) == 1
+    assert all(cursor.closed for cursor in pool.opened[0].cursors)
+    assert free_slots() == 2
+
+def test_connection_is_returned_when_the_block_raises(pool):
+    with pytest.raises(RuntimeError):
+        with chatbot.db_cursor() as cursor:
+            raise RuntimeError("handler failed")
+    assert cursor.closed
+    assert pool.idle == pool.opened
+    assert free_slots() == 2
+
+def test_failed_query_returns_an_error_and_the_connection(pool):
+    with chatbot.db_cursor():
+        pass
+    pool.opened[0].connected = False
+    # Dropped after the health check: the query itself fails
+    pool.opened[0].ping = lambda **kwargs: None
+    assert "error" in chatbot.execute_sql_query("SELECT 1")
+    assert pool.idle == pool.opened
+    assert free_slots() == 2
+
+def test_waits_for_a_free_connection_then_times_out(pool):
+    with chatbot.db_cursor() as first, chatbot.db_cursor() as second:
+        assert first is not None and second is not None
+        started = time.monotonic()
+        with chatbot.db_cursor() as third:
+            assert third is None
+        assert time.monotonic() - started >= chatbot.DB_POOL_TIMEOUT
+        assert free_slots() == 0
+    assert free_slots() == 2
+
+def test_waiting_request_gets_the_connection_released_meanwhile(pool, monkeypatch):
+    monkeypatch.setattr(chatbot, "DB_POOL_TIMEOUT", 5)
+    results = []
+    with chatbot.db_cursor(), chatbot.db_cursor():
+        waiter = threading.Thread(target=lambda: results.append(chatbot.execute_sql_query("SELECT 1")))
+        waiter.start()
+        time.sleep(0.1)
+        assert not results
+    waiter.join(timeout=5)
+    assert results == [{"results": [{"ok": 1}]}]
+    assert len(pool.opened) == 2
+
+def test_dropped_connection_is_reconnected(pool):
+    with chatbot.db_cursor():
+        pass
+    # The server closed the idle connection
+    pool.opened[0].connected = False
+    assert chatbot.execute_sql_query("SELECT 1") == {"results": [{"ok": 1}]}
+    assert pool.reconnects == 1
+    assert len(pool.opened) == 1
+
+def test_unreachable_server_yields_no_cursor_and_frees_the_slot(pool):
+    with chatbot.db_cursor():
+        pass
+    pool.opened[0].connected = False
+    pool.opened[0].reachable = False
+    assert chatbot.execute_sql_query("SELECT 1") == {"error": "Database connection failed"}
+    assert pool.idle == pool.opened
+    assert free_slots() == 2
+    # Once the server is back the same connection serves again
+    pool.opened[0].reachable = True
+    assert chatbot.execute_sql_query("SELECT 1") == {"results": [{"ok": 1}]}
+
+def test_current_courses_query_the_semester_once_on_one_connection(pool):
+    assert chatbot.get_current_courses(42) == {"results": [{"ok": 1}]}
+    assert [query for query, _ in pool.executed] == [chatbot.CURRENT_SEMESTER_QUERY, chatbot.CURRENT_COURSES_QUERY]
+    assert chatbot.CURRENT_SEMESTER_QUERY not in chatbot.CURRENT_COURSES_QUERY
+    assert pool.executed[1][1] == (42, 7)
+    assert len(pool.opened) == 1
+
+class FakeAsyncCursor:
+    def __init__(self, pool):
+        self.pool = pool
+        self.last = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, query, params=None):
+        self.pool.executed.append((query, params))
+        self.last = query
+
+    async def fetchone(self):
+        return {"semester_id": 7} if self.last == chatbot.CURRENT_SEMESTER_QUERY else {
+            "user_id": 42, "first_name": "Ada", "last_name": "Lovelace"}
+
+    async def fetchall(self):
+        return [{"ok": 1}]
+
+class FakeAsyncConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def ping(self, reconnect=False):
+        pass
+
+    def cursor(self, cursor_class=None):
+        return FakeAsyncCursor(self.pool)
+
+class FakeAsyncPool:
+    """Stands in for aiomysql's pool, counting the connections borrowed"""
+
+    def __init__(self):
+        self.acquired = 0
+        self.released = 0
+        self.executed = []
+
+    async def acquire(self):
+        self.acquired += 1
+        return FakeAsyncConnection(self)
+
+    def release(self, connection):
+        self.released += 1
+
+@pytest.fixture
+def async_pool(monkeypatch):
+    pool = FakeAsyncPool()
+    monkeypatch.setattr(chatbot_async, "_db_pool", pool)
+    return pool
+
+def test_async_current_courses_use_one_connection(async_pool):
+    assert asyncio.run(chatbot_async.get_current_courses(42)) == {"results": [{"ok": 1}]}
+    assert [query for query, _ in async_pool.executed] == [chatbot.CURRENT_SEMESTER_QUERY,
+                                                           chatbot.CURRENT_COURSES_QUERY]
+    assert async_pool.executed[1][1] == (42, 7)
+    assert async_pool.acquired == async_pool.released == 1
+
+def test_async_identifier_lookup_uses_one_connection(async_pool):
+    response = asyncio.run(chatbot_async.get_student_courses_by_identifier("STU42"))
+    assert response == {"results": [{"ok": 1}], "student_name": "Ada Lovelace"}
+    assert len(async_pool.executed) == 2
+    assert async_pool.executed[1][1] == (42,)
+    assert async_pool.acquired == async_pool.released == 1
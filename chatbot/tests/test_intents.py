@@ -0,0 +1,198 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from intents import (ADMIN, INSTRUCTOR, STUDENT, GRADE_POINTS, SCORE_POINTS, CourseCatalog, IntentRouter,
+                     default_intents, format_gpa, gpa_query)
+
+@pytest.fixture
+def router():
+    return IntentRouter(default_intents())
+
+@pytest.mark.parametrize("question, intent, slots", [
+    ("What is my GPA?", "gpa", {}),
+    ("what's my cumulative grade point average", "gpa", {}),
+    ("Please show me my GPA", "gpa", {}),
+    ("What is the GPA of student STU123?", "gpa", {"identifier": "stu123"}),
+    ("GPA for jane.doe@example.edu", "gpa", {"identifier": "jane.doe@example.edu"}),
+    ("How many students are enrolled in CS101?", "enrollment_count", {"course": "cs101"}),
+    ("how many students are in MATH 202", "enrollment_count", {"course": "math 202"}),
+    ("How many students does IT-310 have?", "enrollment_count", {"course": "it-310"}),
+    ("What is the number of students in the course CS101?", "enrollment_count", {"course": "cs101"}),
+    ("CS101 enrollment", "enrollment_count", {"course": "cs101"}),
+    ("Can you show me the roster for CS 101?", "course_roster", {"course": "cs 101"}),
+    ("List all students enrolled in CS101", "course_roster", {"course": "cs101"}),
+    ("Which students are taking CS101?", "course_roster", {"course": "cs101"}),
+    ("who is in phys210", "course_roster", {"course": "phys210"}),
+    ("Grade distribution for CS101", "grade_distribution", {"course": "cs101"}),
+    ("How were the final grades distributed in CS101?", "grade_distribution", {"course": "cs101"}),
+    ("What are the office hours for CS101?", "office_hours", {"course": "cs101"}),
+    ("When are my instructors' office hours?", "office_hours", {}),
+    ("Office hours of Dr. Smith", "office_hours", {"name": "smith"}),
+    ("What are John Smith's office hours?", "office_hours", {"name": "john smith"}),
+    ("When is Prof Jones available?", "office_hours", {"name": "jones"}),
+])
+def test_matches(router, question, intent, slots):
+    matched = router.match(question)
+    assert matched is not None, question
+    assert (matched[0].name, matched[1]) == (intent, slots)
+
+@pytest.mark.parametrize("question", [
+    # Qualifiers the templates don't answer go to the LLM
+    "How many students failed CS101?",
+    "How many students got an A in CS101?",
+    "How many students are enrolled in CS101 this semester?",
+    "List all students with grade F in CS101",
+    "Show students who dropped CS101",
+    "Show the roster for CS101 sorted by GPA",
+    "What is my GPA in CS101?",
+    "What is the average GPA of students?",
+    "What is the GPA of students in CS101?",
+    "Which instructor has the most office hours?",
+    # Numbers that aren't course codes
+    "How many students scored more than 100?",
+    "How many students are enrolled in fall 2023?",
+    "How many students enrolled in year2024?",
+    "Show the roster for stu123",
+    "Office hours for the math department",
+])
+def test_falls_through_to_the_llm(router, question):
+    assert router.match(question) is None
+
+def test_catalog_rejects_unknown_course_codes():
+    catalog = CourseCatalog()
+    router = IntentRouter(default_intents(), catalog=catalog)
+    # Until the codes are loaded nothing course-related matches
+    assert router.match("How many students are enrolled in CS101?") is None
+    catalog.update({"results": [{"course_code": "CS 101"}, {"course_code": "MATH-202"}]})
+    assert router.match("How many students are enrolled in cs101?")[1] == {"course": "cs101"}
+    assert router.match("Show the roster for MATH202")[1] == {"course": "math202"}
+    assert router.match("How many students are enrolled in BIO110?") is None
+    # Questions without a course don't need the catalog
+    assert router.match("What is my GPA?")[0].name == "gpa"
+
+def test_catalog_is_loaded_through_run_query_and_refreshed_after_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("intents.time.monotonic", lambda: clock[0])
+    codes = [{"course_code": "CS101"}]
+    queries = []
+    def run_query(sql, params):
+        queries.append(sql)
+        if sql == CourseCatalog.QUERY:
+            return {"results": codes}
+        return {"results": [{"course_code": "CS102", "title": "Data Structures", "semester_name": None,
+                             "active_students": 3, "total_students": 4}]}
+    router = IntentRouter(default_intents(), catalog=CourseCatalog(ttl=60))
+
+    assert router.answer("How many students are in CS102?", ADMIN, None, run_query) is None
+    codes.append({"course_code": "CS102"})
+    assert router.answer("How many students are in CS102?", ADMIN, None, run_query) is None
+    clock[0] += 60
+    response = router.answer("How many students are in CS102?", ADMIN, None, run_query)
+    assert response["intent"] == "enrollment_count"
+    assert queries.count(CourseCatalog.QUERY) == 2
+
+    # The async router loads it the same way
+    async def arun_query(sql, params):
+        return run_query(sql, params)
+    clock[0] += 60
+    response = asyncio.run(router.aanswer("How many students are in CS102?", ADMIN, None, arun_query))
+    assert response["intent"] == "enrollment_count"
+    assert queries.count(CourseCatalog.QUERY) == 3
+
+def test_failed_catalog_load_keeps_the_previous_codes():
+    catalog = CourseCatalog()
+    catalog.update({"results": [{"course_code": "CS101"}]})
+    catalog.update({"error": "Database connection failed"})
+    assert "cs101" in catalog
+
+def test_role_checks(router):
+    assert router.prepare("What is my GPA?", ADMIN, 1)["error"].startswith("Only students")
+    assert router.prepare("GPA of stu123", STUDENT, 5)["error"].startswith("Only administrators")
+    assert router.prepare("Roster for CS101", STUDENT, 5)["error"] == "You don't have access to this information"
+    assert router.prepare("Roster for CS101", INSTRUCTOR, 2)[0].name == "course_roster"
+
+def test_format_gpa_without_rows():
+    assert format_gpa([], {}) == "I couldn't find your student record."
+    assert format_gpa([], {"identifier": "stu9"}) == "No student found with identifier 'stu9'."
+
+# GPA: the template must agree with Student.calculateGPA (models/Student.js)
+
+def calculate_gpa(enrollments, grades, student_id):
+    """Port of Student.calculateGPA"""
+    total_points = total_credits = 0
+    for enrollment in enrollments:
+        if enrollment["student_id"] != student_id:
+            continue
+        if enrollment["final_grade"] is not None:
+            total_points += GRADE_POINTS.get(enrollment["final_grade"], 0) * enrollment["credit_hours"]
+            total_credits += enrollment["credit_hours"]
+            continue
+        for grade in grades:
+            if ((grade["student_id"], grade["course_id"]) == (student_id, enrollment["course_id"])
+                    and grade["status"] == "posted"):
+                score = grade["total_score"]
+                points = next((points for minimum, points in SCORE_POINTS if score and score >= minimum), 0.0)
+                total_points += points * enrollment["credit_hours"]
+                total_credits += enrollment["credit_hours"]
+    return round(total_points / total_credits, 2) if total_credits else None
+
+ENROLLMENTS = [
+    # Completed courses
+    {"student_id": 1, "course_id": 10, "credit_hours": 3, "final_grade": "A-"},
+    {"student_id": 1, "course_id": 11, "credit_hours": 4, "final_grade": "C+"},
+    # Current courses: posted grades count, drafts don't
+    {"student_id": 1, "course_id": 12, "credit_hours": 3, "final_grade": None},
+    {"student_id": 1, "course_id": 13, "credit_hours": 2, "final_grade": None},
+    # Only current courses
+    {"student_id": 2, "course_id": 12, "credit_hours": 3, "final_grade": None},
+    # Only completed courses
+    {"student_id": 3, "course_id": 10, "credit_hours": 3, "final_grade": "B"},
+]
+GRADES = [
+    {"student_id": 1, "course_id": 12, "total_score": 88, "status": "posted"},
+    {"student_id": 1, "course_id": 13, "total_score": 95, "status": "draft"},
+    {"student_id": 2, "course_id": 12, "total_score": 71, "status": "posted"},
+    {"student_id": 2, "course_id": 12, "total_score": 59, "status": "posted"},
+]
+
+@pytest.fixture
+def database():
+    """The tables gpa_query reads, in SQLite with MySQL's CONCAT"""
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    db.create_function("CONCAT", -1, lambda *parts: "".join(map(str, parts)))
+    db.executescript("""
+        CREATE TABLE users (user_id INTEGER, username TEXT, email TEXT, first_name TEXT, last_name TEXT);
+        CREATE TABLE student_profiles (user_id INTEGER, student_id TEXT);
+        CREATE TABLE courses (course_id INTEGER, credit_hours INTEGER);
+        CREATE TABLE enrollments (student_id INTEGER, course_id INTEGER, final_grade TEXT);
+        CREATE TABLE grades (student_id INTEGER, course_id INTEGER, total_score REAL, status TEXT);
+    """)
+    for user_id in (1, 2, 3, 4):
+        db.execute("INSERT INTO users VALUES (?, ?, ?, 'Student', ?)",
+                   (user_id, f"student{user_id}", f"student{user_id}@example.edu", str(user_id)))
+        db.execute("INSERT INTO student_profiles VALUES (?, ?)", (user_id, f"STU{user_id}"))
+    credit_hours = {row["course_id"]: row["credit_hours"] for row in ENROLLMENTS}
+    db.executemany("INSERT INTO courses VALUES (?, ?)", credit_hours.items())
+    db.executemany("INSERT INTO enrollments VALUES (:student_id, :course_id, :final_grade)", ENROLLMENTS)
+    db.executemany("INSERT INTO grades VALUES (:student_id, :course_id, :total_score, :status)", GRADES)
+    return db
+
+def run_gpa_query(db, slots, role_id, user_id):
+    sql, params = gpa_query(slots, role_id, user_id)
+    return [dict(row) for row in db.execute(sql.replace("%s", "?"), params)]
+
+@pytest.mark.parametrize("student_id", [1, 2, 3, 4])
+def test_gpa_matches_student_calculate_gpa(database, student_id):
+    [own] = run_gpa_query(database, {}, STUDENT, student_id)
+    [by_identifier] = run_gpa_query(database, {"identifier": f"stu{student_id}"}, ADMIN, None)
+    expected = calculate_gpa(ENROLLMENTS, GRADES, student_id)
+    for row in (own, by_identifier):
+        assert (row["gpa"] if row["gpa"] is None else round(row["gpa"], 2)) == expected
+
+def test_gpa_answer_counts_current_courses(database):
+    rows = run_gpa_query(database, {}, STUDENT, 1)
+    assert rows[0]["graded_courses"] == 2 and rows[0]["current_courses"] == 1
+    assert "posted grades in 1 current courses" in format_gpa(rows, {})
@@ -0,0 +1,100 @@
+import sqlite3
+from contextlib import contextmanager
+
+import mysql.connector
+import pytest
+
+import chatbot
+from results import bounded_query
+
+MAX_ROWS = 3
+
+@pytest.fixture
+def database():
+    db = sqlite3.connect(":memory:")
+    db.execute("CREATE TABLE users (user_id INTEGER, last_name TEXT)")
+    db.executemany("INSERT INTO users VALUES (?, ?)", [(i, f"name{9 - i}") for i in range(10)])
+    return db
+
+@pytest.mark.parametrize("query", [
+    "SELECT * FROM users -- every user",
+    "SELECT * FROM users;",
+    "SELECT * FROM users;;\n",
+    "SELECT * FROM users; -- done",
+    "SELECT * FROM users /* every user */;",
+    "SELECT * FROM users WHERE last_name <> 'a;b' -- not 'a;b'",
+    "SELECT * FROM users WHERE last_name <> 'it''s ;'",
+    "SELECT user_id, (SELECT COUNT(*) FROM users) AS total FROM users",
+])
+def test_wrapped_queries_run_and_are_bounded(database, query):
+    bounded = bounded_query(query, MAX_ROWS)
+    assert bounded.startswith("SELECT * FROM (\n") and bounded.endswith(f"\n) AS bounded_result LIMIT {MAX_ROWS + 1}")
+    assert not bounded[:bounded.rindex("\n)")].rstrip().endswith(";")
+    assert len(database.execute(bounded).fetchall()) == MAX_ROWS + 1
+
+@pytest.mark.parametrize("query", [
+    "SELECT * FROM users ORDER BY last_name",
+    "SELECT * FROM users ORDER BY last_name; -- by name",
+    "WITH named AS (SELECT * FROM users) SELECT * FROM named ORDER BY last_name",
+    "SELECT * FROM users WHERE user_id IN (SELECT user_id FROM users) ORDER BY last_name",
+])
+def test_top_level_order_by_gets_the_limit_itself(database, query):
+    bounded = bounded_query(query, MAX_ROWS)
+    # Not in a derived table, whose ORDER BY MariaDB would ignore
+    assert not bounded.startswith("SELECT * FROM (")
+    assert bounded.endswith(f"\nLIMIT {MAX_ROWS + 1}")
+    assert [row[1] for row in database.execute(bounded)] == ["name0", "name1", "name2", "name3"]
+
+@pytest.mark.parametrize("query, expected", [
+    # Bounded already, and ordered: run as it is
+    ("SELECT * FROM users ORDER BY last_name LIMIT 2;", "SELECT * FROM users ORDER BY last_name LIMIT 2"),
+    # ORDER BY only inside parentheses or text: wrapped
+    ("SELECT user_id, RANK() OVER (ORDER BY last_name) FROM users",
+     "SELECT * FROM (\nSELECT user_id, RANK() OVER (ORDER BY last_name) FROM users\n) AS bounded_result LIMIT 4"),
+    ("SELECT 'ORDER BY' AS words FROM users",
+     "SELECT * FROM (\nSELECT 'ORDER BY' AS words FROM users\n) AS bounded_result LIMIT 4"),
+    # Not wrappable: bounded while fetching
+    ("SHOW TABLES;", "SHOW TABLES"),
+    ("DESCRIBE users", "DESCRIBE users"),
+])
+def test_other_statements(query, expected):
+    assert bounded_query(query, MAX_ROWS) == expected
+
+class FakeCursor:
+    """Rejects derived tables like MySQL rejects a statement that can't be nested"""
+
+    def __init__(self, errno):
+        self.errno = errno
+        self.executed = []
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.executed.append(query)
+        if query.startswith("SELECT * FROM (\n"):
+            raise mysql.connector.errors.ProgrammingError("cannot be wrapped", errno=self.errno)
+        self.rows = [{"user_id": i} for i in range(10)]
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    @property
+    def description(self):
+        return [("user_id",)]
+
+@pytest.mark.parametrize("errno", [1060, 1064])
+def test_falls_back_to_the_unwrapped_statement(monkeypatch, errno):
+    cursor = FakeCursor(errno)
+    monkeypatch.setattr(chatbot, "db_cursor", contextmanager(lambda: (yield cursor)))
+    monkeypatch.setattr(chatbot, "RESULT_MAX_ROWS", MAX_ROWS)
+    query = "SELECT a.user_id, b.user_id FROM users a JOIN users b USING (user_id)"
+    result = chatbot.execute_bounded_query(query)
+    assert cursor.executed == [bounded_query(query, MAX_ROWS), query]
+    assert len(result["results"]) == MAX_ROWS and result["truncated"]
+
+def test_other_errors_are_reported(monkeypatch):
+    cursor = FakeCursor(1146)
+    monkeypatch.setattr(chatbot, "db_cursor", contextmanager(lambda: (yield cursor)))
+    result = chatbot.execute_bounded_query("SELECT * FROM missing")
+    assert result["error"].startswith("Database error")
+    assert len(cursor.executed) == 1
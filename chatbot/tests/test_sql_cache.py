@@ -0,0 +1,155 @@
+from types import SimpleNamespace
+
+import pytest
+
+import chatbot
+import sql_cache
+from sql_cache import SQLCache
+
+class FakeLLM:
+    """Answers SQL prompts from a table of question -> SQL and counts the calls"""
+
+    def __init__(self, sql_by_question):
+        self.sql_by_question = sql_by_question
+        self.sql_calls = []
+
+    def predict_messages(self, messages):
+        prompt = messages[-1].content
+        if "Convert this question into a MySQL query" not in prompt:
+            return SimpleNamespace(content="Here is your answer.")
+        question = next(question for question in self.sql_by_question if question in prompt)
+        self.sql_calls.append(question)
+        return SimpleNamespace(content=self.sql_by_question[question])
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+QUESTIONS = {
+    "How many users are there": "SELECT COUNT(*) AS users FROM users",
+    "List every course title": "SELECT title FROM courses",
+    "What is the highest total score": "SELECT MAX(total_score) FROM grades",
+    "Rename user 7 to Sam": "UPDATE users SET first_name = 'Sam' WHERE user_id = 7",
+}
+
+@pytest.fixture
+def executed(monkeypatch):
+    """SQL run by the chatbot, against a stand-in for the database"""
+    statements = []
+    def execute_bounded_query(query):
+        statements.append(query)
+        return {"results": [{"value": 1}], "truncated": False, "size": 12}
+    monkeypatch.setattr(chatbot, "execute_bounded_query", execute_bounded_query)
+    return statements
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sql_cache.time, "monotonic", clock)
+    return clock
+
+def ask(llm, cache, question, role_id=1, user_id=None):
+    return chatbot.get_chatbot_response(question, llm, role_id, user_id, sql_cache=cache, intent_router=None)
+
+def test_cache_hit_skips_the_llm(executed):
+    llm = FakeLLM(QUESTIONS)
+    cache = SQLCache()
+    first = ask(llm, cache, "How many users are there")
+    # Same question, normalized
+    second = ask(llm, cache, "  how many USERS are there?")
+    assert llm.sql_calls == ["How many users are there"]
+    assert (first["cached_sql"], second["cached_sql"]) == (False, True)
+    assert executed == [QUESTIONS["How many users are there"]] * 2
+    assert second["answer"] == "Here is your answer."
+
+def test_entries_are_scoped_by_user_for_instructors(executed):
+    llm = FakeLLM(QUESTIONS)
+    cache = SQLCache()
+    ask(llm, cache, "List every course title", role_id=2, user_id=1)
+    ask(llm, cache, "List every course title", role_id=2, user_id=2)
+    assert len(llm.sql_calls) == 2
+
+def test_entries_expire_after_ttl(executed, clock):
+    llm = FakeLLM(QUESTIONS)
+    cache = SQLCache(ttl=60)
+    ask(llm, cache, "How many users are there")
+    clock.now += 59
+    assert ask(llm, cache, "How many users are there")["cached_sql"]
+    clock.now += 2
+    assert not ask(llm, cache, "How many users are there")["cached_sql"]
+    assert len(llm.sql_calls) == 2
+
+def test_least_recently_used_entry_is_evicted(executed):
+    llm = FakeLLM(QUESTIONS)
+    cache = SQLCache(maxsize=2)
+    ask(llm, cache, "How many users are there")
+    ask(llm, cache, "List every course title")
+    # Makes the course titles the least recently used
+    ask(llm, cache, "How many users are there")
+    ask(llm, cache, "What is the highest total score")
+    assert cache.stats()["size"] == 2
+
+    llm.sql_calls.clear()
+    assert ask(llm, cache, "How many users are there")["cached_sql"]
+    assert not ask(llm, cache, "List every course title")["cached_sql"]
+    assert llm.sql_calls == ["List every course title"]
+
+def test_write_invalidates_entries_reading_its_table(executed):
+    llm = FakeLLM(QUESTIONS)
+    cache = SQLCache()
+    ask(llm, cache, "How many users are there")
+    ask(llm, cache, "List every course title")
+
+    ask(llm, cache, "Rename user 7 to Sam")
+    assert cache.stats()["invalidations"] == 1
+
+    llm.sql_calls.clear()
+    assert not ask(llm, cache, "How many users are there")["cached_sql"]
+    assert ask(llm, cache, "List every course title")["cached_sql"]
+    assert llm.sql_calls == ["How many users are there"]
+
+def test_write_is_never_served_from_the_cache(executed):
+    llm = FakeLLM(QUESTIONS)
+    cache = SQLCache()
+    ask(llm, cache, "Rename user 7 to Sam")
+    ask(llm, cache, "Rename user 7 to Sam")
+    assert llm.sql_calls == ["Rename user 7 to Sam"] * 2
+    assert cache.stats()["size"] == 0
+
+def test_failed_query_is_not_cached(monkeypatch):
+    monkeypatch.setattr(chatbot, "execute_bounded_query", lambda query: {"error": "Database error: 1054"})
+    llm = FakeLLM(QUESTIONS)
+    cache = SQLCache()
+    assert "error" in ask(llm, cache, "How many users are there")
+    assert cache.stats()["size"] == 0
+
+@pytest.mark.parametrize("sql, table", [
+    ("UPDATE users SET email = 'a@b.c'", "users"),
+    ("delete from `grades` where grade_id = 3", "grades"),
+    ("INSERT INTO enrollments (student_id, course_id) VALUES (1, 2)", "enrollments"),
+    ("-- add a column\nALTER TABLE courses ADD COLUMN room VARCHAR(20)", "courses"),
+    ("DROP TABLE IF EXISTS semesters", "semesters"),
+    ("CALL archive_semester(3)", None),
+])
+def test_written_table(sql, table):
+    assert not sql_cache.is_read_only(sql)
+    assert sql_cache.written_table(sql) == table
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1",
+    "  with recent as (SELECT * FROM grades) SELECT * FROM recent",
+    "/* counts */ SELECT COUNT(*) FROM users",
+    "SHOW TABLES",
+])
+def test_read_only(sql):
+    assert sql_cache.is_read_only(sql)
+
+def test_unknown_write_invalidates_everything():
+    cache = SQLCache()
+    cache.put("How many users are there", 1, None, QUESTIONS["How many users are there"])
+    cache.put("List every course title", 1, None, QUESTIONS["List every course title"])
+    assert cache.invalidate("CALL archive_semester(3)") == 2
+    assert cache.stats()["size"] == 0
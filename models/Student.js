@@ -160,7 +160,7 @@ class Student {
 
       // Process current courses
       for (const row of currentCourses) {
-        const points = calculateGradePoints(row.total_score);
+        const points = Student.calculateGradePoints(row.total_score);
         totalPoints += points * row.credit_hours;
         totalCredits += row.credit_hours;
       }
@@ -33,12 +33,46 @@ async function classifyMessage(message) {
 }
 
 /**
- * Checks if the spam detector service is available
- * @returns {Promise<boolean>} - True if service is available
+ * Predicts spam labels for many messages with a single request
+ * @param {string[]} messages - The messages to classify
+ * @param {number} [batchSize=1000] - Maximum number of messages sent per request
+ * @returns {Promise<Array<{isSpam: boolean, confidence: number}>>} - Prediction results in input order
+ */
+async function classifyMessages(messages, batchSize = 1000) {
+    const results = [];
+
+    for (let start = 0; start < messages.length; start += batchSize) {
+        const batch = messages.slice(start, start + batchSize);
+        try {
+            const response = await axios.post(`${SPAM_DETECTOR_API}/predict/batch`, { messages: batch });
+
+            for (const result of response.data.results) {
+                results.push({
+                    isSpam: result.is_spam,
+                    confidence: result.confidence
+                });
+            }
+        } catch (error) {
+            console.error('Error classifying messages:', error.message);
+            // Same fallback as classifyMessage for every message in the failed batch
+            for (let i = 0; i < batch.length; i++) {
+                results.push({ isSpam: false, confidence: 0 });
+            }
+        }
+    }
+
+    return results;
+}
+
+/**
+ * Checks if the spam detector service can classify messages
+ * @returns {Promise<boolean>} - True once the service has a model loaded
  */
 async function isServiceAvailable() {
     try {
-        await axios.get(`${SPAM_DETECTOR_API}/health`);
+        // /ready answers 503 until a model is live (or while its warm-up keeps failing);
+        // /health only says the process is up
+        await axios.get(`${SPAM_DETECTOR_API}/ready`);
         return true;
     } catch (error) {
         console.error('Spam detection service is not available:', error.message);
@@ -60,6 +94,7 @@ async function isReady() {
 module.exports = {
     initialize,
     classifyMessage,
+    classifyMessages,
     isServiceAvailable,
     isReady
 }; 
\ No newline at end of file